@@ -0,0 +1,165 @@
+"""JSON HTTP API over the repositories, for systems that integrate without the Streamlit UI.
+
+    uvicorn api:app --workers 4
+    python api.py --port 8000
+
+For each collection (patients, doctors, departments, prescriptions, medical_tests):
+
+    GET    /{collection}?after_id=&limit=   one page in ID order (pass the last ID to get the next)
+    GET    /{collection}/search?q=&limit=   full-text search, best matches first
+    GET    /{collection}/{id}
+    POST   /{collection}                    JSON object of columns; returns {"id": ...}
+    PATCH  /{collection}/{id}               JSON object of the columns to change
+    DELETE /{collection}/{id}
+
+plus GET /patients/{id}/chart, GET /doctors/{id}/worklist?days= (501 on a backend without the
+summary tables, see backends.py) and GET /metrics (Prometheus text format, see db_metrics). Every request needs an X-API-Key header matching config.api_key
+(config.password if that is not set). The schema is migrated when the server starts.
+Handlers are coroutines that await async_db, so one worker serves many requests at once: reads run
+in parallel on the async_db thread pool and all writes go through the single writer queue. A query
+that exceeds async_db.QUERY_TIMEOUT is aborted and answered with 504; a write is only answered 504
+if it timed out before reaching the writer queue (so it was not made), otherwise its real outcome
+is awaited.
+"""
+import argparse
+import asyncio
+import sqlite3 as sql
+from contextlib import asynccontextmanager
+import config
+import database as db
+import db_metrics
+import async_db
+import lookup_cache
+import patient_chart
+import repository
+import worklist
+
+try:
+    from fastapi import FastAPI, HTTPException, Body, Depends, Header, Query
+    from fastapi.responses import JSONResponse, PlainTextResponse
+except ImportError:  # The API is optional; the Streamlit app does not need FastAPI
+    FastAPI = None
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+API_KEY = getattr(config, 'api_key', config.password)
+
+def _repository(collection):
+    try:
+        return repository.REPOSITORIES[collection]
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown collection: {collection}") from None
+
+def _check_key(x_api_key: str = Header(default='')):
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid or missing X-API-Key")
+
+@asynccontextmanager
+async def _lifespan(app):
+    db.db_init()  # When the server starts, not when the module is imported
+    yield
+
+def create_app():
+    """Builds the FastAPI application."""
+    app = FastAPI(title="HIMS API", dependencies=[Depends(_check_key)], lifespan=_lifespan)
+
+    @app.exception_handler(repository.ValidationError)
+    def validation_error(request, exc):
+        return JSONResponse(status_code=422, content={'detail': str(exc)})
+
+    @app.exception_handler(repository.RecordNotFound)
+    def not_found(request, exc):
+        return JSONResponse(status_code=404, content={'detail': str(exc)})
+
+    @app.exception_handler(sql.IntegrityError)
+    def conflict(request, exc):
+        return JSONResponse(status_code=409, content={'detail': str(exc)})
+
+    @app.exception_handler(sql.NotSupportedError)
+    def not_supported(request, exc):
+        return JSONResponse(status_code=501, content={'detail': str(exc)})
+
+    @app.exception_handler(asyncio.TimeoutError)
+    def timeout(request, exc):
+        return JSONResponse(status_code=504, content={'detail': "Database query timed out"})
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return db_metrics.render()
+
+    @app.get("/patients/{patient_id}/chart")
+    async def get_chart(patient_id: str):
+        chart = await async_db.run(patient_chart.get_chart, patient_id)
+        if chart is None:
+            raise repository.RecordNotFound(f"No patient_record with ID {patient_id!r}")
+        return {
+            'patient': repository.patients.as_dict(chart['patient']),
+            'prescriptions': [repository.prescriptions.as_dict(row) for row in chart['prescriptions']],
+            'medical_tests': [repository.medical_tests.as_dict(row) for row in chart['medical_tests']],
+        }
+
+    @app.get("/doctors/{doctor_id}/worklist")
+    async def get_worklist(doctor_id: str, days: int = worklist.WORKLIST_DAYS):
+        if not await async_db.run(lookup_cache.id_exists, 'doctor_record', doctor_id):
+            raise repository.RecordNotFound(f"No doctor_record with ID {doctor_id!r}")
+        result = await async_db.run(worklist.load_worklist, doctor_id, days)
+        return {
+            'pending_count': result['pending_count'],
+            'pending_tests': [repository.medical_tests.as_dict(row) for row in result['pending_tests']],
+            'prescriptions': [repository.prescriptions.as_dict(row) for row in result['prescriptions']],
+            'patients': [dict(zip(('patient_id', 'name', 'contact_number_1', 'last_seen', 'tests', 'prescriptions'), row))
+                         for row in result['patients']],
+        }
+
+    @app.get("/{collection}")
+    async def list_records(collection: str, after_id: str = None,
+                           limit: int = Query(repository.DEFAULT_LIMIT, ge=1, le=repository.MAX_LIMIT)):
+        repo = _repository(collection)
+        return [repo.as_dict(row) for row in await async_db.list_records(collection, after_id, limit)]
+
+    @app.get("/{collection}/search")
+    async def search_records(collection: str, q: str, limit: int = Query(20, ge=1, le=repository.MAX_LIMIT)):
+        repo = _repository(collection)
+        return [repo.as_dict(row) for row in await async_db.search(collection, q, limit)]
+
+    @app.get("/{collection}/{record_id}")
+    async def get_record(collection: str, record_id: str):
+        repo = _repository(collection)
+        return repo.as_dict(await async_db.get(collection, record_id))
+
+    @app.post("/{collection}", status_code=201)
+    async def create_record(collection: str, data: dict = Body(...)):
+        _repository(collection)
+        return {'id': await async_db.create(collection, data)}
+
+    @app.patch("/{collection}/{record_id}")
+    async def update_record(collection: str, record_id: str, data: dict = Body(...)):
+        _repository(collection)
+        await async_db.update(collection, record_id, data)
+        return {'id': record_id}
+
+    @app.delete("/{collection}/{record_id}", status_code=204)
+    async def delete_record(collection: str, record_id: str):
+        _repository(collection)
+        await async_db.delete(collection, record_id)
+
+    return app
+
+
+app = create_app() if FastAPI is not None else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the HIMS JSON API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+    if app is None or uvicorn is None:
+        parser.error("The API needs fastapi and uvicorn (pip install fastapi uvicorn)")
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""asyncio front end to the database layer, for handling many requests concurrently.
+
+SQLite calls block, so every call is run on a dedicated thread pool (ASYNC_DB_WORKERS threads,
+each reading over its own pooled connection) and awaited. This lets independent queries run in
+parallel:
+
+    patient_name, doctor_name = await async_db.fetch_names(('patient_record', p), ('doctor_record', d))
+
+Every call takes a timeout (QUERY_TIMEOUT seconds by default). When a call times out or the awaiting
+task is cancelled, a call that has not started is dropped and a running query is aborted with
+sqlite3's interrupt(), on every connection the call holds (its pooled primary connection and any
+read replica connection it acquired). The timeout stops applying once a call has queued a write: the write will
+commit (or fail) regardless, so the call is awaited for its real outcome rather than reported as
+timed out. A cancelled task does not undo a write that has already been queued.
+Synchronous code (e.g. a Streamlit script) can use run_sync() to wait for a coroutine.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import database as db
+import lookup_cache
+import repository
+import config
+
+ASYNC_DB_WORKERS = getattr(config, 'async_db_workers', 8)
+QUERY_TIMEOUT = getattr(config, 'query_timeout', 10)  # seconds
+
+_executor = ThreadPoolExecutor(max_workers=ASYNC_DB_WORKERS, thread_name_prefix='async-db')
+
+
+class _Call:
+    """One function call on the executor; tracks the connections it acquires so it can be interrupted."""
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.key = None  # Pool key of the executor thread running the call
+        self.connections = []
+        self.cancelled = False
+        self.write_queued = False
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        self.key = db.pool.current_key()
+        db.connection_observer.callback = self.acquired
+        try:
+            conn = db.pool.acquire()  # Nested db.connection() calls in fn share this connection
+            try:
+                with self.lock:
+                    if self.cancelled:
+                        raise asyncio.CancelledError()
+                db.write_observer.callback = self.queueing_write
+                return self.fn(*self.args)
+            finally:
+                db.write_observer.callback = None
+                conn.close()
+        finally:
+            db.connection_observer.callback = None
+            with self.lock:
+                self.connections = []
+
+    def acquired(self, pooled):
+        """Called with every pooled connection (primary or replica) fn acquires."""
+        with self.lock:
+            if pooled not in self.connections:
+                self.connections.append(pooled)
+
+    def queueing_write(self, future):
+        """Called as fn queues a write; from then on the call is no longer cancelled on timeout."""
+        with self.lock:
+            if self.cancelled:
+                raise asyncio.CancelledError()  # Timed out first: the write is not queued
+            self.write_queued = True
+
+    def cancel(self):
+        """Drops or interrupts the call, unless it has queued a write; returns whether it did."""
+        with self.lock:
+            if self.write_queued:
+                return False
+            self.cancelled = True
+            for pooled in self.connections:
+                pooled.interrupt_for(self.key)  # The running statement fails with "interrupted"
+            return True
+
+
+async def run(fn, *args, timeout=None):
+    """Runs fn(*args) on the database thread pool and returns its result.
+
+    Raises asyncio.TimeoutError if it takes longer than timeout seconds (QUERY_TIMEOUT if None) before
+    queuing a write; once it has queued one, its result is awaited however long the write takes.
+    """
+    call = _Call(fn, args)
+    future = asyncio.get_running_loop().run_in_executor(_executor, call)
+    try:
+        # Shielded, so that the future can still be awaited after the timeout
+        return await asyncio.wait_for(asyncio.shield(future), QUERY_TIMEOUT if timeout is None else timeout)
+    except asyncio.TimeoutError:
+        if call.cancel():
+            future.add_done_callback(_discard)
+            raise
+    except asyncio.CancelledError:
+        call.cancel()
+        future.add_done_callback(_discard)
+        raise
+    return await future
+
+def _discard(future):
+    """Retrieves the outcome of a call nobody awaits any more, so asyncio does not log it."""
+    if not future.cancelled():
+        future.exception()
+
+def run_sync(coroutine):
+    """Runs a coroutine to completion from synchronous code and returns its result."""
+    return asyncio.run(coroutine)
+
+# --- Queries ---
+def _fetchall(query, params):
+    conn, c = db.connection()
+    try:
+        c.execute(query, params)
+        return c.fetchall()
+    finally:
+        conn.close()
+
+async def fetchall(query, params=(), timeout=None):
+    return await run(_fetchall, query, params, timeout=timeout)
+
+async def fetchone(query, params=(), timeout=None):
+    rows = await fetchall(query, params, timeout)
+    return rows[0] if rows else None
+
+async def execute_write(query, params=(), timeout=None):
+    """Runs one INSERT/UPDATE/DELETE through the writer queue and returns the affected row count."""
+    return await run(db.execute_write, query, params, timeout=timeout)
+
+async def verify_id(table_name, id_value, timeout=None):
+    return await run(lookup_cache.id_exists, table_name, id_value, timeout=timeout)
+
+async def fetch_name(table_name, id_value, timeout=None):
+    return await run(lookup_cache.fetch_name, table_name, id_value, timeout=timeout)
+
+async def fetch_names(*lookups, timeout=None):
+    """Fetches several (table_name, id) names concurrently; None for empty or unknown IDs."""
+    async def one(table_name, id_value):
+        return await fetch_name(table_name, id_value, timeout) if id_value else None
+    return await asyncio.gather(*(one(table_name, id_value) for table_name, id_value in lookups))
+
+# --- Repository operations (collection is a key of repository.REPOSITORIES) ---
+async def get(collection, record_id, timeout=None):
+    return await run(repository.REPOSITORIES[collection].get, record_id, timeout=timeout)
+
+async def list_records(collection, after_id=None, limit=repository.DEFAULT_LIMIT, timeout=None):
+    return await run(repository.REPOSITORIES[collection].list, after_id, limit, timeout=timeout)
+
+async def search(collection, text, limit=20, timeout=None):
+    return await run(repository.REPOSITORIES[collection].search, text, limit, timeout=timeout)
+
+async def create(collection, data, timeout=None):
+    return await run(repository.REPOSITORIES[collection].create, data, timeout=timeout)
+
+async def update(collection, record_id, data, timeout=None):
+    return await run(repository.REPOSITORIES[collection].update, record_id, data, timeout=timeout)
+
+async def delete(collection, record_id, timeout=None):
+    return await run(repository.REPOSITORIES[collection].delete, record_id, timeout=timeout)
@@ -0,0 +1,462 @@
+"""Storage backends: SQLite (the default) and PostgreSQL.
+
+config.database_backend picks one ('sqlite' or 'postgres'; PostgreSQL connects with
+config.postgres_dsn and needs psycopg 3). The rest of the application keeps writing SQLite-flavoured
+SQL with ? placeholders and catching sqlite3's exceptions; a backend supplies what differs:
+
+    connect()                      a new connection (database.py pools them per session as before)
+    begin_write                    the statement that opens a write transaction
+    copy_rows(conn, table, ...)    bulk load: executemany on SQLite, COPY FROM STDIN on PostgreSQL
+    table_columns(conn, table)     [(column, declared type)] of a table or view
+    create_schema(conn)            migrations.migrate on SQLite, POSTGRES_SCHEMA on PostgreSQL
+
+PostgreSQL connections are wrapped to look like sqlite3 connections: ? becomes %s (outside quoted
+strings), and psycopg errors are re-raised as the sqlite3 exception of the same DB-API class, so
+`except sqlite3.IntegrityError` keeps working. The schema gives PostgreSQL a group_concat aggregate
+and a case-insensitive NOCASE collation, so the shared queries run unchanged, and declares IDs and
+timestamps COLLATE "C" so that keyset pagination and ID/time ranges sort as they do in SQLite.
+
+PostgreSQL covers the five record types (patients, doctors, departments, prescriptions, medical
+tests) through the repositories, the pages and the API; search falls back to unranked substring
+matching. The trigger-maintained summaries (lab turnaround, revenue, pending results) are not in
+POSTGRES_SCHEMA: a backend without summary_tables shows the lab analytics, revenue and worklist pages
+as unavailable and the worklist API answers 501 (database.require_summary_tables), and so does lab
+result ingestion. Read replicas and per-statement metrics remain SQLite-only.
+
+    python backends.py --check                          # round-trip every record type on the configured backend
+    python backends.py --check --postgres 'dbname=test' # the same against a (scratch) PostgreSQL database
+"""
+import argparse
+import re
+import sqlite3 as sql
+import config
+
+try:
+    import psycopg
+except ImportError:  # Only needed for the PostgreSQL backend
+    psycopg = None
+
+POSTGRES_DSN = getattr(config, 'postgres_dsn', 'dbname=hims')
+
+_PLACEHOLDER = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|(\?)|(%)""")
+_translated = {}
+
+def translate(query, has_params):
+    """Rewrites ? placeholders as %s; with parameters, literal % signs are doubled for psycopg."""
+    key = (query, has_params)
+    translated = _translated.get(key)
+    if translated is None:
+        def replace(match):
+            if match.group(1):
+                return match.group(1).replace('%', '%%') if has_params else match.group(1)
+            if match.group(2):
+                return '%s'
+            return '%%' if has_params else '%'
+        translated = _translated[key] = _PLACEHOLDER.sub(replace, query)
+    return translated
+
+
+class SQLiteBackend:
+    """The SQLite file at database.DATABASE_PATH; database.create_connection opens it with the pragma profiles."""
+    name = 'sqlite'
+    begin_write = "BEGIN IMMEDIATE"  # Take the write lock up front instead of failing on upgrade
+    full_text_search = True  # FTS5 indexes (see search.py)
+    summary_tables = True  # Trigger-maintained lab turnaround, revenue and pending-result tables
+
+    def copy_rows(self, conn, table_name, columns, rows):
+        conn.executemany(f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                         rows)
+
+    def table_columns(self, conn, table_name):
+        return [(row[1], row[2]) for row in conn.execute(f"PRAGMA table_info({table_name})")]
+
+    def create_schema(self, conn):
+        import migrations
+        migrations.migrate(conn)
+
+
+def _reraise(error):
+    """Raises the sqlite3 exception matching a psycopg error's DB-API class."""
+    for name in ('IntegrityError', 'DataError', 'OperationalError', 'ProgrammingError', 'NotSupportedError',
+                 'InternalError'):
+        if isinstance(error, getattr(psycopg, name)):
+            raise getattr(sql, name)(str(error)) from error
+    raise sql.DatabaseError(str(error)) from error
+
+
+class PostgresCursor:
+    """sqlite3.Cursor-like wrapper of a psycopg cursor."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        try:
+            self._cursor.execute(translate(query, bool(params)), params or None)
+        except psycopg.Error as e:
+            _reraise(e)
+        return self
+
+    def executemany(self, query, seq_of_params):
+        try:
+            self._cursor.executemany(translate(query, True), seq_of_params)
+        except psycopg.Error as e:
+            _reraise(e)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone() if self._cursor.description else None
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size) if self._cursor.description else []
+
+    def fetchall(self):
+        return self._cursor.fetchall() if self._cursor.description else []
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+
+class PostgresConnection:
+    """sqlite3.Connection-like wrapper of a psycopg connection.
+
+    isolation_level = None switches to autocommit, where transactions are opened explicitly (as
+    the write queue does); otherwise a transaction starts with the first statement, as in sqlite3.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return PostgresCursor(self._conn.cursor())
+
+    def execute(self, query, params=()):
+        return self.cursor().execute(query, params)
+
+    def executemany(self, query, seq_of_params):
+        return self.cursor().executemany(query, seq_of_params)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+    def interrupt(self):
+        """Cancels the running statement, like sqlite3's interrupt() (it fails with QueryCanceled)."""
+        self._conn.cancel()
+
+    @property
+    def in_transaction(self):
+        return self._conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE
+
+    @property
+    def isolation_level(self):
+        return None if self._conn.autocommit else ''
+
+    @isolation_level.setter
+    def isolation_level(self, value):
+        self._conn.autocommit = value is None
+
+
+# The current schema of the record tables, their views and indexes (SQLite builds it with migrations)
+POSTGRES_SCHEMA = [
+    'CREATE COLLATION IF NOT EXISTS nocase (provider = icu, locale = \'und-u-ks-level2\', deterministic = false)',
+    """
+    CREATE OR REPLACE FUNCTION group_concat_step(acc TEXT, value TEXT, separator TEXT) RETURNS TEXT AS $$
+        SELECT CASE WHEN value IS NULL THEN acc WHEN acc IS NULL THEN value ELSE acc || separator || value END
+    $$ LANGUAGE SQL IMMUTABLE
+    """,
+    'CREATE OR REPLACE AGGREGATE group_concat(TEXT, TEXT) (SFUNC = group_concat_step, STYPE = TEXT)',
+    """
+    CREATE TABLE IF NOT EXISTS department_record (
+        id TEXT COLLATE "C" PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        description TEXT NOT NULL,
+        contact_number_1 TEXT NOT NULL,
+        contact_number_2 TEXT,
+        address TEXT NOT NULL,
+        email_id TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS patient_record (
+        id TEXT COLLATE "C" PRIMARY KEY,
+        name TEXT NOT NULL,
+        age INTEGER NOT NULL,
+        gender TEXT NOT NULL,
+        date_of_birth TEXT NOT NULL,
+        blood_group TEXT NOT NULL,
+        contact_number_1 TEXT NOT NULL,
+        contact_number_2 TEXT,
+        aadhar_or_voter_id TEXT NOT NULL UNIQUE,
+        weight INTEGER NOT NULL,
+        height INTEGER NOT NULL,
+        address TEXT NOT NULL,
+        city TEXT NOT NULL,
+        state TEXT NOT NULL,
+        pin_code TEXT NOT NULL,
+        next_of_kin_name TEXT NOT NULL,
+        next_of_kin_relation_to_patient TEXT NOT NULL,
+        next_of_kin_contact_number TEXT NOT NULL,
+        email_id TEXT,
+        date_of_registration TEXT COLLATE "C" NOT NULL,
+        time_of_registration TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS doctor_record (
+        id TEXT COLLATE "C" PRIMARY KEY,
+        name TEXT NOT NULL,
+        age INTEGER NOT NULL,
+        gender TEXT NOT NULL,
+        date_of_birth TEXT NOT NULL,
+        blood_group TEXT NOT NULL,
+        department_id TEXT COLLATE "C" NOT NULL REFERENCES department_record (id) ON UPDATE CASCADE ON DELETE RESTRICT,
+        contact_number_1 TEXT NOT NULL,
+        contact_number_2 TEXT,
+        aadhar_or_voter_id TEXT NOT NULL UNIQUE,
+        email_id TEXT NOT NULL UNIQUE,
+        qualification TEXT NOT NULL,
+        specialisation TEXT NOT NULL,
+        years_of_experience INTEGER NOT NULL,
+        address TEXT NOT NULL,
+        city TEXT NOT NULL,
+        state TEXT NOT NULL,
+        pin_code TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS prescription_record (
+        id TEXT COLLATE "C" PRIMARY KEY,
+        patient_id TEXT COLLATE "C" NOT NULL REFERENCES patient_record (id) ON UPDATE CASCADE ON DELETE RESTRICT,
+        doctor_id TEXT COLLATE "C" NOT NULL REFERENCES doctor_record (id) ON UPDATE CASCADE ON DELETE RESTRICT,
+        diagnosis TEXT NOT NULL,
+        comments TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS prescription_item (
+        prescription_id TEXT COLLATE "C" NOT NULL
+            REFERENCES prescription_record (id) ON UPDATE CASCADE ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        medicine_name TEXT NOT NULL,
+        dosage_description TEXT,
+        PRIMARY KEY (prescription_id, position)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS medical_test_record (
+        id TEXT COLLATE "C" PRIMARY KEY,
+        test_name TEXT NOT NULL,
+        patient_id TEXT COLLATE "C" NOT NULL REFERENCES patient_record (id) ON UPDATE CASCADE ON DELETE RESTRICT,
+        doctor_id TEXT COLLATE "C" NOT NULL REFERENCES doctor_record (id) ON UPDATE CASCADE ON DELETE RESTRICT,
+        medical_lab_scientist_id TEXT COLLATE "C" NOT NULL,
+        test_date_time TEXT COLLATE "C" NOT NULL,
+        result_date_time TEXT COLLATE "C" NOT NULL,
+        result_and_diagnosis TEXT,
+        description TEXT,
+        comments TEXT,
+        cost INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bulk_import_checkpoint (
+        source TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        rows_done INTEGER NOT NULL,
+        inserted INTEGER NOT NULL,
+        rejected INTEGER NOT NULL,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (source, table_name)
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS idx_prescription_patient ON prescription_record (patient_id)',
+    'CREATE INDEX IF NOT EXISTS idx_prescription_doctor_id ON prescription_record (doctor_id, id)',
+    'CREATE INDEX IF NOT EXISTS idx_prescription_item_medicine ON prescription_item (medicine_name COLLATE nocase)',
+    'CREATE INDEX IF NOT EXISTS idx_medical_test_patient_date ON medical_test_record (patient_id, test_date_time)',
+    'CREATE INDEX IF NOT EXISTS idx_medical_test_doctor_date ON medical_test_record (doctor_id, test_date_time)',
+    'CREATE INDEX IF NOT EXISTS idx_medical_test_scientist_date ON medical_test_record (medical_lab_scientist_id, test_date_time)',
+    'CREATE INDEX IF NOT EXISTS idx_medical_test_date ON medical_test_record (test_date_time)',
+    'CREATE INDEX IF NOT EXISTS idx_medical_test_result_date ON medical_test_record (result_date_time)',
+    'CREATE INDEX IF NOT EXISTS idx_doctor_department ON doctor_record (department_id)',
+    'CREATE INDEX IF NOT EXISTS idx_patient_city ON patient_record (city)',
+    'CREATE INDEX IF NOT EXISTS idx_doctor_city ON doctor_record (city)',
+    'CREATE INDEX IF NOT EXISTS idx_patient_registration_date ON patient_record (date_of_registration)',
+    """
+    CREATE OR REPLACE VIEW doctor_view AS
+    SELECT d.id, d.name, d.age, d.gender, d.date_of_birth, d.blood_group,
+           d.department_id, dp.name AS department_name, d.contact_number_1, d.contact_number_2,
+           d.aadhar_or_voter_id, d.email_id, d.qualification, d.specialisation,
+           d.years_of_experience, d.address, d.city, d.state, d.pin_code
+    FROM doctor_record d
+    JOIN department_record dp ON dp.id = d.department_id
+    """,
+    """
+    CREATE OR REPLACE VIEW prescription_view AS
+    SELECT p.id, p.patient_id, pt.name AS patient_name, p.doctor_id, d.name AS doctor_name,
+           p.diagnosis, p.comments
+    FROM prescription_record p
+    JOIN patient_record pt ON pt.id = p.patient_id
+    JOIN doctor_record d ON d.id = p.doctor_id
+    """,
+    """
+    CREATE OR REPLACE VIEW medical_test_view AS
+    SELECT t.id, t.test_name, t.patient_id, pt.name AS patient_name, t.doctor_id, d.name AS doctor_name,
+           t.medical_lab_scientist_id, t.test_date_time, t.result_date_time,
+           t.result_and_diagnosis, t.description, t.comments, t.cost
+    FROM medical_test_record t
+    JOIN patient_record pt ON pt.id = t.patient_id
+    JOIN doctor_record d ON d.id = t.doctor_id
+    """,
+]
+
+
+class PostgresBackend:
+    """A PostgreSQL database reached through psycopg 3."""
+    name = 'postgres'
+    begin_write = "BEGIN"
+    full_text_search = False
+    summary_tables = False
+
+    def __init__(self, dsn=None):
+        if psycopg is None:
+            raise ImportError("The PostgreSQL backend needs psycopg (pip install 'psycopg[binary]')")
+        self.dsn = dsn or getattr(config, 'postgres_dsn', POSTGRES_DSN)
+
+    def connect(self):
+        try:
+            return PostgresConnection(psycopg.connect(self.dsn))
+        except psycopg.Error as e:
+            _reraise(e)
+
+    def copy_rows(self, conn, table_name, columns, rows):
+        cursor = conn._conn.cursor()
+        try:
+            with cursor.copy(f"COPY {table_name} ({', '.join(columns)}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+        except psycopg.Error as e:
+            _reraise(e)
+        finally:
+            cursor.close()
+
+    def table_columns(self, conn, table_name):
+        return conn.execute("SELECT column_name, data_type FROM information_schema.columns "
+                            "WHERE table_schema = current_schema() AND table_name = ? ORDER BY ordinal_position",
+                            (table_name,)).fetchall()
+
+    def create_schema(self, conn):
+        conn.isolation_level = None
+        conn.execute("BEGIN")
+        try:
+            for statement in POSTGRES_SCHEMA:
+                conn.execute(statement)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+BACKENDS = {'sqlite': SQLiteBackend, 'postgres': PostgresBackend}
+
+def create(name):
+    """Returns the backend called name ('sqlite' or 'postgres')."""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown database backend: {name!r} (expected one of {', '.join(BACKENDS)})") from None
+
+
+def check():
+    """Creates, reads, updates, searches and deletes one record of every type; returns the steps done."""
+    import database as db
+    import repository
+    from datetime import datetime
+    stamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    steps = []
+    department_id = repository.departments.create({
+        'name': f"Check {stamp}", 'description': "Backend check", 'contact_number_1': '0000000000',
+        'address': "Check Block", 'email_id': f"check{stamp}@hims.example"})
+    doctor_id = repository.doctors.create({
+        'name': "Dr. Check", 'gender': 'Female', 'date_of_birth': '01-01-1980', 'blood_group': 'O+',
+        'department_id': department_id, 'contact_number_1': '0000000001', 'aadhar_or_voter_id': f"CHECK-DR-{stamp}",
+        'email_id': f"dr{stamp}@hims.example", 'qualification': 'MBBS', 'specialisation': 'Checks',
+        'address': "Check Road", 'city': 'Pune', 'state': 'Maharashtra', 'pin_code': '411001'})
+    patient_id = repository.patients.create({
+        'name': "Check Patient", 'gender': 'Male', 'date_of_birth': '01-01-1990', 'blood_group': 'A+',
+        'contact_number_1': stamp[-10:], 'aadhar_or_voter_id': f"CHECK-P-{stamp}", 'address': "Check Road",
+        'city': 'Pune', 'state': 'Maharashtra', 'pin_code': '411001', 'next_of_kin_name': "Kin",
+        'next_of_kin_relation_to_patient': 'Sibling', 'next_of_kin_contact_number': '0000000003'})
+    prescription_id = repository.prescriptions.create({
+        'patient_id': patient_id, 'doctor_id': doctor_id, 'diagnosis': "Check",
+        'medicines': [('Paracetamol 500mg', '1 tablet'), ('ORS', '1 sachet')]})
+    test_id = repository.medical_tests.create({
+        'test_name': 'ECG', 'patient_id': patient_id, 'doctor_id': doctor_id, 'medical_lab_scientist_id': 'MLS-CHECK',
+        'test_date_time': '2024-01-01 09:00', 'result_date_time': '2024-01-01 10:00', 'cost': 250})
+    steps.append('create')
+    created = [(repository.departments, department_id), (repository.doctors, doctor_id),
+               (repository.patients, patient_id), (repository.prescriptions, prescription_id),
+               (repository.medical_tests, test_id)]
+    for repo, record_id in created:
+        assert repo.get(record_id)[0] == record_id, f"{repo.table_name}: created record not found"
+    assert repository.prescriptions.as_dict(repository.prescriptions.get(prescription_id))['medicines'] == \
+        'Paracetamol 500mg - 1 tablet; ORS - 1 sachet'
+    assert [row[0] for row in repository.prescriptions.where('patient_id', patient_id)] == [prescription_id]
+    assert repository.prescriptions.by_medicine('paracetamol 500MG'), "Case-insensitive medicine lookup failed"
+    steps.append('read')
+    repository.departments.update(department_id, {'description': "Checked"})
+    repository.patients.update(patient_id, {'city': 'Mumbai'})
+    repository.medical_tests.update(test_id, {'result_and_diagnosis': "Normal"})
+    assert repository.patients.as_dict(repository.patients.get(patient_id))['city'] == 'Mumbai'
+    steps.append('update')
+    assert any(row[0] == patient_id for row in repository.patients.search(stamp[-10:]))
+    assert any(row[0] == department_id for row in repository.departments.search(f"Check {stamp}"))
+    steps.append('search')
+    import worklist
+    try:
+        worklist.load_worklist(doctor_id)
+        assert db.backend.summary_tables, "Worklists should be unavailable without summary tables"
+    except sql.NotSupportedError:
+        assert not db.backend.summary_tables, "Worklists should be available with summary tables"
+    steps.append('summaries')
+    try:
+        repository.departments.delete(department_id)
+        raise AssertionError("Deleting a department with doctors should fail")
+    except sql.IntegrityError:
+        pass
+    for repo, record_id in reversed(created):
+        repo.delete(record_id)
+    steps.append('delete')
+    return steps
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the configured database backend.")
+    parser.add_argument('--check', action='store_true', help="Round-trip one record of every type")
+    parser.add_argument('--postgres', metavar='DSN', help="Use PostgreSQL at DSN instead of the configured backend")
+    args = parser.parse_args()
+    if args.postgres:
+        config.database_backend = 'postgres'
+        config.postgres_dsn = args.postgres
+    import database as db
+    print(f"Backend: {db.backend.name}")
+    if args.check:
+        db.db_init()
+        print(f"OK: {', '.join(check())}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Stand-alone benchmarks for the HIMS data layer (run from the repository root)."""
@@ -0,0 +1,110 @@
+"""Load test for the JSON API (api.py): requests/sec and latency per request type.
+
+    uvicorn api:app --workers 4 &
+    python -m benchmarks.bench_api --url http://127.0.0.1:8000 --concurrency 32 --seconds 10
+
+With --in-process the app is called directly through httpx's ASGI transport (no server needed),
+which measures the API and database layers without network overhead. Each client loops over a mix
+of patient lookups by ID, list pages, searches and registrations (see --write-ratio).
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+
+import httpx
+
+import config
+
+PATIENT = {
+    'name': 'Bench Patient', 'gender': 'Female', 'date_of_birth': '01-01-1985', 'blood_group': 'O+',
+    'contact_number_1': '9000000000', 'aadhar_or_voter_id': None, 'address': 'Street 1',
+    'city': 'Pune', 'state': 'MH', 'pin_code': '411001', 'next_of_kin_name': 'Kin',
+    'next_of_kin_relation_to_patient': 'Sibling', 'next_of_kin_contact_number': '9000000001',
+}
+SEARCH_TERMS = ['pune', 'bench', 'patient', 'mh']
+
+async def client_loop(client, ids, counter, stop, write_ratio, results):
+    rng = random.Random()
+    while not stop.is_set():
+        roll = rng.random()
+        if roll < write_ratio:
+            kind = 'create'
+            request = client.post('/patients', json=dict(PATIENT, aadhar_or_voter_id=f'BENCH-{next(counter)}'))
+        elif roll < write_ratio + 0.1:
+            kind = 'search'
+            request = client.get('/patients/search', params={'q': rng.choice(SEARCH_TERMS)})
+        elif roll < write_ratio + 0.2:
+            kind = 'list'
+            request = client.get('/patients', params={'after_id': rng.choice(ids), 'limit': 50})
+        else:
+            kind = 'get'
+            request = client.get(f'/patients/{rng.choice(ids)}')
+        start = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code < 400
+            if kind == 'create' and ok:
+                ids.append(response.json()['id'])
+        except httpx.HTTPError:
+            ok = False
+        results.append((kind, time.perf_counter() - start, ok))
+
+async def seed(client, rows):
+    """Returns up to 500 existing patient IDs, registering patients first if there are too few."""
+    response = await client.get('/patients', params={'limit': 500})
+    response.raise_for_status()
+    ids = [patient['id'] for patient in response.json()]
+    for n in range(len(ids), rows):
+        response = await client.post('/patients', json=dict(PATIENT, aadhar_or_voter_id=f'BENCH-SEED-{time.time_ns()}-{n}'))
+        response.raise_for_status()
+        ids.append(response.json()['id'])
+    return ids
+
+async def run(args):
+    headers = {'X-API-Key': getattr(config, 'api_key', config.password)}
+    if args.in_process:
+        import api
+        api.db.db_init()  # ASGITransport does not run the app's lifespan, which would migrate
+        transport = httpx.ASGITransport(app=api.app)
+        client = httpx.AsyncClient(transport=transport, base_url='http://api', headers=headers)
+    else:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        client = httpx.AsyncClient(base_url=args.url, headers=headers, limits=limits, timeout=30)
+    async with client:
+        ids = await seed(client, args.seed_rows)
+        counter = itertools.count(time.time_ns())
+        stop = asyncio.Event()
+        results = []
+        tasks = [asyncio.create_task(client_loop(client, ids, counter, stop, args.write_ratio, results))
+                 for _ in range(args.concurrency)]
+        await asyncio.sleep(args.seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+    return results
+
+def report(results, seconds):
+    print(f"{'request':>8} {'count':>8} {'req/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    kinds = sorted({kind for kind, _, _ in results})
+    for kind in kinds + ['total']:
+        rows = [r for r in results if kind in ('total', r[0])]
+        timings = sorted(elapsed * 1000 for _, elapsed, _ in rows)
+        errors = sum(1 for _, _, ok in rows if not ok)
+        print(f"{kind:>8} {len(rows):>8} {len(rows) / seconds:>10.0f} "
+              f"{timings[len(timings) // 2]:>8.1f} {timings[int(len(timings) * 0.95) - 1]:>8.1f} {errors:>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--in-process', action='store_true', help="Call the app directly instead of over HTTP")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    parser.add_argument('--seed-rows', type=int, default=200)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    report(results, args.seconds)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Read/write throughput of the database layer at 1, 8 and 32 concurrent sessions.
+
+Each session is a thread that mimics front-desk traffic: mostly patient lookups by ID with a share
+of new registrations. Reads go through the connection pool, writes through the writer queue.
+
+    python -m benchmarks.bench_concurrency --seconds 5 --write-ratio 0.2
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from functools import partial
+
+import database as db
+
+SESSION_COUNTS = (1, 8, 32)
+
+INSERT_PATIENT = """
+    INSERT INTO patient_record (
+        id, name, age, gender, date_of_birth, blood_group,
+        contact_number_1, contact_number_2, aadhar_or_voter_id,
+        weight, height, address, city, state, pin_code,
+        next_of_kin_name, next_of_kin_relation_to_patient,
+        next_of_kin_contact_number, email_id,
+        date_of_registration, time_of_registration
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def patient_row(n):
+    return (f'P-BENCH-{n}', f'Patient {n}', 40, 'Female', '01-01-1985', 'O+',
+            '9000000000', '', f'AADHAR-{n}', 60, 165, 'Street 1', 'Pune', 'MH', '411001',
+            'Kin', 'Sibling', '9000000001', '', '01-01-2024', '10:00:00')
+
+def seed(conn, rows):
+    conn.executemany(INSERT_PATIENT, (patient_row(n) for n in range(rows)))
+    conn.commit()
+
+def session(pool, writer, stop, write_ratio, id_counter, seeded, stats):
+    reads = writes = errors = 0
+    rng = random.Random()
+    while not stop.is_set():
+        try:
+            if rng.random() < write_ratio:
+                with id_counter['lock']:
+                    id_counter['next'] += 1
+                    n = id_counter['next']
+                writer.submit(db._execute, INSERT_PATIENT, patient_row(n)).result()
+                writes += 1
+            else:
+                conn = pool.acquire()
+                try:
+                    conn.execute("SELECT * FROM patient_record WHERE id = ?",
+                                 (f'P-BENCH-{rng.randrange(seeded)}',)).fetchone()
+                finally:
+                    conn.close()
+                reads += 1
+        except Exception:
+            errors += 1
+    stats.append((reads, writes, errors))
+
+def run(profile, sessions, seconds, write_ratio, seeded):
+    factory = partial(db.create_connection, profile)
+    pool = db.ConnectionPool(factory=factory, max_idle=sessions)
+    writer = db.WriteQueue(factory=factory)
+    stop = threading.Event()
+    stats = []
+    id_counter = {'lock': threading.Lock(), 'next': seeded + sessions * 10_000_000}
+    threads = [threading.Thread(target=session, args=(pool, writer, stop, write_ratio, id_counter, seeded, stats))
+               for _ in range(sessions)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    pool.close_all()
+    reads, writes, errors = (sum(column) for column in zip(*stats))
+    return reads / seconds, writes / seconds, errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--seed-rows', type=int, default=10_000)
+    parser.add_argument('--profiles', nargs='+', default=['default', 'concurrent'])
+    args = parser.parse_args()
+
+    for profile in args.profiles:
+        with tempfile.TemporaryDirectory() as tmp:
+            db.DATABASE_PATH = os.path.join(tmp, 'bench.db')
+            db.create_tables()
+            conn = db.create_connection(profile)
+            seed(conn, args.seed_rows)
+            conn.close()
+            print(f"profile={profile}")
+            print(f"{'sessions':>8} {'reads/s':>12} {'writes/s':>12} {'errors':>8}")
+            for sessions in SESSION_COUNTS:
+                reads, writes, errors = run(profile, sessions, args.seconds, args.write_ratio, args.seed_rows)
+                print(f"{sessions:>8} {reads:>12.0f} {writes:>12.0f} {errors:>8}")
+
+if __name__ == '__main__':
+    main()
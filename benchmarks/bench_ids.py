@@ -0,0 +1,58 @@
+"""Throughput and uniqueness of id_generator across threads and processes.
+
+    python -m benchmarks.bench_ids --ids 1000000 --threads 4 --processes 4
+
+Every generated ID is collected and checked for duplicates; IDs from each thread must also come out
+in strictly increasing order.
+"""
+import argparse
+import multiprocessing
+import threading
+import time
+
+import id_generator
+
+def generate(count, prefix='P'):
+    ids = [id_generator.generate_id(prefix) for _ in range(count)]
+    assert all(a < b for a, b in zip(ids, ids[1:])), "IDs are not monotonic within a thread"
+    return ids
+
+def threaded(count, threads):
+    results = [None] * threads
+    def worker(i):
+        results[i] = generate(count // threads)
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return [i for ids in results for i in ids]
+
+def process_worker(args):
+    count, threads = args
+    return threaded(count, threads)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ids', type=int, default=1_000_000, help="IDs per process")
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--processes', type=int, default=4)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ids = threaded(args.ids, args.threads)
+    elapsed = time.perf_counter() - start
+    assert len(set(ids)) == len(ids), "Duplicate IDs generated across threads"
+    print(f"1 process x {args.threads} threads: {len(ids) / elapsed:,.0f} IDs/sec, no collisions")
+
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(args.processes) as pool:
+        start = time.perf_counter()
+        batches = pool.map(process_worker, [(args.ids, args.threads)] * args.processes)
+        elapsed = time.perf_counter() - start
+    ids = [i for batch in batches for i in batch]
+    assert len(set(ids)) == len(ids), "Duplicate IDs generated across processes"
+    print(f"{args.processes} processes x {args.threads} threads: {len(ids) / elapsed:,.0f} IDs/sec, no collisions")
+
+if __name__ == '__main__':
+    main()
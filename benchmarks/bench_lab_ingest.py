@@ -0,0 +1,83 @@
+"""Throughput of lab_ingest on synthetic analyser files, for a first run and a replay.
+
+    python -m benchmarks.bench_lab_ingest --results 100000 --unknown 0.01
+
+Registers medical tests (for an existing patient and doctor) until there are at least --results of
+them, writes a CSV and an HL7 result file covering them with a share of unknown test IDs, and
+ingests each file twice. The replay must change nothing.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import database as db
+import id_generator
+import lab_ingest
+
+def _insert_tests(conn, rows):
+    conn.executemany(
+        "INSERT INTO medical_test_record (id, test_name, patient_id, doctor_id, medical_lab_scientist_id, "
+        "test_date_time, result_date_time, cost, result_and_diagnosis, description, comments) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+def seed_tests(count):
+    """Returns `count` medical test IDs, registering tests if there are fewer."""
+    conn, c = db.connection()
+    try:
+        c.execute("SELECT id FROM medical_test_record ORDER BY id LIMIT ?", (count,))
+        ids = [row[0] for row in c.fetchall()]
+        patient = c.execute("SELECT id FROM patient_record LIMIT 1").fetchone()
+        doctor = c.execute("SELECT id FROM doctor_record LIMIT 1").fetchone()
+    finally:
+        conn.close()
+    missing = count - len(ids)
+    if missing > 0:
+        if patient is None or doctor is None:
+            raise SystemExit("Register at least one patient and one doctor first")
+        new_ids = id_generator.generate_ids('T', missing)
+        rows = [(test_id, 'Complete blood count', patient[0], doctor[0], 'MLS-BENCH', '2024-01-01 09:00',
+                 '2024-01-01 09:00', 100, 'Test result awaited', '', '') for test_id in new_ids]
+        db.run_write(_insert_tests, rows)  # A module-level function, so it can go to a writer service too
+        ids += new_ids
+    return ids
+
+def write_files(folder, ids, unknown, seed):
+    rng = random.Random(seed)
+    ids = [test_id if rng.random() >= unknown else f'T-UNKNOWN-{n}' for n, test_id in enumerate(ids)]
+    csv_path = os.path.join(folder, 'results.csv')
+    with open(csv_path, 'w') as f:
+        f.write('test_id,result,result_date_time\n')
+        for test_id in ids:
+            f.write(f'{test_id},Hb {rng.randint(90, 170) / 10} g/dL run {seed},2024-01-02 {rng.randint(10, 23)}:15\n')
+    hl7_path = os.path.join(folder, 'results.hl7')
+    with open(hl7_path, 'w') as f:
+        for n, test_id in enumerate(ids):
+            f.write(f'MSH|^~\\&|ANALYSER|LAB|HIMS|HOSP|20240103101500||ORU^R01|{n}|P|2.5\r'
+                    f'OBR|1|{test_id}||CBC^Complete blood count|||20240103090000\r'
+                    f'OBX|1|NM|HGB^Haemoglobin||{rng.randint(90, 170) / 10}|g/dL|13.0-17.0|N|||F|||20240103100{n % 10}\r'
+                    f'OBX|2|NM|WBC^White cells||{rng.randint(30, 150) / 10}|10*9/L|4.0-11.0|{rng.choice("NH")}|||F\r')
+    return [csv_path, hl7_path]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--results', type=int, default=100_000, help="Results per file")
+    parser.add_argument('--unknown', type=float, default=0.01, help="Share of rows with an unknown test ID")
+    parser.add_argument('--batch-size', type=int, default=lab_ingest.LAB_INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db.db_init()
+    ids = seed_tests(args.results)
+    with tempfile.TemporaryDirectory() as folder:
+        for path in write_files(folder, ids, args.unknown, seed=time.time_ns()):
+            for run in ('first run', 'replay'):
+                summary = lab_ingest.ingest_file(path, batch_size=args.batch_size)
+                print(f"{os.path.basename(path):>12} {run:>9}: {summary['rows']} rows, {summary['updated']} updated, "
+                      f"{summary['unchanged']} unchanged, {summary['unmatched']} unmatched, "
+                      f"{summary['rows'] / summary['seconds']:,.0f} rows/sec")
+                if run == 'replay':
+                    assert summary['updated'] == 0, "Replaying a file changed results"
+
+if __name__ == '__main__':
+    main()
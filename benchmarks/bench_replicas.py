@@ -0,0 +1,171 @@
+"""Throughput of several app processes sharing one database, with and without read replicas.
+
+    python -m benchmarks.bench_replicas --patients 100000 --workers 1 2 4 --seconds 10
+
+For each combination of writer (each process writes itself, or through one writer service), read
+consistency ('primary', 'snapshot', 'read_your_writes', see database.ReplicaSet) and number of
+worker processes, the benchmark database of bench_scenarios is copied afresh and the workers run
+a mix of operations for --seconds: registering a patient (--write-share of the operations) and
+then reading it back by ID, and otherwise a page of patients, a search or the prescriptions of a
+patient, through the repository with the query cache cleared. Reported are the total operations
+per second, read and write latencies, and the read-backs that did not find the patient just
+registered (stale reads, expected only with 'snapshot').
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import time
+
+CONSISTENCIES = ['primary', 'snapshot', 'read_your_writes']
+WRITERS = ['local', 'service']
+READS = ['list_page', 'search', 'by_patient']
+
+def _configure(settings):
+    """Sets config values in a new process, before anything reads them (i.e. imports database)."""
+    import config
+    for name, value in settings.items():
+        setattr(config, name, value)
+
+def run_service(settings, address):
+    _configure(settings)
+    import writer_service
+    writer_service.serve(address)
+
+def _percentiles(timings):
+    timings = sorted(timings)
+    if not timings:
+        return {'p50_ms': None, 'p95_ms': None}
+    return {'p50_ms': timings[len(timings) // 2] * 1000, 'p95_ms': timings[int(len(timings) * 0.95)] * 1000}
+
+def run_worker(settings, number, patient_ids, seconds, write_share, seed, barrier, results):
+    _configure(settings)
+    import database as db
+    import pagination
+    import query_cache
+    import repository
+    from benchmarks import bench_scenarios, datagen
+
+    rng = random.Random(seed + number)
+    if db.replicas is not None:  # Start from a snapshot, as a long-running worker would
+        db.replicas.refresh()
+    operations = {
+        'list_page': lambda: pagination.fetch_page('patient_record', rng.choice(patient_ids), 50),
+        'search': lambda: repository.patients.search(rng.choice(datagen.LAST_NAMES)),
+        'by_patient': lambda: repository.prescriptions.where('patient_id', rng.choice(patient_ids)),
+    }
+    timings = {'read': [], 'write': []}
+    stale = registered = 0
+    barrier.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        query_cache.current_cache().clear()
+        if rng.random() < write_share:
+            patient = bench_scenarios._patient(rng, number * 10_000_000 + registered)
+            start = time.perf_counter()
+            patient_id = repository.patients.create(patient)
+            timings['write'].append(time.perf_counter() - start)
+            registered += 1
+            start = time.perf_counter()
+            try:
+                repository.patients.get(patient_id)
+            except repository.RecordNotFound:
+                stale += 1
+            timings['read'].append(time.perf_counter() - start)
+        else:
+            operation = operations[rng.choice(READS)]
+            start = time.perf_counter()
+            operation()
+            timings['read'].append(time.perf_counter() - start)
+    if db.replicas is not None:
+        db.replicas.close()  # atexit handlers do not run in multiprocessing children
+    results.put({'timings': timings, 'stale': stale, 'registered': registered})
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def run(args, writer, consistency, workers, patient_ids):
+    """Runs one configuration on a fresh copy of the database and returns its results."""
+    from benchmarks import bench_scenarios
+    path = bench_scenarios.prepare_database(args.data_dir, args.patients, args.seed)
+    settings = {'database_name': path[:-len('.db')], 'read_consistency': consistency,
+                'replica_refresh_seconds': args.refresh, 'replica_dir': os.path.join(args.data_dir, 'replicas'),
+                'writer_service_authkey': 'bench', 'writer_service_address': None}
+    context = multiprocessing.get_context('spawn')  # Each process reads its own config settings
+    service = None
+    if writer == 'service':
+        settings['writer_service_address'] = ('127.0.0.1', _free_port())
+        service = context.Process(target=run_service, args=(dict(settings), settings['writer_service_address']),
+                                  daemon=True)
+        service.start()
+        time.sleep(1)  # Let it start listening
+    barrier = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=run_worker, args=(settings, n, patient_ids, args.seconds, args.write_share,
+                                                          args.seed, barrier, results))
+                 for n in range(workers)]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    if service is not None:
+        service.terminate()
+        service.join()
+    reads = [t for outcome in outcomes for t in outcome['timings']['read']]
+    writes = [t for outcome in outcomes for t in outcome['timings']['write']]
+    registered = sum(outcome['registered'] for outcome in outcomes)
+    return {'writer': writer, 'consistency': consistency, 'workers': workers,
+            'ops_per_sec': (len(reads) + len(writes)) / args.seconds,
+            'read': _percentiles(reads), 'write': _percentiles(writes),
+            'stale_reads': sum(outcome['stale'] for outcome in outcomes), 'registered': registered}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--writer', nargs='+', choices=WRITERS, default=WRITERS)
+    parser.add_argument('--consistency', nargs='+', choices=CONSISTENCIES, default=CONSISTENCIES)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-share', type=float, default=0.1, help="Share of operations that register a patient")
+    parser.add_argument('--refresh', type=float, default=2, help="Seconds between replica refreshes")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'hims-bench'))
+    parser.add_argument('--json', help="Save the results to this file")
+    args = parser.parse_args()
+
+    import database as db
+    from benchmarks import bench_scenarios
+    db.DATABASE_PATH = bench_scenarios.prepare_database(args.data_dir, args.patients, args.seed)
+    db.create_tables()
+    conn = db.create_connection()
+    try:
+        patient_ids = bench_scenarios._ids(conn, 'patient_record', 1000, random.Random(args.seed))
+    finally:
+        conn.close()
+
+    print(f"{'writer':>8} {'consistency':>17} {'workers':>7} {'ops/s':>8} {'read p50':>9} {'read p95':>9} "
+          f"{'write p50':>10} {'write p95':>10} {'stale':>9}")
+    all_results = []
+    for writer in args.writer:
+        for consistency in args.consistency:
+            for workers in args.workers:
+                result = run(args, writer, consistency, workers, patient_ids)
+                all_results.append(result)
+                print(f"{writer:>8} {consistency:>17} {workers:>7} {result['ops_per_sec']:>8.0f} "
+                      f"{result['read']['p50_ms'] or 0:>9.2f} {result['read']['p95_ms'] or 0:>9.2f} "
+                      f"{result['write']['p50_ms'] or 0:>10.2f} {result['write']['p95_ms'] or 0:>10.2f} "
+                      f"{result['stale_reads']:>4}/{result['registered']:<4}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'patients': args.patients, 'seed': args.seed, 'seconds': args.seconds,
+                       'write_share': args.write_share, 'refresh': args.refresh, 'results': all_results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""Scenario benchmarks of the data-access layer on a synthetic hospital database.
+
+    python -m benchmarks.bench_scenarios --patients 100000 --ops 200 --json before.json
+    python -m benchmarks.bench_scenarios --patients 100000 --ops 200 --compare before.json
+
+The database for --patients and --seed is generated once with benchmarks.datagen and kept in
+--data-dir. Every run works on a fresh copy of it, so runs start from the same rows and can be
+compared between commits. Each scenario calls the functions the Streamlit pages use (repository,
+patient_chart, pagination), without Streamlit, on IDs drawn with the seed:
+
+    register                   repository.patients.create
+    prescribe                  repository.prescriptions.create with 1-4 medicines
+    chart_view                 patient_chart.load_chart
+    list_all                   row count plus one page of show_all_patients at a random position
+    prescriptions_by_patient   repository.prescriptions.where('patient_id', ...)
+    search                     repository.patients.search on a name or city
+    delete_with_fk_check       repository.patients.delete, half on patients whose records block it
+
+Caches are cleared before every operation (unless --warm), so timings are those of the database.
+--compare prints the change against an earlier --json file and exits with status 1 if a
+scenario's p50 or p95 got slower by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3 as sql
+import subprocess
+import sys
+import tempfile
+import time
+
+import database as db
+from benchmarks import datagen
+
+SCENARIOS = ['register', 'prescribe', 'chart_view', 'list_all', 'prescriptions_by_patient', 'search',
+             'delete_with_fk_check']
+PAGE_SIZE = 500
+OUTCOMES = ('deleted', 'blocked')
+
+def prepare_database(data_dir, patients, seed):
+    """Returns the path of a fresh working copy of the generated database."""
+    os.makedirs(data_dir, exist_ok=True)
+    source = os.path.join(data_dir, f'hims_{patients}_{seed}_v{datagen.VERSION}.db')
+    if not os.path.exists(source):
+        print(f"Generating {source} ...", file=sys.stderr)
+        datagen.generate(source, patients, seed)
+    copy = os.path.join(data_dir, f'hims_{patients}_{seed}_v{datagen.VERSION}.run.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(copy + suffix):
+            os.remove(copy + suffix)
+    shutil.copyfile(source, copy)
+    return copy
+
+def _ids(conn, table, count, rng, where=''):
+    """count random IDs of table (rowids are dense, as datagen inserts in order)."""
+    c = conn.cursor()
+    c.execute(f"SELECT max(rowid) FROM {table}")
+    top = c.fetchone()[0]
+    ids = []
+    while len(ids) < count:
+        c.execute(f"SELECT id FROM {table} WHERE rowid = ? {where}", (rng.randint(1, top),))
+        row = c.fetchone()
+        if row:
+            ids.append(row[0])
+    return ids
+
+def _patient(rng, n):
+    name = f"{rng.choice(datagen.FIRST_NAMES)} {rng.choice(datagen.LAST_NAMES)}"
+    city, state, pin = rng.choice(datagen.CITIES)
+    return {'name': name, 'gender': rng.choice(['Male', 'Female']), 'date_of_birth': '15-06-1980',
+            'blood_group': rng.choice(datagen.BLOOD_GROUPS), 'contact_number_1': f'7{n:09d}',
+            'aadhar_or_voter_id': f'BENCH-{n}', 'address': '1 Bench Road', 'city': city,
+            'state': state, 'pin_code': pin + '01', 'next_of_kin_name': 'Kin', 'next_of_kin_relation_to_patient': 'Sibling',
+            'next_of_kin_contact_number': f'6{n:09d}'}
+
+def build_operations(ops, seed):
+    """Returns {scenario: [zero-argument callables]}, all inputs drawn from the seed up front."""
+    import patient_chart
+    import pagination
+    import query_cache
+    import repository
+
+    rng = random.Random(seed)
+    conn = db.create_connection()
+    try:
+        patients = _ids(conn, 'patient_record', ops, rng)
+        doctors = _ids(conn, 'doctor_record', ops, rng)
+        has_records = "AND EXISTS (SELECT 1 FROM medical_test_record t WHERE t.patient_id = patient_record.id)"
+        no_records = ("AND NOT EXISTS (SELECT 1 FROM medical_test_record t WHERE t.patient_id = patient_record.id) "
+                      "AND NOT EXISTS (SELECT 1 FROM prescription_record p WHERE p.patient_id = patient_record.id)")
+        blocked = _ids(conn, 'patient_record', ops // 2, rng, has_records)
+        free = list(dict.fromkeys(_ids(conn, 'patient_record', ops - ops // 2, rng, no_records)))
+    finally:
+        conn.close()
+    no_cache = query_cache.QueryCache(max_bytes=0)  # Caches nothing: every page comes from the database
+    terms = [rng.choice([rng.choice(datagen.FIRST_NAMES), rng.choice(datagen.LAST_NAMES), rng.choice(datagen.CITIES)[0]])
+             for _ in range(ops)]
+
+    def list_all(after_id):
+        pagination.invalidate_count('patient_record')
+        pagination.count_rows('patient_record')
+        return pagination.fetch_page('patient_record', after_id, PAGE_SIZE, cache=no_cache)
+
+    def delete(patient_id):
+        try:
+            repository.patients.delete(patient_id)
+            return 'deleted'
+        except sql.IntegrityError:
+            return 'blocked'
+
+    prescriptions = [{'patient_id': patient_id, 'doctor_id': doctor_id, 'diagnosis': rng.choice(datagen.DIAGNOSES),
+                      'medicines': rng.sample(datagen.MEDICINES, rng.randint(1, 4))}
+                     for patient_id, doctor_id in zip(patients, doctors)]
+    registrations = [_patient(rng, n) for n in range(ops)]
+    deletions = blocked + free
+    rng.shuffle(deletions)
+    return {
+        'register': [lambda p=p: repository.patients.create(p) for p in registrations],
+        'prescribe': [lambda p=p: repository.prescriptions.create(p) for p in prescriptions],
+        'chart_view': [lambda p=p: patient_chart.load_chart(p) for p in patients],
+        'list_all': [lambda p=p: list_all(p) for p in patients],
+        'prescriptions_by_patient': [lambda p=p: repository.prescriptions.where('patient_id', p) for p in patients],
+        'search': [lambda t=t: repository.patients.search(t) for t in terms],
+        'delete_with_fk_check': [lambda p=p: delete(p) for p in deletions],
+    }
+
+def clear_caches():
+    import lookup_cache
+    import patient_chart
+    import query_cache
+    query_cache.current_cache().clear()
+    lookup_cache.cache.clear()
+    patient_chart.cache.clear()
+
+def run_scenario(operations, warm):
+    timings = []
+    outcomes = {}
+    for operation in operations:
+        if not warm:
+            clear_caches()
+        start = time.perf_counter()
+        result = operation()
+        timings.append(time.perf_counter() - start)
+        if isinstance(result, str) and result in OUTCOMES:
+            outcomes[result] = outcomes.get(result, 0) + 1
+    timings.sort()
+    def percentile(q):
+        return timings[min(len(timings) - 1, int(len(timings) * q))] * 1000
+    result = {'ops': len(timings), 'ops_per_sec': len(timings) / sum(timings), 'mean_ms': sum(timings) / len(timings) * 1000,
+              'p50_ms': percentile(0.5), 'p95_ms': percentile(0.95), 'p99_ms': percentile(0.99), 'max_ms': timings[-1] * 1000}
+    if outcomes:
+        result['outcomes'] = outcomes
+    return result
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(results, baseline, threshold):
+    """Prints the change of each scenario's p50/p95 against baseline; returns the regressed scenario names."""
+    regressions = []
+    print(f"\n{'scenario':>26} {'p50 before':>11} {'p50 now':>9} {'change':>7} {'p95 before':>11} {'p95 now':>9} {'change':>7}")
+    for name, result in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        changes = [(result[key] - before[key]) / before[key] if before[key] else 0.0 for key in ('p50_ms', 'p95_ms')]
+        if any(change > threshold for change in changes):
+            regressions.append(name)
+        print(f"{name:>26} {before['p50_ms']:>11.2f} {result['p50_ms']:>9.2f} {changes[0]:>+7.0%} "
+              f"{before['p95_ms']:>11.2f} {result['p95_ms']:>9.2f} {changes[1]:>+7.0%}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', help=f"Any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument('--patients', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--ops', type=int, default=200, help="Operations per scenario")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'hims-bench'))
+    parser.add_argument('--warm', action='store_true', help="Keep caches between operations")
+    parser.add_argument('--json', help="Save the results to this file")
+    parser.add_argument('--compare', help="Results file of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Slowdown counted as a regression")
+    args = parser.parse_args()
+    args.scenarios = args.scenarios or SCENARIOS
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    db.DATABASE_PATH = prepare_database(args.data_dir, args.patients, args.seed)
+    db.create_tables()  # Migrations added since the data was generated
+    operations = build_operations(args.ops, args.seed)
+    results = {'meta': {'commit': _commit(), 'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'patients': args.patients,
+                        'seed': args.seed, 'ops': args.ops, 'warm': args.warm, 'python': platform.python_version(),
+                        'sqlite': sql.sqlite_version, 'platform': platform.platform()},
+               'scenarios': {}}
+    print(f"{'scenario':>26} {'ops/s':>9} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name in args.scenarios:
+        result = results['scenarios'][name] = run_scenario(operations[name], args.warm)
+        print(f"{name:>26} {result['ops_per_sec']:>9.0f} {result['mean_ms']:>9.2f} {result['p50_ms']:>8.2f} "
+              f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['max_ms']:>8.2f}"
+              + (f"  {result['outcomes']}" if 'outcomes' in result else ''))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\nSlower than the baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
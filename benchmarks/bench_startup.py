@@ -0,0 +1,98 @@
+"""Import-time profile of hims_app.py and of each page module it loads on demand.
+
+    python -m benchmarks.bench_startup --repeat 5 --json startup.json
+    python -m benchmarks.bench_startup --compare startup.json
+
+Each target is run in a fresh interpreter with -X importtime (hims_app.py runs in Streamlit's bare
+mode, i.e. up to the password prompt). The report lists the total import time of each target and
+the slowest imports of the app itself; --json saves the result so that later runs can be compared
+against it with --compare.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What the app imports at startup, and what selecting each module in the sidebar adds
+TARGETS = {
+    'hims_app': ['hims_app.py'],
+    'patient': ['-c', 'import patient'],
+    'doctor': ['-c', 'import doctor'],
+    'prescription': ['-c', 'import prescription'],
+    'medical_test': ['-c', 'import medical_test'],
+    'patient_chart': ['-c', 'import patient_chart'],
+    'lab_analytics': ['-c', 'import lab_analytics'],
+    'revenue': ['-c', 'import revenue'],
+    'export': ['-c', 'import export'],
+}
+
+def import_times(args):
+    """Runs python -X importtime args; returns [(module, self us, cumulative us)] in report order.
+
+    Nested imports keep the indentation of their module name.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    completed = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=ROOT, env=env,
+                               capture_output=True, text=True)
+    times = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return times
+
+def profile(target, repeat):
+    """Best of `repeat` runs: total import time in ms and the per-module times of that run."""
+    best = None
+    for _ in range(repeat):
+        times = import_times(TARGETS[target])
+        # Top-level imports are the ones printed without indentation; their cumulative times add up
+        total = sum(cumulative for name, _, cumulative in times if name[1:2] != ' ')
+        if best is None or total < best[0]:
+            best = (total, times)
+    total, times = best
+    return {'total_ms': total / 1000, 'modules': {name.strip(): cumulative / 1000 for name, _, cumulative in times}}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('targets', nargs='*', help=f"Any of {', '.join(TARGETS)} (default: all)")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per target (the fastest is kept)")
+    parser.add_argument('--top', type=int, default=15, help="Slowest app imports to list")
+    parser.add_argument('--json', help="Save the results to this file")
+    parser.add_argument('--compare', help="Results file of an earlier run to compare against")
+    args = parser.parse_args()
+    args.targets = args.targets or list(TARGETS)
+    unknown = set(args.targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    results = {target: profile(target, args.repeat) for target in args.targets}
+
+    print(f"{'target':>14} {'import ms':>10} {'baseline':>10} {'change':>8}")
+    for target, result in results.items():
+        line = f"{target:>14} {result['total_ms']:>10.1f}"
+        if target in baseline:
+            before = baseline[target]['total_ms']
+            line += f" {before:>10.1f} {(result['total_ms'] - before) / before:>+8.0%}"
+        print(line)
+
+    if 'hims_app' in results:
+        print("\nSlowest imports at app startup (cumulative ms):")
+        modules = results['hims_app']['modules']
+        for name, ms in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"{ms:>10.1f}  {name}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
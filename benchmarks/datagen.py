@@ -0,0 +1,226 @@
+"""Seeded generator of a synthetic hospital database for benchmarks.
+
+    python -m benchmarks.datagen /tmp/hims_100k.db --patients 100000 --seed 42
+
+Builds the current schema (through the migrations) and fills it in chunks, so sizes from 10k to 10M
+patients stay within a constant amount of memory. The same seed and sizes always give the same
+rows, including IDs, which have the format of id_generator but are derived from the row number and
+a fixed start date. Fan-out follows a front-desk register: about one doctor per 250 patients spread
+over DEPARTMENTS, a skewed number of prescriptions (1-4 medicines each) and medical tests per
+patient (many have none, a few have dozens), registration dates over the last five years and
+tests after registration.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import database as db
+from id_generator import ALPHABET, _encode, _PAIRS
+
+DEPARTMENTS = ['General Medicine', 'Cardiology', 'Orthopaedics', 'Paediatrics', 'Gynaecology',
+               'Neurology', 'Oncology', 'Dermatology', 'ENT', 'Ophthalmology', 'Psychiatry',
+               'Nephrology', 'Urology', 'Gastroenterology', 'Pulmonology', 'Endocrinology',
+               'Radiology', 'Pathology', 'Emergency', 'Anaesthesiology']
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Krishna', 'Ishaan',
+               'Rohan', 'Ananya', 'Diya', 'Aadhya', 'Saanvi', 'Pari', 'Anika', 'Navya', 'Myra', 'Sara',
+               'Meera', 'Priya', 'Kavya', 'Lakshmi', 'Fatima', 'Zoya', 'Rahul', 'Vikram', 'Suresh',
+               'Ramesh', 'Joseph', 'Maria', 'Thomas', 'Neha', 'Pooja', 'Arnav', 'Kabir', 'Tara']
+LAST_NAMES = ['Sharma', 'Verma', 'Gupta', 'Iyer', 'Nair', 'Reddy', 'Patel', 'Shah', 'Mehta', 'Khan',
+              'Singh', 'Kumar', 'Das', 'Bose', 'Menon', 'Pillai', 'Rao', 'Joshi', 'Kulkarni', 'Desai',
+              'Fernandes', "D'Souza", 'Chatterjee', 'Banerjee', 'Mishra', 'Yadav', 'Naidu', 'Thomas']
+CITIES = [('Mumbai', 'MH', '4000'), ('Pune', 'MH', '4110'), ('Delhi', 'DL', '1100'),
+          ('Bengaluru', 'KA', '5600'), ('Chennai', 'TN', '6000'), ('Hyderabad', 'TS', '5000'),
+          ('Kolkata', 'WB', '7000'), ('Ahmedabad', 'GJ', '3800'), ('Kochi', 'KL', '6820'),
+          ('Jaipur', 'RJ', '3020'), ('Lucknow', 'UP', '2260'), ('Bhopal', 'MP', '4620')]
+BLOOD_GROUPS = ['O+', 'O+', 'O+', 'B+', 'B+', 'A+', 'A+', 'AB+', 'O-', 'B-', 'A-', 'AB-']
+DIAGNOSES = ['Hypertension', 'Type 2 diabetes', 'Viral fever', 'Upper respiratory tract infection',
+             'Gastritis', 'Migraine', 'Lower back pain', 'Asthma', 'Anaemia', 'Hypothyroidism',
+             'Urinary tract infection', 'Allergic rhinitis', 'Osteoarthritis', 'Dengue fever']
+MEDICINES = [('Paracetamol 500mg', '1 tablet thrice daily'), ('Amoxicillin 500mg', '1 capsule twice daily'),
+             ('Metformin 500mg', '1 tablet after meals'), ('Amlodipine 5mg', '1 tablet daily'),
+             ('Pantoprazole 40mg', '1 tablet before breakfast'), ('Cetirizine 10mg', '1 tablet at night'),
+             ('Salbutamol inhaler', '2 puffs when needed'), ('Levothyroxine 50mcg', '1 tablet empty stomach'),
+             ('Ibuprofen 400mg', '1 tablet when needed'), ('Ferrous sulphate', '1 tablet daily'),
+             ('Azithromycin 500mg', '1 tablet daily for 3 days'), ('ORS', '1 sachet after each loose stool')]
+TESTS = [('Complete blood count', 300), ('Lipid profile', 600), ('HbA1c', 450), ('Thyroid profile', 550),
+         ('Liver function test', 700), ('Kidney function test', 650), ('Urine routine', 150),
+         ('Chest X-ray', 400), ('ECG', 250), ('Dengue NS1 antigen', 800), ('Vitamin D', 1200), ('MRI brain', 6500)]
+RESULTS = ['Within normal limits', 'Mildly elevated', 'Low', 'High, review advised',
+           'Borderline, repeat in 3 months', 'Positive', 'Negative']
+AWAITED = "Test result awaited"
+
+PATIENTS_PER_DOCTOR = 250
+MEAN_PRESCRIPTIONS = 3.0
+MEAN_TESTS = 4.0
+MLS_COUNT = 40  # Medical lab scientists (IDs only; they have no table)
+START = datetime(2020, 1, 1)
+EPOCH = datetime(1970, 1, 1)
+DAYS = 5 * 365
+DEFAULT_CHUNK_SIZE = 20_000
+VERSION = 2  # Bump when a change to the generator changes its output
+
+INSERTS = {
+    'department_record': ['id', 'name', 'description', 'contact_number_1', 'contact_number_2', 'address', 'email_id'],
+    'doctor_record': ['id', 'name', 'age', 'gender', 'date_of_birth', 'blood_group', 'department_id',
+                      'contact_number_1', 'contact_number_2', 'aadhar_or_voter_id', 'email_id',
+                      'qualification', 'specialisation', 'years_of_experience', 'address', 'city',
+                      'state', 'pin_code'],
+    'patient_record': ['id', 'name', 'age', 'gender', 'date_of_birth', 'blood_group', 'contact_number_1',
+                       'contact_number_2', 'aadhar_or_voter_id', 'weight', 'height', 'address', 'city',
+                       'state', 'pin_code', 'next_of_kin_name', 'next_of_kin_relation_to_patient',
+                       'next_of_kin_contact_number', 'email_id', 'date_of_registration',
+                       'time_of_registration'],
+    'prescription_record': ['id', 'patient_id', 'doctor_id', 'diagnosis', 'comments'],
+    'prescription_item': ['prescription_id', 'position', 'medicine_name', 'dosage_description'],
+    'medical_test_record': ['id', 'test_name', 'patient_id', 'doctor_id', 'medical_lab_scientist_id',
+                            'test_date_time', 'result_date_time', 'result_and_diagnosis', 'description',
+                            'comments', 'cost'],
+}
+
+def make_id(prefix, n, when):
+    """An ID in id_generator's format for row n created at `when`; n takes the node+sequence bits."""
+    ms = (when - EPOCH) // timedelta(milliseconds=1)  # Naive times as UTC, so IDs don't depend on the timezone
+    tail = n & ((1 << 25) - 1)
+    return f'{prefix}-{_encode(ms, 10)}-{_PAIRS[tail >> 15]}{_PAIRS[(tail >> 5) & 1023]}{ALPHABET[tail & 31]}'
+
+def _skewed(rng, mean):
+    """Geometric count with the given mean: many zeros and ones, a long tail."""
+    p = 1 / (mean + 1)
+    count = 0
+    while rng.random() > p:
+        count += 1
+    return count
+
+def _person(rng):
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    city, state, pin = rng.choice(CITIES)
+    dob = START - timedelta(days=rng.randrange(365, 90 * 365))
+    return name, city, state, pin + f'{rng.randrange(100):02d}', dob
+
+def _age(dob, on):
+    return on.year - dob.year - ((on.month, on.day) < (dob.month, dob.day))
+
+def sizes_for(patients):
+    """Row counts the generator aims for (prescriptions and tests are approximate)."""
+    return {'department_record': len(DEPARTMENTS), 'doctor_record': max(len(DEPARTMENTS), patients // PATIENTS_PER_DOCTOR),
+            'patient_record': patients, 'prescription_record': int(patients * MEAN_PRESCRIPTIONS),
+            'medical_test_record': int(patients * MEAN_TESTS)}
+
+def _rows(patients, seed):
+    """Yields (table, row) in insert order: departments, doctors, then each patient with their records."""
+    rng = random.Random(seed)
+    today = START + timedelta(days=DAYS)
+    departments = [f'D{n}' for n in range(1, len(DEPARTMENTS) + 1)]
+    for n, (department_id, name) in enumerate(zip(departments, DEPARTMENTS)):
+        yield 'department_record', (department_id, name, f"Department of {name}", f'02226{n:05d}', '',
+                                    f"Block {chr(65 + n)}, Main Hospital", f"{name.lower().replace(' ', '.')}@hims.example")
+
+    doctors = []
+    for n in range(sizes_for(patients)['doctor_record']):
+        name, city, state, pin, dob = _person(rng)
+        doctor_id = make_id('DR', n, START)
+        department = n % len(departments)
+        doctors.append(doctor_id)
+        yield 'doctor_record', (doctor_id, f"Dr. {name}", _age(dob, today), rng.choice(['Male', 'Female']),
+                                dob.strftime('%d-%m-%Y'), rng.choice(BLOOD_GROUPS), departments[department],
+                                f'98{n:08d}', '', f'DRID{n:010d}', f'doctor{n}@hims.example', 'MBBS, MD',
+                                DEPARTMENTS[department], rng.randrange(1, 35), f"{rng.randrange(1, 500)} Park Road",
+                                city, state, pin)
+
+    prescription_n = test_n = 0
+    for n in range(patients):
+        name, city, state, pin, dob = _person(rng)
+        registered = START + timedelta(days=DAYS * n / patients, seconds=rng.randrange(8 * 3600, 20 * 3600))
+        patient_id = make_id('P', n, registered)
+        yield 'patient_record', (patient_id, name, _age(dob, today), rng.choice(['Male', 'Female']),
+                                 dob.strftime('%d-%m-%Y'), rng.choice(BLOOD_GROUPS), f'9{n:09d}', '',
+                                 f'AADHAR{n:012d}', rng.randrange(3, 120), rng.randrange(50, 200),
+                                 f"{rng.randrange(1, 900)} {rng.choice(LAST_NAMES)} Nagar", city, state, pin,
+                                 f"{rng.choice(FIRST_NAMES)} {name.split()[1]}",
+                                 rng.choice(['Spouse', 'Parent', 'Sibling', 'Child']), f'8{n:09d}', '',
+                                 registered.strftime('%Y-%m-%d'), registered.strftime('%H:%M:%S'))
+        # A patient mostly sees the same few doctors
+        own_doctors = [rng.choice(doctors) for _ in range(2)]
+        for _ in range(_skewed(rng, MEAN_PRESCRIPTIONS)):
+            prescription_id = make_id('M', prescription_n, registered)
+            prescription_n += 1
+            yield 'prescription_record', (prescription_id, patient_id, rng.choice(own_doctors),
+                                          rng.choice(DIAGNOSES), '')
+            for position, (medicine, dosage) in enumerate(rng.sample(MEDICINES, rng.randint(1, 4)), start=1):
+                yield 'prescription_item', (prescription_id, position, medicine, dosage)
+        for _ in range(_skewed(rng, MEAN_TESTS)):
+            tested = registered + timedelta(days=rng.randrange(0, max(1, (today - registered).days)),
+                                            minutes=rng.randrange(0, 600))
+            test_name, cost = rng.choice(TESTS)
+            resulted = tested + timedelta(hours=rng.randint(1, 72))
+            result = rng.choice(RESULTS)
+            if resulted > today:  # Still with the lab at the end of the data
+                result = AWAITED
+            yield 'medical_test_record', (make_id('T', test_n, tested), test_name, patient_id, rng.choice(own_doctors),
+                                          f'MLS-{rng.randrange(MLS_COUNT):03d}', tested.strftime('%Y-%m-%d %H:%M'),
+                                          resulted.strftime('%Y-%m-%d %H:%M'), result, '', '', cost)
+            test_n += 1
+
+def generate(path, patients, seed=42, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Creates a database at path filled with synthetic data; returns the row counts.
+
+    Fails if path already exists, so a benchmark database is never mixed with other data.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists")
+    db.DATABASE_PATH = path
+    db.create_tables()
+    conn = db.create_connection()
+    conn.execute("PRAGMA synchronous = OFF")  # A crash only loses a database we can regenerate
+    queries = {table: f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+               for table, columns in INSERTS.items()}
+    counts = dict.fromkeys(INSERTS, 0)
+    pending = {table: [] for table in INSERTS}
+
+    def flush():
+        for table, rows in pending.items():  # Parents before children
+            if rows:
+                conn.executemany(queries[table], rows)
+                counts[table] += len(rows)
+                rows.clear()
+        conn.commit()
+        if progress:
+            progress(counts)
+
+    buffered = 0
+    for table, row in _rows(patients, seed):
+        pending[table].append(row)
+        buffered += 1
+        if buffered >= chunk_size:
+            flush()
+            buffered = 0
+    flush()
+    conn.execute("ANALYZE")
+    conn.close()
+    with open(path + '.json', 'w') as f:
+        json.dump({'patients': patients, 'seed': seed, 'version': VERSION, 'counts': counts}, f, indent=2)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help="Database file to create (must not exist)")
+    parser.add_argument('--patients', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    def report(counts):
+        rows = sum(counts.values())
+        print(f"\r{counts['patient_record']:,} patients, {rows:,} rows ({rows / (time.perf_counter() - start):,.0f} rows/sec)",
+              end='', flush=True)
+    counts = generate(args.path, args.patients, args.seed, args.chunk_size, progress=report)
+    print()
+    for table, count in counts.items():
+        print(f"{table:>20} {count:>12,}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""Streaming bulk import of legacy registers into patient_record, doctor_record and medical_test_record.
+
+The source file (CSV or Parquet) is read in chunks. Each chunk is validated with the same
+required-field rules as the Streamlit forms, derived columns (age, ISO dates, IDs) are filled in
+with vectorised pandas operations, and the valid rows are inserted with one bulk load per chunk
+(executemany on SQLite, COPY on PostgreSQL) inside a single transaction. Rows that fail validation
+or a database constraint are written to a rejected-rows CSV with the reason. The full-text search
+triggers of the table are suspended while a chunk is inserted, and the chunk is indexed with one
+statement afterwards. Once a chunk has committed, the app's caches of the table are invalidated as
+for a repository write, so the imported rows show up (and their IDs resolve) straight away.
+
+The same transaction records in bulk_import_checkpoint how many source rows are done, so an
+interrupted import resumes after the last committed chunk and never inserts a row twice (the IDs
+it generates differ between runs). Only the rejected-rows report of a chunk committed just before
+the interruption can be missing.
+
+    python bulk_import.py patient_record legacy_patients.csv --chunk-size 50000
+"""
+import argparse
+import os
+import sqlite3 as sql
+import time
+from datetime import date, datetime
+
+import pandas as pd
+
+import database as db
+import id_generator
+import migrations
+import repository
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pq = None
+
+DEFAULT_CHUNK_SIZE = 50_000
+SQLITE_MAX_PARAMS = 900
+
+# Per table: insert column order, fields the form requires, ID prefix and derived columns.
+TABLES = {
+    'patient_record': {
+        'columns': ['id', 'name', 'age', 'gender', 'date_of_birth', 'blood_group',
+                    'contact_number_1', 'contact_number_2', 'aadhar_or_voter_id',
+                    'weight', 'height', 'address', 'city', 'state', 'pin_code',
+                    'next_of_kin_name', 'next_of_kin_relation_to_patient',
+                    'next_of_kin_contact_number', 'email_id',
+                    'date_of_registration', 'time_of_registration'],
+        'required': ['name', 'gender', 'date_of_birth', 'blood_group', 'contact_number_1',
+                     'aadhar_or_voter_id', 'next_of_kin_name', 'next_of_kin_relation_to_patient',
+                     'next_of_kin_contact_number', 'address', 'city', 'state', 'pin_code'],
+        'unique': ['id', 'aadhar_or_voter_id'],
+        'prefix': 'P',
+    },
+    'doctor_record': {
+        'columns': ['id', 'name', 'age', 'gender', 'date_of_birth', 'blood_group',
+                    'department_id', 'contact_number_1', 'contact_number_2',
+                    'aadhar_or_voter_id', 'email_id', 'qualification', 'specialisation',
+                    'years_of_experience', 'address', 'city', 'state', 'pin_code'],
+        'required': ['name', 'gender', 'date_of_birth', 'blood_group', 'department_id',
+                     'contact_number_1', 'aadhar_or_voter_id', 'email_id', 'qualification',
+                     'specialisation', 'address', 'city', 'state', 'pin_code'],
+        'unique': ['id', 'aadhar_or_voter_id', 'email_id'],
+        'prefix': 'DR',
+    },
+    'medical_test_record': {
+        'columns': ['id', 'test_name', 'patient_id', 'doctor_id',
+                    'medical_lab_scientist_id', 'test_date_time', 'result_date_time', 'cost',
+                    'result_and_diagnosis', 'description', 'comments'],
+        'required': ['test_name', 'patient_id', 'doctor_id', 'medical_lab_scientist_id',
+                     'test_date_time', 'result_date_time'],
+        'unique': ['id'],
+        'prefix': 'T',
+    },
+}
+
+NUMERIC_COLUMNS = {'weight', 'height', 'years_of_experience', 'cost'}
+
+
+# --- Reading ---
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields DataFrames of at most chunk_size rows, all values as strings ('' for missing)."""
+    if path.lower().endswith(('.parquet', '.pq')):
+        if pq is None:
+            raise RuntimeError("Reading Parquet files requires the pyarrow package")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            # Arrow dtypes keep integer columns with nulls as integers ('7', not '7.0')
+            frame = batch.to_pandas(types_mapper=pd.ArrowDtype)
+            yield frame.astype(object).where(frame.notna(), '').astype(str)
+    else:
+        yield from pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size)
+
+
+# --- Validation and derived columns ---
+def calculate_ages(date_of_birth):
+    """Vectorised calculate_age over a Series of DD-MM-YYYY strings (NaN where unparseable)."""
+    # Birth dates repeat a lot in large registers, so parse each distinct string only once
+    distinct = pd.Series(date_of_birth.unique())
+    parsed = pd.Series(pd.to_datetime(distinct, format='%d-%m-%Y', errors='coerce').values, index=distinct)
+    dob = date_of_birth.map(parsed)
+    today = date.today()
+    before_birthday = (today.month * 100 + today.day) < (dob.dt.month * 100 + dob.dt.day)
+    return today.year - dob.dt.year - before_birthday.astype(int)
+
+def normalise_dates(values, iso_format, legacy_format):
+    """Converts date strings in iso_format or the legacy DD-MM-YYYY layout to iso_format.
+
+    Returns (converted Series, mask of values that match neither format).
+    """
+    distinct = pd.Series(values.unique())
+    parsed = pd.to_datetime(distinct, format=iso_format, errors='coerce')
+    legacy = pd.to_datetime(distinct, format=legacy_format, errors='coerce')
+    parsed = parsed.where(parsed.notna(), legacy)
+    converted = pd.Series(parsed.dt.strftime(iso_format).values, index=distinct)
+    result = values.map(converted)
+    return result.fillna(''), result.isna()
+
+def existing_ids(conn, table_name, ids):
+    """Returns the subset of ids present in a table, querying in parameter-sized batches."""
+    ids = list(ids)
+    found = set()
+    for i in range(0, len(ids), SQLITE_MAX_PARAMS):
+        batch = ids[i:i + SQLITE_MAX_PARAMS]
+        placeholders = ', '.join('?' * len(batch))
+        found.update(row[0] for row in conn.execute(f"SELECT id FROM {table_name} WHERE id IN ({placeholders})", batch))
+    return found
+
+def _reject(reasons, mask, reason):
+    reasons[mask & (reasons == '')] = reason
+
+def prepare_chunk(conn, table_name, chunk):
+    """Validates a chunk and fills derived columns.
+
+    Returns (valid rows as a DataFrame in insert column order, rejected rows with a reject_reason column).
+    """
+    spec = TABLES[table_name]
+    df = chunk.copy()
+    for column in spec['columns']:
+        if column not in df.columns:
+            df[column] = ''
+        elif df[column].dtype != object or df[column].isna().any():
+            df[column] = df[column].fillna('').astype(str)
+    reasons = pd.Series('', index=df.index, dtype=object)
+
+    for column in spec['required']:
+        _reject(reasons, df[column] == '', f"missing {column}")
+
+    now = datetime.now()
+    missing_id = df['id'] == ''
+    if missing_id.any():
+        df.loc[missing_id, 'id'] = id_generator.generate_ids(spec['prefix'], int(missing_id.sum()))
+
+    for column in NUMERIC_COLUMNS.intersection(spec['columns']):
+        values = pd.to_numeric(df[column].replace('', '0'), errors='coerce')
+        _reject(reasons, values.isna() | (values < 0), f"invalid {column}")
+        df[column] = values.fillna(0).astype(int)
+
+    if 'age' in spec['columns']:
+        ages = calculate_ages(df['date_of_birth'])
+        _reject(reasons, ages.isna() | (ages < 0), "invalid date_of_birth (expected DD-MM-YYYY)")
+        df['age'] = ages.fillna(0).astype(int)
+
+    if table_name == 'patient_record':
+        df.loc[df['date_of_registration'] == '', 'date_of_registration'] = now.strftime('%Y-%m-%d')
+        df.loc[df['time_of_registration'] == '', 'time_of_registration'] = now.strftime('%H:%M:%S')
+        df['date_of_registration'], invalid = normalise_dates(df['date_of_registration'], '%Y-%m-%d', '%d-%m-%Y')
+        _reject(reasons, invalid, "invalid date_of_registration")
+    elif table_name == 'doctor_record':
+        departments = existing_ids(conn, 'department_record', df['department_id'].unique())
+        _reject(reasons, ~df['department_id'].isin(departments), "unknown department_id")
+    elif table_name == 'medical_test_record':
+        patients = existing_ids(conn, 'patient_record', df['patient_id'].unique())
+        doctors = existing_ids(conn, 'doctor_record', df['doctor_id'].unique())
+        _reject(reasons, ~df['patient_id'].isin(patients), "unknown patient_id")
+        _reject(reasons, ~df['doctor_id'].isin(doctors), "unknown doctor_id")
+        df.loc[df['result_and_diagnosis'] == '', 'result_and_diagnosis'] = "Test result awaited"
+        for column in ('test_date_time', 'result_date_time'):
+            df[column], invalid = normalise_dates(df[column], '%Y-%m-%d %H:%M', '%d-%m-%Y (%H:%M)')
+            _reject(reasons, invalid, f"invalid {column}")
+
+    for column in spec['unique']:
+        _reject(reasons, df[column].duplicated(keep='first') & (df[column] != ''), f"duplicate {column} in file")
+
+    rejected = chunk[reasons != ''].copy()
+    rejected['reject_reason'] = reasons[reasons != '']
+    return df.loc[reasons == '', spec['columns']], rejected
+
+
+# --- Writing ---
+def invalidate_caches(table_name):
+    """Drops what the app has cached about table_name, as a repository write does (for the whole table)."""
+    for repo in repository.REPOSITORIES.values():
+        if repo.table_name == table_name:
+            repo.invalidate(None, None)
+
+def _insert_chunk(conn, table_name, rows, source, start, rows_done, rejected):
+    """Inserts rows and advances the checkpoint of importing source from row start to rows_done.
+
+    Runs on the writer thread inside its transaction; one bulk load, falling back to row-by-row
+    inserts on a constraint error. `rejected` counts the rows that failed validation. Returns
+    [(row index, error)] for rows that failed to insert.
+    """
+    stored = conn.execute("SELECT rows_done FROM bulk_import_checkpoint WHERE source = ? AND table_name = ?",
+                          (source, table_name)).fetchone()
+    if (stored[0] if stored else 0) != start:
+        # The previous chunk did not commit (or another import of the file is running)
+        raise RuntimeError(f"The import checkpoint of {source} is not at row {start}")
+    failures = []
+    if len(rows):
+        last_rowid = migrations.suspend_search_index(conn, table_name) if db.backend.full_text_search else None
+        failures = _insert_rows(conn, table_name, rows)
+        if last_rowid is not None:
+            migrations.resume_search_index(conn, table_name, last_rowid)
+    conn.execute(
+        """
+        INSERT INTO bulk_import_checkpoint (source, table_name, rows_done, inserted, rejected, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (source, table_name) DO UPDATE SET
+            rows_done = excluded.rows_done,
+            inserted = bulk_import_checkpoint.inserted + excluded.inserted,
+            rejected = bulk_import_checkpoint.rejected + excluded.rejected,
+            updated_at = excluded.updated_at
+        """,
+        (source, table_name, rows_done, len(rows) - len(failures), rejected + len(failures),
+         datetime.now().isoformat(timespec='seconds')),
+    )
+    return failures
+
+def _insert_rows(conn, table_name, rows):
+    columns = TABLES[table_name]['columns']
+    query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    values = rows.to_numpy(dtype=object).tolist()
+    conn.execute("SAVEPOINT bulk")
+    try:
+        db.backend.copy_rows(conn, table_name, columns, values)
+        conn.execute("RELEASE bulk")
+        return []
+    except sql.IntegrityError:
+        conn.execute("ROLLBACK TO bulk")
+        conn.execute("RELEASE bulk")
+    failures = []
+    for index, row in zip(rows.index, values):
+        # A savepoint per row, as PostgreSQL aborts the whole transaction on an error
+        conn.execute("SAVEPOINT bulk_row")
+        try:
+            conn.execute(query, row)
+        except sql.IntegrityError as e:
+            conn.execute("ROLLBACK TO bulk_row")
+            failures.append((index, str(e)))
+        conn.execute("RELEASE bulk_row")
+    return failures
+
+def load_checkpoint(source, table_name):
+    """Returns the committed progress of importing source into table_name."""
+    checkpoint = {'source': os.path.abspath(source), 'table': table_name, 'rows_done': 0, 'inserted': 0,
+                  'rejected': 0}
+    conn, c = db.connection()
+    try:
+        c.execute("SELECT rows_done, inserted, rejected FROM bulk_import_checkpoint WHERE source = ? AND table_name = ?",
+                  (checkpoint['source'], table_name))
+        row = c.fetchone()
+    finally:
+        conn.close()
+    if row:
+        checkpoint['rows_done'], checkpoint['inserted'], checkpoint['rejected'] = row
+    return checkpoint
+
+def import_file(table_name, source, chunk_size=DEFAULT_CHUNK_SIZE, rejected_path=None, progress=None):
+    """Imports a CSV/Parquet file into table_name and returns the final checkpoint dict.
+
+    rejected_path defaults to '<source>.rejected.csv'. If an earlier import of the same file into
+    the same table was interrupted, the rows it committed are skipped.
+    """
+    if table_name not in TABLES:
+        raise ValueError(f"Bulk import is not supported for {table_name}")
+    rejected_path = rejected_path or source + '.rejected.csv'
+    checkpoint = load_checkpoint(source, table_name)
+    if checkpoint['rows_done'] == 0 and os.path.exists(rejected_path):
+        os.remove(rejected_path)
+
+    def finish(pending):
+        # Waits for a chunk's insert (and checkpoint) to commit, then reports its rejects
+        chunk, rows, rejected, future, rows_done = pending
+        failures = future.result()
+        invalidate_caches(table_name)  # Counts, lookups (e.g. IDs cached as unknown) and query results
+        if failures:
+            failed = chunk.loc[[index for index, _ in failures]].copy()
+            failed['reject_reason'] = [error for _, error in failures]
+            rejected = pd.concat([rejected, failed])
+        if len(rejected):
+            rejected.insert(0, 'source_row', rejected.index + 1)
+            rejected.to_csv(rejected_path, mode='a', index=False, header=not os.path.exists(rejected_path))
+        checkpoint['rows_done'] = rows_done
+        checkpoint['inserted'] += len(rows) - len(failures)
+        checkpoint['rejected'] += len(rejected)
+        if progress:
+            progress(checkpoint)
+
+    start = checkpoint['rows_done']  # Where the next chunk starts
+    offset = 0
+    pending = None
+    for chunk in read_chunks(source, chunk_size):
+        chunk.index = range(offset, offset + len(chunk))
+        offset += len(chunk)
+        if offset <= start:
+            continue  # Already imported in an earlier run
+        chunk = chunk.loc[start:]
+
+        conn, _ = db.connection()
+        try:
+            rows, rejected = prepare_chunk(conn, table_name, chunk)
+        finally:
+            conn.close()
+        # The insert runs on the writer thread while the next chunk is read and validated
+        future = db.writer.submit(_insert_chunk, table_name, rows, checkpoint['source'], start, offset, len(rejected))
+        if pending:
+            finish(pending)
+        pending = (chunk, rows, rejected, future, offset)
+        start = offset
+    if pending:
+        finish(pending)
+    return checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import a CSV/Parquet register into the HIMS database.")
+    parser.add_argument('table', choices=sorted(TABLES))
+    parser.add_argument('source', help="CSV or Parquet file with one column per table field")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--rejected', help="Rejected-rows report (default: <source>.rejected.csv)")
+    args = parser.parse_args()
+
+    db.db_init()
+    start = time.perf_counter()
+    def report(checkpoint):
+        elapsed = time.perf_counter() - start
+        print(f"{checkpoint['rows_done']} rows read, {checkpoint['inserted']} inserted, "
+              f"{checkpoint['rejected']} rejected ({checkpoint['rows_done'] / elapsed:,.0f} rows/sec)")
+    import_file(args.table, args.source, args.chunk_size, args.rejected, progress=report)
+
+if __name__ == '__main__':
+    main()
@@ -1,137 +1,577 @@
-import sqlite3 as sql
-import config
-
-def create_connection():
-    conn = sql.connect(config.database_name + '.db')
-    conn.execute("PRAGMA foreign_keys = ON;")  # Enforce foreign key constraints
-    return conn
-
-def create_tables():
-    conn = create_connection()
-    cursor = conn.cursor()
-
-    try:
-        # Patient Record Table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS patient_record (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                age INTEGER NOT NULL,
-                gender TEXT NOT NULL,
-                date_of_birth TEXT NOT NULL,
-                blood_group TEXT NOT NULL,
-                contact_number_1 TEXT NOT NULL,
-                contact_number_2 TEXT,
-                aadhar_or_voter_id TEXT NOT NULL UNIQUE,
-                weight INTEGER NOT NULL,
-                height INTEGER NOT NULL,
-                address TEXT NOT NULL,
-                city TEXT NOT NULL,
-                state TEXT NOT NULL,
-                pin_code TEXT NOT NULL,
-                next_of_kin_name TEXT NOT NULL,
-                next_of_kin_relation_to_patient TEXT NOT NULL,
-                next_of_kin_contact_number TEXT NOT NULL,
-                email_id TEXT,
-                date_of_registration TEXT NOT NULL,
-                time_of_registration TEXT NOT NULL
-            );
-        """)
-
-        # Doctor Record Table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS doctor_record (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                age INTEGER NOT NULL,
-                gender TEXT NOT NULL,
-                date_of_birth TEXT NOT NULL,
-                blood_group TEXT NOT NULL,
-                department_id TEXT NOT NULL,
-                department_name TEXT NOT NULL,
-                contact_number_1 TEXT NOT NULL,
-                contact_number_2 TEXT,
-                aadhar_or_voter_id TEXT NOT NULL UNIQUE,
-                email_id TEXT NOT NULL UNIQUE,
-                qualification TEXT NOT NULL,
-                specialisation TEXT NOT NULL,
-                years_of_experience INTEGER NOT NULL,
-                address TEXT NOT NULL,
-                city TEXT NOT NULL,
-                state TEXT NOT NULL,
-                pin_code TEXT NOT NULL,
-                FOREIGN KEY (department_id) REFERENCES department_record(id)
-                    ON UPDATE CASCADE
-                    ON DELETE RESTRICT
-            );
-        """)
-
-        # Department Record Table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS department_record (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL UNIQUE,
-                description TEXT NOT NULL,
-                contact_number_1 TEXT NOT NULL,
-                contact_number_2 TEXT,
-                address TEXT NOT NULL,
-                email_id TEXT NOT NULL UNIQUE
-            );
-        """)
-
-        # Prescription Record Table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS prescription_record (
-                id TEXT PRIMARY KEY,
-                patient_id TEXT NOT NULL,
-                patient_name TEXT NOT NULL,
-                doctor_id TEXT NOT NULL,
-                doctor_name TEXT NOT NULL,
-                diagnosis TEXT NOT NULL,
-                comments TEXT,
-                medicine_1_name TEXT NOT NULL,
-                medicine_1_dosage_description TEXT NOT NULL,
-                medicine_2_name TEXT,
-                medicine_2_dosage_description TEXT,
-                medicine_3_name TEXT,
-                medicine_3_dosage_description TEXT,
-                FOREIGN KEY (patient_id) REFERENCES patient_record(id)
-                    ON UPDATE CASCADE
-                    ON DELETE RESTRICT,
-                FOREIGN KEY (doctor_id) REFERENCES doctor_record(id)
-                    ON UPDATE CASCADE
-                    ON DELETE RESTRICT
-            );
-        """)
-
-        # Medical Test Record Table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS medical_test_record (
-                id TEXT PRIMARY KEY,
-                test_name TEXT NOT NULL,
-                patient_id TEXT NOT NULL,
-                patient_name TEXT NOT NULL,
-                doctor_id TEXT NOT NULL,
-                doctor_name TEXT NOT NULL,
-                medical_lab_scientist_id TEXT NOT NULL,
-                test_date_time TEXT NOT NULL,
-                result_date_time TEXT NOT NULL,
-                result_and_diagnosis TEXT,
-                description TEXT,
-                comments TEXT,
-                cost INTEGER NOT NULL,
-                FOREIGN KEY (patient_id) REFERENCES patient_record(id)
-                    ON UPDATE CASCADE
-                    ON DELETE RESTRICT,
-                FOREIGN KEY (doctor_id) REFERENCES doctor_record(id)
-                    ON UPDATE CASCADE
-                    ON DELETE RESTRICT
-            );
-        """)
-
-        conn.commit()  # Save the changes
-    except Exception as e:
-        print(f"Error creating tables: {e}")
-        conn.rollback() #Revert changes in case of an error
-    finally:
-        conn.close()
+import sqlite3 as sql
+import atexit
+import os
+import pathlib
+import pickle
+import tempfile
+import threading
+import time
+import queue
+from collections import OrderedDict
+from concurrent.futures import Future
+import backends
+import config
+import db_metrics
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # Streamlit is optional for scripts and CLI tools
+    get_script_run_ctx = None
+
+DATABASE_PATH = config.database_name + '.db'
+# 'sqlite' (the file above) or 'postgres' (config.postgres_dsn); see backends.py
+backend = backends.create(getattr(config, 'database_backend', 'sqlite'))
+
+def require_summary_tables(feature):
+    """Raises sqlite3.NotSupportedError if the backend has no trigger-maintained summary tables."""
+    if not backend.summary_tables:
+        raise sql.NotSupportedError(f"{feature} needs the SQLite backend (not available on {backend.name})")
+
+# Size of the per-connection prepared statement cache (sqlite3 reuses a
+# compiled statement whenever the same SQL text is executed again).
+STATEMENT_CACHE_SIZE = getattr(config, 'statement_cache_size', 256)
+# Idle connections kept open once their session/thread has released them.
+POOL_MAX_IDLE = getattr(config, 'pool_max_idle', 32)
+
+# Pragma sets applied to every new connection. 'concurrent' lets readers keep
+# reading while a write is in progress (WAL) and waits on locks instead of
+# failing immediately with "database is locked".
+PERFORMANCE_PROFILES = {
+    'default': {},
+    'concurrent': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # negative = KiB, i.e. 64 MiB
+        'busy_timeout': 5000,  # ms
+        'temp_store': 'MEMORY',
+    },
+}
+PERFORMANCE_PROFILE = getattr(config, 'performance_profile', 'concurrent')
+# Applied to read-only snapshot connections, which have no journal or locks to configure
+SNAPSHOT_PROFILE = {'mmap_size': 256 * 1024 * 1024, 'cache_size': -64 * 1024, 'temp_store': 'MEMORY'}
+
+# Running several app processes: writes can be sent to one writer service (see writer_service.py)
+# and reads served from per-process snapshot copies of the database (see ReplicaSet).
+WRITER_SERVICE_ADDRESS = getattr(config, 'writer_service_address', None)  # (host, port) or a socket path
+WRITER_SERVICE_AUTHKEY = str(getattr(config, 'writer_service_authkey', config.password)).encode()
+READ_CONSISTENCY = getattr(config, 'read_consistency', 'primary')  # 'primary', 'snapshot' or 'read_your_writes'
+REPLICA_DIR = getattr(config, 'replica_dir', os.path.join(tempfile.gettempdir(), 'hims-replicas'))
+# Each refresh after a write copies the whole database file once per app process (see ReplicaSet)
+REPLICA_REFRESH_SECONDS = getattr(config, 'replica_refresh_seconds', 30)
+
+def apply_profile(conn, profile=None):
+    """Applies a performance profile (a name from PERFORMANCE_PROFILES or a dict of pragmas)."""
+    if profile is None:
+        profile = PERFORMANCE_PROFILE
+    if isinstance(profile, str):
+        profile = PERFORMANCE_PROFILES[profile]
+    for pragma, value in profile.items():
+        conn.execute(f"PRAGMA {pragma} = {value};")
+
+def create_connection(profile=None):
+    if backend.name != 'sqlite':
+        conn = backend.connect()
+        db_metrics.count('connections_opened')
+        return conn
+    # check_same_thread is off because a Streamlit session may rerun its script on a new thread;
+    # the pool guarantees a connection is only used by one session/thread at a time.
+    conn = sql.connect(DATABASE_PATH, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE,
+                       factory=db_metrics.InstrumentedConnection if db_metrics.ENABLED else sql.Connection)
+    db_metrics.count('connections_opened')
+    conn.execute("PRAGMA foreign_keys = ON;")  # Enforce foreign key constraints
+    apply_profile(conn, profile)
+    return conn
+
+
+# --- Connection Pool ---
+# A thread may set connection_observer.callback to be called with every pooled connection (primary
+# or replica) it acquires (async_db uses it to interrupt all of a call's statements on timeout)
+connection_observer = threading.local()
+
+
+class PooledConnection:
+    """A pooled sqlite3 connection; close() hands it back to the pool instead of closing it."""
+
+    def __init__(self, pool, key, conn):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._users = 0
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    def close(self):
+        self._pool.release(self)
+
+    def interrupt_for(self, key):
+        """Interrupts the running statement, if the caller with pool key `key` still holds this connection."""
+        with self._pool._lock:
+            if self._pool._in_use.get(key) is self:
+                self._conn.interrupt()
+
+
+class ConnectionPool:
+    """Keeps one long-lived connection per Streamlit session (or per thread outside Streamlit).
+
+    Nested acquires from the same session/thread share the connection, so helpers such as
+    verify_id_exists can be called while a caller already holds it.
+    """
+
+    def __init__(self, factory=create_connection, max_idle=POOL_MAX_IDLE):
+        self._factory = factory
+        self._max_idle = max_idle
+        self._lock = threading.Lock()
+        self._in_use = {}
+        self._idle = OrderedDict()
+
+    @staticmethod
+    def current_key():
+        """Returns the pool key for the caller: its Streamlit session, else its thread."""
+        if get_script_run_ctx is not None:
+            ctx = get_script_run_ctx(suppress_warning=True)
+            if ctx is not None:
+                return ('session', ctx.session_id)
+        return ('thread', threading.get_ident())
+
+    def acquire(self):
+        key = self.current_key()
+        with self._lock:
+            pooled = self._in_use.get(key)
+            if pooled is None:
+                pooled = self._idle.pop(key, None)
+                if pooled is None and self._idle:
+                    # Reuse the least recently released connection of another key
+                    # rather than paying for a new connect + pragmas.
+                    _, pooled = self._idle.popitem(last=False)
+                    pooled._key = key
+                if pooled is not None:
+                    self._in_use[key] = pooled
+            if pooled is not None:
+                pooled._users += 1
+        if pooled is None:
+            # Connect outside the lock; another thread of the same key may have connected (and even
+            # released its connection to the idle list) meanwhile
+            conn = self._factory()
+            with self._lock:
+                pooled = self._in_use.get(key)
+                if pooled is None:
+                    pooled = self._idle.pop(key, None)
+                    if pooled is None:
+                        pooled = PooledConnection(self, key, conn)
+                        conn = None
+                    self._in_use[key] = pooled
+                pooled._users += 1
+            if conn is not None:
+                conn.close()
+        db_metrics.count('connections_acquired')
+        observe = getattr(connection_observer, 'callback', None)
+        if observe is not None:
+            observe(pooled)
+        return pooled
+
+    def release(self, pooled):
+        with self._lock:
+            pooled._users -= 1
+            if pooled._users > 0:
+                return
+            self._in_use.pop(pooled._key, None)
+            if pooled._conn.in_transaction:
+                pooled._conn.rollback()  # Never hand out a connection with someone else's open transaction
+            self._idle[pooled._key] = pooled
+            evicted = []
+            while len(self._idle) > self._max_idle:
+                evicted.append(self._idle.popitem(last=False)[1])
+        for stale in evicted:
+            stale._conn.close()
+
+    def close_all(self):
+        """Closes every idle connection (connections in use are closed when released)."""
+        with self._lock:
+            idle = list(self._idle.values())
+            self._idle.clear()
+        for pooled in idle:
+            pooled._conn.close()
+
+
+pool = ConnectionPool()
+
+def pooled_connection():
+    """Context manager yielding a pooled connection; commits on success, rolls back on error."""
+    return pool.acquire()
+
+def connection():
+    """Returns a pooled connection and a cursor on it; conn.close() releases it to the pool."""
+    conn = pool.acquire()
+    return conn, conn.cursor()
+
+# --- Write Queue ---
+# A thread may set write_observer.callback to be called with every Future it queues a write under,
+# before the write is queued (async_db uses it to stop timing a call once its write is on the queue)
+write_observer = threading.local()
+
+
+class _WriteFuture(Future):
+    """Future of a queued write; records the write for read_your_writes before waking the caller.
+
+    A done callback would run only after result() had returned, so the caller's next read could
+    still be served by a snapshot taken before its write.
+    """
+
+    def __init__(self, key=None):
+        super().__init__()
+        self._key = key  # Pool key of the caller, when replicas are in use
+
+    def _note_write(self):
+        if self._key is not None and replicas is not None:
+            replicas.note_write(self._key)
+
+    def set_result(self, result):
+        self._note_write()
+        super().set_result(result)
+
+    def set_exception(self, exception):
+        self._note_write()
+        super().set_exception(exception)
+
+
+class WriteQueue:
+    """Serialises all writes through one background thread and one connection.
+
+    Jobs that queue up while a transaction is being committed are applied together in the next
+    transaction (each inside its own savepoint, so one failing job does not undo the others),
+    which turns a burst of small inserts into a single fsync. If the connection cannot be opened,
+    the jobs waiting fail with that error and the next batch tries again.
+    """
+
+    def __init__(self, factory=create_connection, max_batch=64):
+        self._factory = factory
+        self._max_batch = max_batch
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args):
+        """Queues fn(conn, *args) and returns a Future for its result."""
+        self._ensure_started()
+        # With replicas, read-your-writes sends this caller's next reads to the primary
+        future = _WriteFuture(pool.current_key() if replicas is not None else None)
+        observe = getattr(write_observer, 'callback', None)
+        if observe is not None:
+            observe(future)
+        self._jobs.put((fn, args, future))
+        return future
+
+    def _next_batch(self):
+        """Waits for a job and returns it together with any others already queued."""
+        batch = [self._jobs.get()]
+        while len(batch) < self._max_batch:
+            try:
+                batch.append(self._jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = None
+        while True:
+            batch = self._next_batch()
+            if conn is None:
+                try:
+                    conn = self._factory()
+                    conn.isolation_level = None  # Transactions are managed explicitly below
+                except Exception as e:
+                    # Fail this batch instead of the thread (which would leave every future hanging)
+                    # and try to connect again for the next one
+                    conn = None
+                    for fn, args, future in batch:
+                        if future.set_running_or_notify_cancel():
+                            future.set_exception(e)
+                    continue
+            self._apply(conn, batch)
+
+    def _apply(self, conn, batch):
+        results = []
+        try:
+            conn.execute(backend.begin_write)
+            for fn, args, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT job")
+                try:
+                    result = fn(conn, *args)
+                    conn.execute("RELEASE job")
+                    results.append((future, result, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for fn, args, future in batch:
+                if not future.done():
+                    if not future.running():
+                        future.set_running_or_notify_cancel()
+                    future.set_exception(e)
+            return
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+class RemoteWriteQueue(WriteQueue):
+    """A WriteQueue whose batches are applied by the writer service instead of in this process.
+
+    Jobs are pickled, so fn must be a module-level function or a method of a picklable object.
+    Each batch is sent as one message and the service applies it through its own WriteQueue,
+    together with the batches of the other app processes. If the connection drops while a batch
+    is in flight its futures fail, although the service may have committed it.
+    """
+
+    def __init__(self, address, authkey, max_batch=64):
+        super().__init__(max_batch=max_batch)
+        self._address = address
+        self._authkey = authkey
+
+    def _run(self):
+        from multiprocessing.connection import Client
+        conn = None
+        while True:
+            batch = [job for job in self._next_batch() if job[2].set_running_or_notify_cancel()]
+            jobs = []
+            for fn, args, future in batch:
+                try:
+                    jobs.append((pickle.dumps((fn, args)), future))
+                except Exception as e:
+                    future.set_exception(TypeError(f"Cannot send {fn!r} to the writer service: {e}"))
+            if not jobs:
+                continue
+            try:
+                if conn is None:
+                    conn = Client(self._address, authkey=self._authkey)
+                conn.send([payload for payload, _ in jobs])
+                results = conn.recv()
+            except (OSError, EOFError) as e:
+                conn = None  # Reconnect for the next batch
+                for _, future in jobs:
+                    future.set_exception(e)
+                continue
+            for (_, future), (ok, value) in zip(jobs, results):
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+
+writer = RemoteWriteQueue(WRITER_SERVICE_ADDRESS, WRITER_SERVICE_AUTHKEY) if WRITER_SERVICE_ADDRESS else WriteQueue()
+
+def _execute(conn, query, params):
+    return conn.execute(query, params).rowcount
+
+def execute_write(query, params=()):
+    """Runs one INSERT/UPDATE/DELETE on the writer thread and returns the affected row count.
+
+    Blocks until the write is committed; database errors (e.g. IntegrityError) are re-raised here.
+    """
+    return writer.submit(_execute, query, params).result()
+
+def run_write(fn, *args):
+    """Runs fn(conn, *args) as a single transaction on the writer thread and returns its result."""
+    return writer.submit(fn, *args).result()
+
+# --- Read Replicas ---
+class SnapshotConnection(db_metrics.InstrumentedConnection if db_metrics.ENABLED else sql.Connection):
+    """A connection to a read-only snapshot; generation tells which snapshot."""
+    generation = 0
+
+
+class ReplicaSet:
+    """Serves reads from a private, periodically refreshed read-only copy of the database.
+
+    Every REPLICA_REFRESH_SECONDS a background thread checks whether the primary has changed
+    (PRAGMA data_version) and if so copies it with the SQLite backup API into a new snapshot file,
+    opened with immutable=1 so that readers take no locks at all. Each app process keeps its own
+    snapshot, so readers in one process never wait on the primary or on another process. A new
+    snapshot replaces the old one for connections acquired after it; connections still open on the
+    old file keep reading it until they are released.
+
+    With consistency 'read_your_writes', a caller (Streamlit session, else thread) that has
+    written since the current snapshot was taken reads from the primary until a snapshot that
+    includes its write is in place; with 'snapshot', reads may be up to one refresh interval old.
+
+    A refresh is a full copy, not an incremental one: on a database that is written to steadily,
+    every process writes the size of the database to disk (and holds it in the page cache) every
+    interval. For a 370 MB database that is about 0.7 s of copying per process per refresh, so the
+    interval should be chosen from the database size and the number of processes; the default of
+    30 s keeps the copying to a few percent of the time.
+    """
+
+    def __init__(self, source=None, directory=REPLICA_DIR, interval=REPLICA_REFRESH_SECONDS,
+                 consistency='read_your_writes'):
+        self.source = source  # None: the current DATABASE_PATH
+        self.directory = directory
+        self.interval = interval
+        self.consistency = consistency
+        self.generation = 0
+        self.path = None
+        self.taken = None  # time.monotonic() at which the current snapshot started copying
+        self._last_write = {}  # pool key -> time.monotonic() of its last committed write
+        self._pool = ConnectionPool(factory=self._open)
+        self._retired = []  # Old snapshot files that could not be removed yet (open on Windows)
+        self._lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.close)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='db-replica', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        conn = sql.connect(self.source or DATABASE_PATH, check_same_thread=False)
+        last_version = None
+        while True:
+            try:
+                # data_version changes whenever another connection commits to the primary
+                version = conn.execute("PRAGMA data_version").fetchone()[0]
+                if version != last_version:
+                    self.refresh(conn)
+                    last_version = version
+            except sql.Error as e:
+                print(f"Error refreshing read replica: {e}")
+            time.sleep(self.interval)
+
+    def refresh(self, conn=None):
+        """Takes a new snapshot of the primary and makes it the one new reads use."""
+        os.makedirs(self.directory, exist_ok=True)
+        generation = self.generation + 1
+        path = os.path.join(self.directory, f"{pathlib.Path(self.source or DATABASE_PATH).stem}-{os.getpid()}-{generation}.db")
+        source = conn or sql.connect(self.source or DATABASE_PATH)
+        taken = time.monotonic()
+        target = sql.connect(path)
+        try:
+            source.backup(target)
+            target.execute("PRAGMA journal_mode = DELETE")  # The copy keeps the primary's WAL flag otherwise
+        finally:
+            target.close()
+            if conn is None:
+                source.close()
+        with self._lock:
+            old_path = self.path
+            self.path, self.taken, self.generation = path, taken, generation
+            # Writes older than this snapshot are in it; only newer ones still need the primary
+            self._last_write = {key: at for key, at in self._last_write.items() if at >= taken}
+        self._pool.close_all()  # Idle connections are on the old snapshot
+        if old_path:
+            self._retired.append(old_path)
+        self._remove_retired()
+
+    def _remove_retired(self):
+        for path in list(self._retired):
+            try:
+                os.remove(path)  # Open connections keep reading the removed file on POSIX systems
+                self._retired.remove(path)
+            except FileNotFoundError:
+                self._retired.remove(path)
+            except OSError:
+                pass  # Still open (Windows): retried after the next refresh
+
+    def _open(self):
+        with self._lock:
+            path, generation = self.path, self.generation
+        conn = sql.connect(pathlib.Path(path).absolute().as_uri() + '?mode=ro&immutable=1', uri=True,
+                           check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE, factory=SnapshotConnection)
+        conn.generation = generation
+        db_metrics.count('connections_opened')
+        apply_profile(conn, SNAPSHOT_PROFILE)
+        return conn
+
+    def note_write(self, key):
+        """Records that `key` (a ConnectionPool key) has just committed a write."""
+        self._last_write[key] = time.monotonic()
+
+    def serves(self, key):
+        """Tells if reads of `key` may come from the snapshot (starting the refresher if needed)."""
+        if self._thread is None:
+            self._ensure_started()
+        if self.path is None:
+            return False
+        if self.consistency == 'read_your_writes':
+            return self._last_write.get(key, -1) < self.taken
+        return True
+
+    def acquire(self):
+        pooled = self._pool.acquire()
+        if pooled._users == 1 and pooled._conn.generation != self.generation:
+            pooled._conn.close()  # Opened on an older snapshot: switch to the current one
+            pooled._conn = self._open()
+        return pooled
+
+    def close(self):
+        """Closes idle snapshot connections and removes the snapshot files."""
+        self._pool.close_all()
+        if self.path:
+            self._retired.append(self.path)
+            self.path = None
+        self._remove_retired()
+
+
+if READ_CONSISTENCY != 'primary' and backend.name != 'sqlite':
+    raise ValueError("read_consistency needs the SQLite backend; use PostgreSQL's own replicas instead")
+replicas = ReplicaSet(consistency=READ_CONSISTENCY) if READ_CONSISTENCY != 'primary' else None
+
+def read_connection(key=None):
+    """Like connection(), but on the read replica when read_consistency lets the caller use it.
+
+    key is the caller's pool key (ConnectionPool.current_key()); pass it from a helper thread that
+    reads on behalf of a session, so the session's read-your-writes consistency still applies.
+    """
+    if replicas is not None and replicas.serves(key or pool.current_key()):
+        conn = replicas.acquire()
+        return conn, conn.cursor()
+    return connection()
+
+def read_generation(key=None):
+    """The snapshot read_connection(key) would read from for the caller (0 for the primary)."""
+    if replicas is not None and replicas.serves(key or pool.current_key()):
+        return replicas.generation
+    return 0
+
+def db_init():
+    """Creates the database tables if they don't exist yet."""
+    create_tables()
+
+def create_tables():
+    """Brings the database schema up to date by applying pending migrations."""
+    conn = create_connection()
+    try:
+        backend.create_schema(conn)
+    except Exception as e:
+        print(f"Error creating tables: {e}")
+    finally:
+        conn.close()
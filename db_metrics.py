@@ -0,0 +1,391 @@
+"""Query instrumentation: per-statement latency histograms, row and cache counters, a slow-query log.
+
+create_connection() builds its connections from InstrumentedConnection (unless config.db_metrics is
+False), so every statement run through conn.execute() or a cursor is timed from execute until its
+rows are fetched (fetchall(), the end of iteration or the first fetchone()), and counted under its SQL text (whitespace collapsed, IN lists shortened).
+Statements slower than SLOW_QUERY_MS are appended to SLOW_QUERY_LOG as JSON lines together with
+their EXPLAIN QUERY PLAN, which is captured once per statement. Parameters are never logged, as
+they hold patient data.
+
+The pool reports connections it opens and hands out, and the caches report hits and misses. In
+Streamlit, hims_app calls rerun_started() at the top of the script, and the counts of the
+session's previous rerun (connections opened and checked out, statements run) are added to the
+per-rerun histograms.
+
+Metrics are exported in Prometheus text format by render(): the API serves them at /metrics, and
+start_exporter() (called once per Streamlit server process) serves them over HTTP on
+config.metrics_port and/or rewrites config.metrics_file every METRICS_INTERVAL seconds.
+"""
+import json
+import os
+import re
+import sqlite3 as sql
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # Streamlit is optional for scripts and CLI tools
+    get_script_run_ctx = None
+
+ENABLED = getattr(config, 'db_metrics', True)
+SLOW_QUERY_MS = getattr(config, 'slow_query_ms', 100)
+SLOW_QUERY_LOG = getattr(config, 'slow_query_log', config.database_name + '_slow_queries.log')
+METRICS_FILE = getattr(config, 'metrics_file', None)
+METRICS_PORT = getattr(config, 'metrics_port', None)
+METRICS_INTERVAL = getattr(config, 'metrics_interval', 15)  # seconds
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class Histogram:
+    """Cumulative histogram with Prometheus-style buckets."""
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (inf if it lies beyond the last bucket)."""
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= target and self.count:
+                return bound
+        return float('inf')
+
+
+class StatementStats:
+    __slots__ = ('latency', 'rows', 'errors', 'slow', 'max_seconds')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.rows = self.errors = self.slow = 0
+        self.max_seconds = 0.0
+
+
+_statements = {}
+_counters = {'connections_opened': 0, 'connections_acquired': 0}
+_cache_events = {}
+_rerun_histograms = {name: Histogram(COUNT_BUCKETS) for name in ('connections_opened', 'connections_acquired', 'statements')}
+_runs = {}  # Streamlit session (or thread) -> counts of its current rerun
+_normalised = {}
+_plans = {}
+_log_lock = threading.Lock()
+
+_IN_LIST = re.compile(r'\?(\s*,\s*\?)+')
+_SPACE = re.compile(r'\s+')
+
+def normalise(query):
+    """The label a statement is counted under: whitespace collapsed and `?, ?, ...` lists shortened."""
+    label = _normalised.get(query)
+    if label is None:
+        label = _IN_LIST.sub('?, ...', _SPACE.sub(' ', query).strip())[:300]
+        if len(_normalised) > 10_000:
+            _normalised.clear()  # Unbounded dynamic SQL should not grow this forever
+        _normalised[query] = label
+    return label
+
+def _stats(label):
+    stats = _statements.get(label)
+    if stats is None:
+        stats = _statements.setdefault(label, StatementStats())
+    return stats
+
+def record(conn, query, params, seconds, rows, explain=True):
+    """Counts one finished statement; logs it with its query plan if it was slow."""
+    label = normalise(query)
+    slow = seconds * 1000 >= SLOW_QUERY_MS
+    with _lock:
+        stats = _stats(label)
+        stats.latency.observe(seconds)
+        stats.rows += rows
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        if slow:
+            stats.slow += 1
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run['statements'] += 1
+    if slow:
+        _log_slow(conn, query, params, label, seconds, rows, explain)
+
+def record_error(query):
+    with _lock:
+        _stats(normalise(query)).errors += 1
+
+def _plan(conn, query, params, label):
+    plan = _plans.get(label)
+    if plan is None and query.lstrip()[:7].upper().startswith(EXPLAINABLE):
+        try:
+            plan = [row[3] for row in sql.Connection.execute(conn, "EXPLAIN QUERY PLAN " + query, params)]
+        except sql.Error as e:
+            plan = [f"(no plan: {e})"]
+        _plans[label] = plan
+    return plan
+
+def _log_slow(conn, query, params, label, seconds, rows, explain):
+    entry = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'ms': round(seconds * 1000, 1), 'rows': rows,
+             'statement': label, 'plan': _plan(conn, query, params, label) if explain else _plans.get(label)}
+    line = json.dumps(entry) + '\n'
+    with _log_lock:
+        try:
+            with open(SLOW_QUERY_LOG, 'a') as f:
+                f.write(line)
+        except OSError:
+            pass  # Never fail a query because the log cannot be written
+
+def count(name, n=1):
+    """Adds n to a counter (connections_opened, connections_acquired)."""
+    with _lock:
+        _counters[name] += n
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run[name] += n
+
+def cache_event(cache, event):
+    """Counts a cache 'hit' or 'miss'."""
+    with _lock:
+        _cache_events[(cache, event)] = _cache_events.get((cache, event), 0) + 1
+
+def rerun_started():
+    """Called at the top of a Streamlit script run; closes the counts of the session's previous run.
+
+    A rerun may run on a different thread than the previous one, so runs are kept per session and
+    the current thread counts into the run it started.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx is not None else None
+    key = ctx.session_id if ctx is not None else threading.get_ident()
+    run = {'connections_opened': 0, 'connections_acquired': 0, 'statements': 0}
+    with _lock:
+        previous = _runs.pop(key, None)
+        if previous is not None:
+            for name, value in previous.items():
+                _rerun_histograms[name].observe(value)
+        if len(_runs) > 10_000:
+            _runs.clear()  # Sessions that ended without another rerun
+        _runs[key] = run
+    _local.run = run
+
+
+# --- Instrumented sqlite3 classes ---
+class InstrumentedCursor(sql.Cursor):
+    """Cursor that times each statement from execute() until its rows are fetched."""
+    _pending = None  # [query, params, seconds so far, rows so far]
+
+    def _finish(self, explain=True):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            record(self.connection, pending[0], pending[1], pending[2], pending[3], explain)
+
+    def execute(self, query, params=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            super().execute(query, params)
+        except sql.Error:
+            record_error(query)
+            raise
+        self._pending = [query, params, time.perf_counter() - start, 0]
+        if self.description is None:  # Not a query: count the affected rows and finish now
+            self._pending[3] = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, query, seq_of_params):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            super().executemany(query, seq_of_params)
+        except sql.Error:
+            record_error(query)
+            raise
+        record(self.connection, query, (), time.perf_counter() - start, max(self.rowcount, 0), explain=False)
+        return self
+
+    def _fetched(self, start, rows, done):
+        pending = self._pending
+        if pending is not None:
+            pending[2] += time.perf_counter() - start
+            pending[3] += rows
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        # Almost every fetchone() reads a single-row lookup, so the first one ends the timing
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None, True)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows), len(rows) < (self.arraysize if size is None else size))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # A cursor dropped before its last row: count what was fetched, without running EXPLAIN
+        self._finish(explain=False)
+
+
+class InstrumentedConnection(sql.Connection):
+    """sqlite3 connection whose cursors (and conn.execute shortcuts) are InstrumentedCursors."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, query, params=()):
+        return self.cursor().execute(query, params)
+
+    def executemany(self, query, seq_of_params):
+        return self.cursor().executemany(query, seq_of_params)
+
+
+# --- Reporting ---
+def summary():
+    """Per-statement totals, slowest total time first."""
+    with _lock:
+        rows = [{'statement': label, 'calls': stats.latency.count, 'total_ms': stats.latency.sum * 1000,
+                 'mean_ms': stats.latency.sum * 1000 / stats.latency.count if stats.latency.count else 0.0,
+                 'p95_ms': stats.latency.quantile(0.95) * 1000, 'max_ms': stats.max_seconds * 1000,
+                 'rows': stats.rows, 'slow': stats.slow, 'errors': stats.errors}
+                for label, stats in _statements.items()]
+    return sorted(rows, key=lambda row: -row['total_ms'])
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, n in zip(histogram.bounds, histogram.counts):
+        cumulative += n
+        lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {histogram.count}')
+    labels = labels.rstrip(',')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}' if labels else f'{name}_sum {histogram.sum}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}' if labels else f'{name}_count {histogram.count}')
+    return lines
+
+def render():
+    """All metrics in Prometheus text exposition format."""
+    with _lock:
+        statements = list(_statements.items())
+        lines = [
+            '# HELP hims_db_query_duration_seconds Time from execute to last row fetched, per statement.',
+            '# TYPE hims_db_query_duration_seconds histogram',
+        ]
+        for label, stats in statements:
+            lines += _histogram_lines('hims_db_query_duration_seconds', f'statement="{_label(label)}",', stats.latency)
+        for metric, attribute, help_text in (
+                ('hims_db_query_rows_total', 'rows', 'Rows returned (or changed, for writes), per statement.'),
+                ('hims_db_query_errors_total', 'errors', 'Statements that raised an error.'),
+                ('hims_db_slow_queries_total', 'slow', f'Statements slower than {SLOW_QUERY_MS} ms.')):
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+            lines += [f'{metric}{{statement="{_label(label)}"}} {getattr(stats, attribute)}' for label, stats in statements]
+        for name, value in _counters.items():
+            lines += [f'# TYPE hims_db_{name}_total counter', f'hims_db_{name}_total {value}']
+        lines += ['# HELP hims_cache_events_total Cache lookups by cache and result.',
+                  '# TYPE hims_cache_events_total counter']
+        lines += [f'hims_cache_events_total{{cache="{cache}",result="{event}"}} {n}'
+                  for (cache, event), n in sorted(_cache_events.items())]
+        for name, histogram in _rerun_histograms.items():
+            metric = f'hims_streamlit_rerun_{name}'
+            lines += [f'# HELP {metric} {name.replace("_", " ").capitalize()} during one Streamlit rerun.',
+                      f'# TYPE {metric} histogram']
+            lines += _histogram_lines(metric, '', histogram)
+    return '\n'.join(lines) + '\n'
+
+def write_file(path=None):
+    """Writes render() to path (config.metrics_file by default), atomically."""
+    path = path or METRICS_FILE
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+def reset():
+    """Forgets all collected metrics."""
+    with _lock:
+        _statements.clear()
+        _cache_events.clear()
+        for name in _counters:
+            _counters[name] = 0
+        for name in _rerun_histograms:
+            _rerun_histograms[name] = Histogram(COUNT_BUCKETS)
+    _plans.clear()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_exporter(port=METRICS_PORT, path=METRICS_FILE, interval=METRICS_INTERVAL):
+    """Serves render() over HTTP on port and/or rewrites the file at path every interval seconds."""
+    if port:
+        try:
+            server = ThreadingHTTPServer(('127.0.0.1', port), _MetricsHandler)
+        except OSError:
+            server = None  # Another process (e.g. a second server) already exports on this port
+        if server is not None:
+            threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    if path:
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_file(path)
+                except OSError:
+                    pass
+        threading.Thread(target=loop, name='metrics-file', daemon=True).start()
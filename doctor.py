@@ -1,17 +1,15 @@
 import streamlit as st
-from datetime import datetime, date
-import database as db
-import pandas as pd
 import department
+import pagination
+import id_generator
+import lookup_cache
+import repository
+import query_cache
 
 # Function to verify doctor ID
 def verify_doctor_id(doctor_id):
     """Checks if a doctor ID exists in the doctor_record table."""
-    conn, c = db.connection()
-    c.execute("SELECT id FROM doctor_record WHERE id = ?", (doctor_id,))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
+    return lookup_cache.id_exists("doctor_record", doctor_id)
 
 # Function to show doctor details
 def show_doctor_details(list_of_doctors):
@@ -25,43 +23,20 @@ def show_doctor_details(list_of_doctors):
     if not list_of_doctors:
         st.warning('No data to show')
     else:
-        # Convert list of tuples to list of lists for DataFrame compatibility
-        doctor_details = [list(doctor) for doctor in list_of_doctors]
-
-        df = pd.DataFrame(data=doctor_details, columns=doctor_titles)
+        df = query_cache.frame(list_of_doctors, doctor_titles)
         st.write(df)
 
 
 # Function to calculate age
 def calculate_age(dob):
     """Calculates age from a date of birth."""
-    today = date.today()
-    age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-    return age
-
-
-# Function to generate doctor ID
-def generate_doctor_id():
-    """Generates a unique doctor ID based on current date and time."""
-    now = datetime.now()
-    id_1 = now.strftime('%S%M%H')
-    id_2 = now.strftime('%Y%m%d')[2:]
-    doctor_id = f'DR-{id_1}-{id_2}'
-    return doctor_id
+    return repository.calculate_age(dob)
 
 
 # Function to get department name
 def get_department_name(dept_id):
     """Fetches department name from the database given a department ID."""
-    conn, c = db.connection()
-    c.execute("SELECT name FROM department_record WHERE id = ?", (dept_id,))
-    result = c.fetchone()
-    conn.close()
-
-    if result:
-        return result[0]
-    else:
-        return None
+    return lookup_cache.fetch_name("department_record", dept_id)
 
 
 # Doctor Class
@@ -124,7 +99,7 @@ class Doctor:
             self.city = st.text_input("City")
             self.state = st.text_input("State")
             self.pin_code = st.text_input("PIN Code")
-            self.id = generate_doctor_id()
+            self.id = id_generator.generate_id("DR")
 
             submitted = st.form_submit_button("Save")
             if submitted:
@@ -133,32 +108,13 @@ class Doctor:
 
                 else:
 
-                    conn, c = db.connection()
                     try:
-                        c.execute(
-                            """
-                            INSERT INTO doctor_record (id, name, age, gender, date_of_birth, blood_group,
-                                department_id, department_name, contact_number_1, contact_number_2,
-                                aadhar_or_voter_id, email_id, qualification, specialisation,
-                                years_of_experience, address, city, state, pin_code)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """,
-                            (
-                                self.id, self.name, self.age, self.gender, self.date_of_birth,
-                                self.blood_group, self.department_id, self.department_name,
-                                self.contact_number_1, self.contact_number_2, self.aadhar_or_voter_id,
-                                self.email_id, self.qualification, self.specialisation,
-                                self.years_of_experience, self.address, self.city, self.state, self.pin_code
-                            ),
-                        )
-                        conn.commit()  # Commit the changes
+                        repository.doctors.create({column: getattr(self, column) for column in repository.doctors.columns})
                         st.success("Doctor details saved successfully.")
                         st.write(f"Your Doctor ID is: {self.id}")
 
                     except Exception as e:
                          st.error(f"Error inserting data: {e}")
-                    finally:
-                        conn.close()
 
     def update_doctor(self):
         """Updates an existing doctor record in the database."""
@@ -170,12 +126,12 @@ class Doctor:
                 st.error("Invalid Doctor ID")
             else:
                 st.success("Doctor ID Verified")
-                conn, c = db.connection()
 
                 # Fetch existing data
-                c.execute("SELECT * FROM doctor_record WHERE id = ?", (doctor_id,))
-                doctor_data = c.fetchone()
-                conn.close()
+                try:
+                    doctor_data = repository.doctors.get(doctor_id)
+                except repository.RecordNotFound:
+                    doctor_data = None
 
                 if doctor_data:
                     st.write("Current Details:")
@@ -211,41 +167,19 @@ class Doctor:
                     update_submitted = st.form_submit_button("Update")
 
                     if update_submitted:
-                        conn, c = db.connection()
                         try:
-                            #Recalculate age.
-                            c.execute("SELECT date_of_birth FROM doctor_record WHERE id = ?", (doctor_id,))
-                            dob_str = c.fetchone()[0]
-
-                            dob = datetime.strptime(dob_str, "%d-%m-%Y").date()
-                            age = calculate_age(dob)
-
-                            c.execute(
-                                """
-                                UPDATE doctor_record
-                                SET age = ?, department_id = ?, department_name = (SELECT name FROM department_record WHERE id = ?),
-                                contact_number_1 = ?, contact_number_2 = ?, email_id = ?,
-                                qualification = ?, specialisation = ?, years_of_experience = ?,
-                                address = ?, city = ?, state = ?, pin_code = ?
-                                WHERE id = ?
-                                """,
-                                (
-                                    age,
-                                    department_id, department_id,
-                                    contact_number_1, contact_number_2,
-                                    email_id, qualification, specialisation,
-                                    years_of_experience, address, city, state, pin_code,
-                                    doctor_id,
-                                ),
-                            )
-
-                            conn.commit()
+                            # Age is recalculated from the stored date of birth by the repository
+                            repository.doctors.update(doctor_id, {
+                                'department_id': department_id,
+                                'contact_number_1': contact_number_1, 'contact_number_2': contact_number_2,
+                                'email_id': email_id, 'qualification': qualification,
+                                'specialisation': specialisation, 'years_of_experience': years_of_experience,
+                                'address': address, 'city': city, 'state': state, 'pin_code': pin_code,
+                            })
                             st.success("Doctor details updated successfully.")
 
                         except Exception as e:
                             st.error(f"Error updating data: {e}")
-                        finally:
-                            conn.close()
 
 
     def delete_doctor(self):
@@ -258,17 +192,17 @@ class Doctor:
                 st.error("Invalid Doctor ID")
             else:
                 st.success("Doctor ID Verified")
-                conn, c = db.connection()
 
                 # Fetch and show doctor data before deletion
-                c.execute("SELECT * FROM doctor_record WHERE id = ?", (doctor_id,))
-                doctor_data = c.fetchone()
+                try:
+                    doctor_data = repository.doctors.get(doctor_id)
+                except repository.RecordNotFound:
+                    doctor_data = None
                 if doctor_data:
                     st.write("Details of Doctor to be Deleted:")
                     show_doctor_details([doctor_data])  # Show the details before asking for confirmation
                 else:
                     st.error("Doctor not found.")
-                    conn.close()  # Close connection before returning
                     return
 
                 confirm_delete = st.checkbox("Confirm Deletion")
@@ -278,41 +212,38 @@ class Doctor:
 
                     if delete_button:
                         try:
-                            c.execute("DELETE FROM doctor_record WHERE id = ?", (doctor_id,))
-                            conn.commit()
+                            repository.doctors.delete(doctor_id)
                             st.success("Doctor deleted successfully.")
 
                         except Exception as e:
                              st.error(f"Error deleting doctor: {e}")
 
-                        finally:
-                            conn.close()
-
 
 
     def show_all_doctors(self):
-        """Shows all doctor records from the database."""
+        """Shows all doctor records from the database, one page at a time."""
         st.subheader("All Doctors")
-        conn, c = db.connection()
-        c.execute("SELECT * FROM doctor_record")
-        doctors = c.fetchall()
-        conn.close()
-        show_doctor_details(doctors)
+        pagination.show_paginated("doctor_view", show_doctor_details, key="doctors")
 
     def search_doctor(self):
-        """Searches and displays a doctor's details by ID."""
+        """Searches and displays a doctor's details by ID, name or specialisation."""
         st.subheader("Search Doctor")
-        doctor_id = st.text_input("Enter Doctor ID to Search")
+        doctor_id = st.text_input("Enter Doctor ID, Name or Specialisation to Search")
 
         if doctor_id:
             if not verify_doctor_id(doctor_id):
-                st.error("Invalid Doctor ID")
+                doctors = repository.doctors.search(doctor_id)
+                if doctors:
+                    st.write(f"Doctors matching '{doctor_id}':")
+                    show_doctor_details(doctors)
+                else:
+                    st.error("No doctor found with this ID, name or specialisation")
             else:
                 st.success("Doctor ID Verified")
-                conn, c = db.connection()
-                c.execute("SELECT * FROM doctor_record WHERE id = ?", (doctor_id,))
-                doctor = c.fetchone()
-                conn.close()
+                try:
+                    doctor = repository.doctors.get(doctor_id)
+                except repository.RecordNotFound:
+                    doctor = None
 
                 if doctor:
                     st.write("Doctor Details:")
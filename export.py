@@ -0,0 +1,242 @@
+"""Streaming export of whole tables to CSV, Parquet or Arrow.
+
+Rows are read with fetchmany() and written batch by batch (a CSV chunk, a Parquet row group or an
+Arrow record batch), so memory use depends on the batch size and not on the size of the table.
+Exports can project columns and filter rows; both are checked against the table definition before
+any SQL is built.
+
+The Streamlit page hands the export file to st.download_button, which holds it in memory, so it
+only offers exports of up to UI_EXPORT_MAX_ROWS rows and shows the equivalent command line for
+larger ones.
+
+    python export.py medical_test_record tests.parquet --format parquet \
+        --columns id,test_name,cost --from 2026-01-01 --to 2026-01-31
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import streamlit as st
+
+import database as db
+import config
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet/Arrow output is optional
+    pa = pa_ipc = pq = None
+
+EXPORT_TABLES = ['patient_record', 'doctor_record', 'department_record',
+                 'prescription_record', 'prescription_item', 'medical_test_record',
+                 'doctor_view', 'prescription_view', 'medical_test_view']
+FORMATS = ['csv', 'parquet', 'arrow']
+MIME_TYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet',
+              'arrow': 'application/vnd.apache.arrow.stream'}
+DEFAULT_BATCH_SIZE = 10_000
+UI_EXPORT_MAX_ROWS = getattr(config, 'ui_export_max_rows', 200_000)
+OPERATORS = {'=', '!=', '<', '<=', '>', '>=', 'like', 'between'}
+
+# ISO-8601 date/time columns offered for date range filters
+DATE_COLUMNS = {'test_date_time', 'result_date_time', 'date_of_registration'}
+
+def table_columns(conn, table_name):
+    """Returns [(column name, declared type)] for a table."""
+    return db.backend.table_columns(conn, table_name)
+
+def date_range(column, start=None, end=None):
+    """Returns filters selecting rows whose ISO date column lies between start and end (inclusive)."""
+    filters = []
+    if start:
+        filters.append((column, '>=', date.fromisoformat(str(start)).isoformat()))
+    if end:
+        filters.append((column, '<', (date.fromisoformat(str(end)) + timedelta(days=1)).isoformat()))
+    return filters
+
+def build_query(conn, table_name, columns=None, filters=None):
+    """Builds the SELECT for an export.
+
+    filters is a list of (column, operator, value); 'between' takes a (low, high) tuple.
+    Returns (sql, params, [(column, type)] of the selected columns).
+    """
+    if table_name not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table_name}")
+    available = dict(table_columns(conn, table_name))
+    columns = columns or list(available)
+    unknown = [c for c in columns + [f[0] for f in filters or []] if c not in available]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table_name}: {', '.join(unknown)}")
+
+    conditions, params = [], []
+    for column, op, value in filters or []:
+        op = op.lower()
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        if op == 'between':
+            conditions.append(f"{column} BETWEEN ? AND ?")
+            params.extend(value)
+        else:
+            conditions.append(f"{column} {op.upper()} ?")
+            params.append(value)
+
+    query = f"SELECT {', '.join(columns)} FROM {table_name}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query, params, [(c, available[c]) for c in columns]
+
+def count_rows(table_name, columns=None, filters=None, limit=None):
+    """Returns the number of rows an export would write, counting at most `limit`."""
+    with db.pooled_connection() as conn:
+        query, params, _ = build_query(conn, table_name, columns, filters)
+        if limit is not None:
+            query += " LIMIT ?"
+            params = params + [limit]
+        return conn.execute(f"SELECT COUNT(*) FROM ({query}) AS export", params).fetchone()[0]
+
+def iter_batches(table_name, columns=None, filters=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Yields the column list first, then lists of at most batch_size row tuples."""
+    with db.pooled_connection() as conn:
+        query, params, selected = build_query(conn, table_name, columns, filters)
+        yield selected
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+
+
+# --- Writers ---
+def _arrow_schema(selected):
+    return pa.schema([(name, pa.int64() if 'INT' in declared.upper() else pa.string())
+                      for name, declared in selected])
+
+def _record_batch(schema, rows):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays([pa.array(values, type=field.type)
+                                       for values, field in zip(columns, schema)], schema=schema)
+
+def write_csv(batches, out):
+    """Writes batches to a text file object as CSV; returns the number of rows written."""
+    writer = csv.writer(out)
+    writer.writerow([name for name, _ in next(batches)])
+    count = 0
+    for rows in batches:
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+def write_parquet(batches, out):
+    """Writes batches to a path or binary file as Parquet, one row group per batch."""
+    if pq is None:
+        raise RuntimeError("Parquet export requires the pyarrow package")
+    schema = _arrow_schema(next(batches))
+    count = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for rows in batches:
+            writer.write_batch(_record_batch(schema, rows))
+            count += len(rows)
+    return count
+
+def write_arrow(batches, out):
+    """Writes batches to a binary file as an Arrow IPC stream."""
+    if pa is None:
+        raise RuntimeError("Arrow export requires the pyarrow package")
+    schema = _arrow_schema(next(batches))
+    count = 0
+    with pa_ipc.new_stream(out, schema) as writer:
+        for rows in batches:
+            writer.write_batch(_record_batch(schema, rows))
+            count += len(rows)
+    return count
+
+WRITERS = {'csv': write_csv, 'parquet': write_parquet, 'arrow': write_arrow}
+
+def export_table(table_name, out, fmt='csv', columns=None, filters=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Exports a table to `out` (a file object or path) and returns the number of rows written."""
+    batches = iter_batches(table_name, columns, filters, batch_size)
+    if isinstance(out, (str, os.PathLike)):
+        mode = {'mode': 'w', 'newline': '', 'encoding': 'utf-8'} if fmt == 'csv' else {'mode': 'wb'}
+        with open(out, **mode) as f:
+            return WRITERS[fmt](batches, f)
+    return WRITERS[fmt](batches, out)
+
+def export_to_tempfile(table_name, fmt='csv', columns=None, filters=None):
+    """Exports to an anonymous temporary file and returns it rewound, ready to be read."""
+    f = tempfile.TemporaryFile()
+    if fmt == 'csv':
+        text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+        export_table(table_name, text, fmt, columns, filters)
+        text.flush()
+        text.detach()
+    else:
+        export_table(table_name, f, fmt, columns, filters)
+    f.seek(0)
+    return f
+
+
+# --- Streamlit page ---
+def export_page():
+    """Streamlit page for downloading a table export."""
+    table_name = st.selectbox("Table", EXPORT_TABLES)
+    conn, c = db.connection()
+    try:
+        all_columns = [name for name, _ in table_columns(conn, table_name)]
+    finally:
+        conn.close()
+    columns = st.multiselect("Columns (all if none selected)", all_columns)
+    filters = []
+    date_columns = [column for column in all_columns if column in DATE_COLUMNS]
+    if date_columns:
+        date_column = st.selectbox("Filter by date", [""] + date_columns)
+        if date_column:
+            start = st.date_input("From (YYYY/MM/DD)")
+            end = st.date_input("To (YYYY/MM/DD)")
+            filters = date_range(date_column, start, end)
+    fmt = st.radio("Format", FORMATS if pa is not None else ['csv'], horizontal=True)
+
+    if count_rows(table_name, columns or None, filters, UI_EXPORT_MAX_ROWS + 1) > UI_EXPORT_MAX_ROWS:
+        command = f"python export.py {table_name} {table_name}.{fmt} --format {fmt}"
+        if columns:
+            command += f" --columns {','.join(columns)}"
+        for column, op, value in filters:
+            command += f" --where {column} '{op}' {value}"
+        st.warning(f"This export has more than {UI_EXPORT_MAX_ROWS:,} rows, too many to download here. "
+                   "Run it on the server instead:")
+        st.code(command, language='bash')
+        return
+    # The export runs only when the button is clicked, on Streamlit's download thread
+    st.download_button("Download", data=lambda: export_to_tempfile(table_name, fmt, columns or None, filters),
+                       file_name=f"{table_name}.{fmt}", mime=MIME_TYPES[fmt])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a HIMS table to CSV, Parquet or Arrow.")
+    parser.add_argument('table', choices=EXPORT_TABLES)
+    parser.add_argument('output', help="Output file ('-' for stdout)")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--columns', help="Comma-separated columns to export (default: all)")
+    parser.add_argument('--where', nargs=3, action='append', metavar=('COLUMN', 'OP', 'VALUE'),
+                        default=[], help="Row filter, e.g. --where cost '>=' 500 (repeatable)")
+    parser.add_argument('--date-column', default='test_date_time', help="Column used by --from/--to")
+    parser.add_argument('--from', dest='start', help="First date to include (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end', help="Last date to include (YYYY-MM-DD)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    columns = args.columns.split(',') if args.columns else None
+    filters = [tuple(f) for f in args.where] + date_range(args.date_column, args.start, args.end)
+    if args.output == '-':
+        out = sys.stdout if args.format == 'csv' else sys.stdout.buffer
+        count = export_table(args.table, out, args.format, columns, filters, args.batch_size)
+    else:
+        count = export_table(args.table, args.output, args.format, columns, filters, args.batch_size)
+    print(f"Exported {count} rows from {args.table}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
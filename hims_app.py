@@ -1,13 +1,19 @@
 import streamlit as st
 import database as db
-from patient import Patient
-from department import Department
-from doctor import Doctor
-from prescription import Prescription
-from medical_test import Medical_Test
+import db_metrics
 import config
 import sqlite3 as sql
 
+# Page modules (and pandas, which they use) are imported by the functions below when their module
+# is selected, so the login screen renders without loading them.
+
+@st.cache_resource
+def init_database():
+    """Brings the schema up to date once per server process instead of on every rerun."""
+    db.db_init()
+    db_metrics.start_exporter()  # Metrics endpoint/file, if configured
+    return True
+
 # Authentication Functions
 def authenticate(password, access_code=None):
     """Authenticates the user based on password and optional access code."""
@@ -73,41 +79,92 @@ def module_operations(module_name, option_list, module_object, access_check=None
 
 #Simplified calls for each class
 def patients():
+    from patient import Patient
     patient_option_list = ["", "Add patient", "Update patient", "Delete patient", "Show complete patient record", "Search patient"]
     p = Patient()
     module_operations("Patient", patient_option_list, p, access_check = authenticate_edit_mode)
 
 def doctors():
+    from doctor import Doctor
     doctor_option_list = ["", "Add doctor", "Update doctor", "Delete doctor", "Show complete doctor record", "Search doctor"]
     dr = Doctor()
     module_operations("Doctor", doctor_option_list, dr, access_check = authenticate_edit_mode)
 
 def prescriptions():
+    from prescription import Prescription
     prescription_option_list = ["", "Add prescription", "Update prescription", "Delete prescription", "Show prescriptions of a particular patient"]
     m = Prescription()
     module_operations("Prescription", prescription_option_list, m, access_check = authenticate_dr_mls)
 
 def medical_tests():
+    from medical_test import Medical_Test
     medical_test_option_list = ["", "Add medical test", "Update medical test", "Delete medical test", "Show medical tests of a particular patient"]
     t = Medical_Test()
     module_operations("Medical Test", medical_test_option_list, t, access_check = authenticate_dr_mls)
 
 def departments():
+    from department import Department
     department_option_list = ["", "Add department", "Update department", "Delete department", "Show complete department record", "Search department", "Show doctors of a particular department"]
     d = Department()
     #The additional functionality has been incorporated into the generic module operation's 'additional functionality'
     d.additional_functionality = d.list_dept_doctors
     module_operations("Department", department_option_list, d, access_check = authenticate_edit_mode)
 
+def patient_charts():
+    import patient_chart
+    st.header("PATIENT CHART")
+    patient_chart.chart_page()
+
+def cache_statistics():
+    st.header("CACHE STATISTICS")
+    if not authenticate_edit_mode():
+        st.warning("Cache statistics require edit mode authentication.")
+        return
+    import query_cache
+    query_cache.stats_page()
+
+def data_export():
+    st.header("DATA EXPORT")
+    if not authenticate_edit_mode():  # Exports contain every record, so require edit mode
+        st.warning("Data export requires edit mode authentication.")
+        return
+    import export
+    export.export_page()
+
+def doctor_worklist():
+    st.header("MY WORKLIST")
+    if not authenticate_dr_mls():
+        st.warning("Worklists require Dr/MLS authentication.")
+        return
+    import worklist
+    worklist.worklist_page()
+
+def lab_dashboard():
+    st.header("LAB TURNAROUND")
+    if not authenticate_dr_mls():
+        st.warning("Lab analytics requires Dr/MLS authentication.")
+        return
+    import lab_analytics
+    lab_analytics.dashboard()
+
+def revenue_report():
+    st.header("REVENUE")
+    if not authenticate_edit_mode():
+        st.warning("Revenue reports require edit mode authentication.")
+        return
+    import revenue
+    revenue.revenue_page()
+
 
 # Main Application
+db_metrics.rerun_started()
 st.title("HEALTHCARE INFORMATION MANAGEMENT SYSTEM")
 password = st.sidebar.text_input("Enter Password", type="password")
 
 if authenticate(password):
-    db.db_init()  # Establish database connection and create tables
+    init_database()  # Establish database connection and create tables
 
-    module = st.sidebar.selectbox("Select Module", ["", "Patients", "Doctors", "Prescriptions", "Medical Tests", "Departments"])
+    module = st.sidebar.selectbox("Select Module", ["", "Patients", "Doctors", "Prescriptions", "Medical Tests", "Departments", "Patient Chart", "My Worklist", "Lab Analytics", "Revenue", "Data Export", "Cache Statistics"])
 
     if module == "Patients":
         patients()
@@ -118,4 +175,16 @@ if authenticate(password):
     elif module == "Medical Tests":
         medical_tests()
     elif module == "Departments":
-        departments()
\ No newline at end of file
+        departments()
+    elif module == "Patient Chart":
+        patient_charts()
+    elif module == "My Worklist":
+        doctor_worklist()
+    elif module == "Lab Analytics":
+        lab_dashboard()
+    elif module == "Revenue":
+        revenue_report()
+    elif module == "Data Export":
+        data_export()
+    elif module == "Cache Statistics":
+        cache_statistics()
\ No newline at end of file
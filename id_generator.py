@@ -0,0 +1,158 @@
+"""Time-ordered, collision-free record IDs.
+
+An ID is the record prefix followed by 14 Crockford base32 characters, e.g. P-01JAB3K9QZ-0G00A:
+
+    48 bits  milliseconds since the Unix epoch   (10 chars)
+    10 bits  node: one per running process        (5 chars, together with the sequence)
+    15 bits  sequence within the millisecond
+
+IDs with the same prefix sort in creation order, so new rows are appended to the end of the primary
+key B-tree instead of being scattered across it. The sequence gives 32768 IDs per millisecond per
+process; if it runs out, or the clock steps backwards, the generator keeps counting from the last
+timestamp it used instead of reusing one. Each process leases its own node number through a lock
+file, so several Streamlit workers on one host never share a node.
+"""
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime
+import config
+
+NODE_BITS = 10
+SEQUENCE_BITS = 15
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'  # Crockford base32 (sorts the same as the numbers)
+NODE_LOCK_DIR = getattr(config, 'id_node_lock_dir', os.path.join(tempfile.gettempdir(), 'hims-id-nodes'))
+
+_PAIRS = [a + b for a in ALPHABET for b in ALPHABET]  # 10 bits -> 2 characters
+ID_PATTERN = re.compile(f'[A-Z]+-[{ALPHABET}]{{10}}-[{ALPHABET}]{{5}}')
+
+def _encode(value, length):
+    """Encodes value as `length` (an even number) base32 characters."""
+    chars = []
+    for _ in range(length // 2):
+        chars.append(_PAIRS[value & 1023])
+        value >>= 10
+    return ''.join(reversed(chars))
+
+def _lease_node():
+    """Returns (node, lock_fd): a node number no other live process on this host is using."""
+    configured = getattr(config, 'id_node', None)
+    if configured is not None:
+        return int(configured) & MAX_NODE, None
+    try:
+        import fcntl
+    except ImportError:  # No flock (Windows): fall back to a random node
+        return random.getrandbits(NODE_BITS), None
+    os.makedirs(NODE_LOCK_DIR, exist_ok=True)
+    start = os.getpid() & MAX_NODE
+    for offset in range(MAX_NODE + 1):
+        node = (start + offset) & MAX_NODE
+        fd = os.open(os.path.join(NODE_LOCK_DIR, f'node-{node}.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            continue
+        return node, fd  # The lock is held for as long as the process keeps fd open
+    raise RuntimeError("No free ID node: more than 1024 processes are generating IDs on this host")
+
+
+class IdGenerator:
+    """Thread-safe generator of time-ordered IDs for one process."""
+
+    def __init__(self, node=None):
+        self._lock = threading.Lock()
+        self._fixed_node = node
+        self._node = node
+        self._node_fd = None
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _reset_after_fork(self):
+        # A forked child inherits the parent's lock fd, so it must lease a node of its own
+        self._lock = threading.Lock()
+        if self._fixed_node is None:
+            if self._node_fd is not None:
+                os.close(self._node_fd)
+            self._node, self._node_fd = None, None
+        self._last_ms, self._sequence = -1, 0
+
+    def next_values(self, count=1):
+        """Returns the next `count` IDs as integers, taking the lock once."""
+        values = []
+        with self._lock:
+            if self._node is None:
+                self._node, self._node_fd = _lease_node()
+            node_bits = self._node << SEQUENCE_BITS
+            for _ in range(count):
+                now_ms = time.time_ns() // 1_000_000
+                if now_ms > self._last_ms:
+                    self._last_ms, self._sequence = now_ms, 0
+                else:  # Same millisecond or the clock went backwards: keep counting from the last timestamp
+                    self._sequence += 1
+                    if self._sequence > MAX_SEQUENCE:
+                        self._last_ms, self._sequence = self._last_ms + 1, 0
+                values.append((self._last_ms << (NODE_BITS + SEQUENCE_BITS)) | node_bits | self._sequence)
+        return values
+
+    def next_value(self):
+        """Returns the next ID as an integer."""
+        return self.next_values(1)[0]
+
+    def generate_ids(self, prefix, count):
+        """Returns `count` new IDs formatted as '<prefix>-<time>-<node+sequence>'."""
+        # The node fills the first 2 tail characters and the sequence the last 3, so only the
+        # sequence has to be encoded for IDs that share a millisecond.
+        ids = []
+        head_ms, head = None, None
+        for value in self.next_values(count):
+            ms = value >> (NODE_BITS + SEQUENCE_BITS)
+            if ms != head_ms:
+                node = (value >> SEQUENCE_BITS) & MAX_NODE
+                head_ms, head = ms, f'{prefix}-{_encode(ms, 10)}-{_PAIRS[node]}'
+            sequence = value & MAX_SEQUENCE
+            ids.append(head + _PAIRS[sequence >> 5] + ALPHABET[sequence & 31])
+        return ids
+
+    def generate_id(self, prefix):
+        """Returns the next ID formatted as '<prefix>-<time>-<node+sequence>'."""
+        return self.generate_ids(prefix, 1)[0]
+
+
+_generator = IdGenerator()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_generator._reset_after_fork)
+
+def generate_id(prefix):
+    """Returns a new unique ID with the given prefix ('P', 'DR', 'M' or 'T')."""
+    return _generator.generate_id(prefix)
+
+def generate_ids(prefix, count):
+    """Returns `count` new unique IDs with the given prefix, in increasing order."""
+    return _generator.generate_ids(prefix, count)
+
+def is_generated(record_id):
+    """Tells if record_id has the layout of generate_id's IDs (older and imported IDs may not)."""
+    return ID_PATTERN.fullmatch(record_id) is not None
+
+def id_timestamp(record_id):
+    """Returns the creation time (a datetime) encoded in an ID produced by generate_id."""
+    encoded = record_id.split('-')[-2]
+    ms = 0
+    for char in encoded:
+        ms = ms * 32 + ALPHABET.index(char)
+    return datetime.fromtimestamp(ms / 1000)
+
+def id_floor(prefix, when):
+    """Returns the smallest ID with the given prefix that generate_id could produce at or after `when`.
+
+    `id_floor(prefix, since) <= record_id < id_floor(prefix, until)` selects the records created in
+    that interval as an index range. IDs in other layouts (see is_generated) can fall in it too.
+    """
+    ms = int(when.timestamp() * 1000)
+    return f'{prefix}-{_encode(ms, 10)}-00000'
@@ -0,0 +1,225 @@
+"""Lab turnaround-time analytics (result time minus test time) over medical_test_record.
+
+Per day, per test name, lab scientist and doctor, lab_turnaround_daily holds the number of tests
+with a result and the mean, p50, p95 and p99 turnaround in minutes. Triggers log the day of every
+inserted, updated or deleted test in lab_turnaround_dirty; refresh() recomputes only those days
+(an index range scan on test_date_time per day) and replaces their rollup rows, in one job on the
+writer thread. Turnaround minutes are computed by SQLite and the aggregation is a vectorised pandas
+groupby. A full recompute (or a refresh of more than FULL_REFRESH_DAYS days) goes through the table
+one calendar month per write transaction, so only a month of tests is held in memory at a time.
+
+The dashboard only reads the rollups; they are refreshed by its Refresh button, or by running this
+module (e.g. from cron), not on every rerun of the page.
+
+    python lab_analytics.py           # refresh changed days
+    python lab_analytics.py --full    # recompute everything
+"""
+import argparse
+import time
+
+import pandas as pd
+import streamlit as st
+
+import database as db
+
+DIMENSIONS = {
+    'test_name': "Test name",
+    'medical_lab_scientist_id': "Medical lab scientist ID",
+    'doctor_id': "Doctor ID",
+}
+AWAITED = "Test result awaited"
+ROLLUP_COLUMNS = ['dimension', 'dimension_value', 'day', 'tests', 'mean_minutes', 'p50_minutes', 'p95_minutes',
+                  'p99_minutes']
+# Above this many changed days a single full scan is cheaper than one range scan per day
+FULL_REFRESH_DAYS = 60
+
+TURNAROUND_SELECT = f"""
+    SELECT substr(test_date_time, 1, 10) AS day, test_name, medical_lab_scientist_id, doctor_id,
+           (strftime('%s', result_date_time) - strftime('%s', test_date_time)) / 60.0 AS minutes
+    FROM medical_test_record
+    WHERE result_and_diagnosis IS NOT '{AWAITED}' AND result_date_time >= test_date_time
+"""
+
+def _frame(conn, query, params=()):
+    cursor = conn.execute(query, params)
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+
+def load_turnaround(conn, days=None):
+    """Returns a DataFrame of day, dimension columns and turnaround minutes (for `days`, or all)."""
+    if days is None:
+        return _frame(conn, TURNAROUND_SELECT)
+    rows = []
+    for day in days:
+        rows.extend(conn.execute(TURNAROUND_SELECT + " AND test_date_time >= ? AND test_date_time < date(?, '+1 day')",
+                                 (day, day)).fetchall())
+    return pd.DataFrame.from_records(rows, columns=['day', *DIMENSIONS, 'minutes'])
+
+def compute_rollups(frame):
+    """Aggregates turnaround minutes per (dimension, value, day) into rollup rows."""
+    if frame.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    rollups = []
+    for dimension in DIMENSIONS:
+        grouped = frame.groupby([dimension, 'day'])['minutes']
+        stats = grouped.agg(['count', 'mean'])
+        quantiles = grouped.quantile([0.5, 0.95, 0.99]).unstack()
+        stats = stats.join(quantiles).reset_index()
+        stats.insert(0, 'dimension', dimension)
+        stats.columns = ROLLUP_COLUMNS
+        rollups.append(stats)
+    return pd.concat(rollups, ignore_index=True)
+
+def _insert(conn, rollups):
+    conn.executemany(
+        """
+        INSERT INTO lab_turnaround_daily (dimension, dimension_value, day, tests, mean_minutes,
+                                          p50_minutes, p95_minutes, p99_minutes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        rollups[ROLLUP_COLUMNS].astype(object).values.tolist(),
+    )
+
+# The jobs below run on the writer thread, so they read the tests as of their own transaction and
+# two sessions refreshing at once cannot overwrite newer rollups with older ones.
+def _refresh_changed(conn):
+    """Recomputes the days logged as changed; returns their number, or None if there are too many."""
+    last_dirty_id = conn.execute("SELECT MAX(id) FROM lab_turnaround_dirty").fetchone()[0]
+    if last_dirty_id is None:
+        return 0
+    days = [row[0] for row in conn.execute(
+        "SELECT DISTINCT day FROM lab_turnaround_dirty WHERE id <= ? AND day IS NOT NULL", (last_dirty_id,))]
+    if len(days) > FULL_REFRESH_DAYS:
+        return None
+    rollups = compute_rollups(load_turnaround(conn, days))
+    conn.executemany("DELETE FROM lab_turnaround_daily WHERE day = ?", [(day,) for day in days])
+    _insert(conn, rollups)
+    conn.execute("DELETE FROM lab_turnaround_dirty WHERE id <= ?", (last_dirty_id,))
+    return len(days)
+
+def _refresh_range(conn, start, end):
+    """Recomputes the days from start up to (not including) end, both 'YYYY-MM-DD'."""
+    rollups = compute_rollups(_frame(conn, TURNAROUND_SELECT + " AND test_date_time >= ? AND test_date_time < ?",
+                                     (start, end)))
+    conn.execute("DELETE FROM lab_turnaround_daily WHERE day >= ? AND day < ?", (start, end))
+    _insert(conn, rollups)
+
+def _finish_full_refresh(conn, start, end, last_dirty_id):
+    """Drops rollups outside the recomputed days and the changes logged before the full refresh began."""
+    conn.execute("DELETE FROM lab_turnaround_daily WHERE day < ? OR day >= ?", (start, end))
+    conn.execute("DELETE FROM lab_turnaround_dirty WHERE id <= ?", (last_dirty_id,))
+
+def _months(first, last):
+    """[(start, end)] of the calendar months from the day `first` to the day `last`."""
+    month = pd.Period(first, 'M')
+    months = []
+    while month <= pd.Period(last, 'M'):
+        months.append((month.start_time.strftime('%Y-%m-%d'), (month + 1).start_time.strftime('%Y-%m-%d')))
+        month += 1
+    return months
+
+def refresh_all():
+    """Recomputes every day, one month per write transaction, so memory stays bounded by a month of tests."""
+    db.require_summary_tables("Lab analytics")
+    conn, c = db.connection()
+    try:
+        c.execute("SELECT MAX(id) FROM lab_turnaround_dirty")
+        last_dirty_id = c.fetchone()[0] or 0
+        c.execute("SELECT MIN(test_date_time), MAX(test_date_time) FROM medical_test_record")
+        first, last = c.fetchone()
+    finally:
+        conn.close()
+    months = _months(first[:10], last[:10]) if first else []
+    for start, end in months:
+        db.run_write(_refresh_range, start, end)
+    # Tests added meanwhile log their days as changed (after last_dirty_id) for the next refresh
+    db.run_write(_finish_full_refresh, months[0][0] if months else '', months[-1][1] if months else '',
+                 last_dirty_id)
+
+def pending_days():
+    """Returns the number of days whose tests changed since the last refresh."""
+    db.require_summary_tables("Lab analytics")
+    conn, c = db.connection()
+    try:
+        c.execute("SELECT COUNT(DISTINCT day) FROM lab_turnaround_dirty")
+        return c.fetchone()[0]
+    finally:
+        conn.close()
+
+def refresh(full=False):
+    """Brings lab_turnaround_daily up to date and returns the number of days recomputed (None = all)."""
+    db.require_summary_tables("Lab analytics")
+    if not full:
+        days = db.run_write(_refresh_changed)
+        if days is not None:
+            return days
+    refresh_all()
+    return None
+
+def turnaround(dimension, start=None, end=None, value=None):
+    """Reads rollup rows for a dimension (optionally one value and a day range) as a DataFrame."""
+    db.require_summary_tables("Lab analytics")
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unknown dimension: {dimension}")
+    query = "SELECT * FROM lab_turnaround_daily WHERE dimension = ?"
+    params = [dimension]
+    if value:
+        query += " AND dimension_value = ?"
+        params.append(value)
+    if start:
+        query += " AND day >= ?"
+        params.append(str(start))
+    if end:
+        query += " AND day <= ?"
+        params.append(str(end))
+    conn, c = db.connection()
+    try:
+        return _frame(conn, query + " ORDER BY day, dimension_value", params)
+    finally:
+        conn.close()
+
+
+# --- Streamlit page ---
+def dashboard():
+    """Streamlit page with turnaround percentiles per day."""
+    if not db.backend.summary_tables:
+        st.info(f"Lab analytics are not available on the {db.backend.name} backend.")
+        return
+    if st.button("Refresh", help="Recompute the days whose tests changed since the last refresh"):
+        try:
+            days = refresh()
+            st.success(f"Recomputed {'all' if days is None else days} day(s).")
+        except Exception as e:
+            st.error(f"Error refreshing lab analytics: {e}")
+    else:
+        pending = pending_days()
+        if pending:
+            st.caption(f"{pending} day(s) changed since the last refresh; click Refresh to include them.")
+    dimension = st.selectbox("Group by", list(DIMENSIONS), format_func=DIMENSIONS.get)
+    value = st.text_input(f"{DIMENSIONS[dimension]} (leave empty for all)")
+    start = st.date_input("From (YYYY/MM/DD)", value=pd.Timestamp.today() - pd.Timedelta(days=30))
+    end = st.date_input("To (YYYY/MM/DD)")
+    rollups = turnaround(dimension, start, end, value or None)
+    if rollups.empty:
+        st.warning('No data to show')
+        return
+    if value:
+        st.line_chart(rollups.set_index('day')[['p50_minutes', 'p95_minutes', 'p99_minutes']])
+    else:
+        st.line_chart(rollups.pivot_table(index='day', columns='dimension_value', values='p95_minutes'))
+    st.write(rollups.drop(columns='dimension').rename(columns={
+        'dimension_value': DIMENSIONS[dimension], 'day': "Day (YYYY-MM-DD)", 'tests': "Tests",
+        'mean_minutes': "Mean (min)", 'p50_minutes': "p50 (min)", 'p95_minutes': "p95 (min)",
+        'p99_minutes': "p99 (min)"}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the lab turnaround rollups.")
+    parser.add_argument('--full', action='store_true', help="Recompute every day instead of changed days only")
+    args = parser.parse_args()
+    db.db_init()
+    start = time.perf_counter()
+    days = refresh(full=args.full)
+    print(f"Recomputed {'all' if days is None else days} days in {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""Ingestion of lab results from analyser files into medical_test_record.
+
+Analysers drop result files (CSV or HL7 v2 ORU messages) into a folder. Each file is streamed in
+batches of rows, the rows are matched to existing medical_test_record IDs, and the matched results
+are loaded into a temp table and applied to result_and_diagnosis and result_date_time with one
+UPDATE ... FROM per batch on the writer thread (the next batch is parsed while the previous one
+commits). Rows that cannot be applied (unknown test ID, missing result, unparseable time) are
+written to an unmatched-rows CSV with the reason. The temp table, INSERT OR REPLACE and UPDATE ...
+FROM are SQLite's, so ingestion needs the SQLite backend, like the features fed by the summary tables.
+
+Replaying a file is harmless: an update only sets the values from the file, and rows that already
+hold them are skipped (counted as unchanged), so a file that was interrupted or dropped twice can
+simply be ingested again. When results for the same test appear more than once, the last one wins.
+
+CSV files need a test_id (or id) column, a result_and_diagnosis (or result) column and a
+result_date_time column (YYYY-MM-DD HH:MM or DD-MM-YYYY (HH:MM)). In HL7 messages the test ID is
+the placer order number (OBR-2, or the filler order number OBR-3 if empty), the result text is
+built from the OBX segments and the result time is OBR-22 (else the latest OBX-14, else MSH-7).
+
+    python lab_ingest.py results.csv run_0412.hl7
+    python lab_ingest.py --watch /srv/analyser-drop --interval 2
+
+In watch mode, files are picked up once they have not changed for LAB_INGEST_SETTLE_SECONDS, then
+moved to processed/ (or failed/ if they cannot be read); reports go to reports/. A file that fails
+with a database error (e.g. the database is locked) stays where it is and is tried again on the next
+scan.
+"""
+import argparse
+import os
+import shutil
+import sqlite3 as sql
+import time
+
+import pandas as pd
+
+import database as db
+import patient_chart
+import query_cache
+from bulk_import import existing_ids, normalise_dates
+from repository import DATE_TIME_FORMAT
+import config
+
+LAB_INGEST_BATCH_SIZE = getattr(config, 'lab_ingest_batch_size', 5000)
+LAB_INGEST_SETTLE_SECONDS = getattr(config, 'lab_ingest_settle_seconds', 2)
+
+CSV_EXTENSIONS = ('.csv',)
+HL7_EXTENSIONS = ('.hl7', '.oru')
+COLUMNS = ['source_row', 'id', 'result_and_diagnosis', 'result_date_time']
+CSV_ALIASES = {'test_id': 'id', 'result': 'result_and_diagnosis'}
+
+# A batch is staged in a temp table and applied with one UPDATE statement: run row by row, every
+# update would flush the full-text index's pending terms (one statement savepoint per row).
+UPDATE_RESULTS = """
+    UPDATE medical_test_record AS t
+    SET result_and_diagnosis = r.result_and_diagnosis, result_date_time = r.result_date_time
+    FROM temp.lab_result_batch r
+    WHERE t.id = r.id
+      AND (t.result_and_diagnosis IS NOT r.result_and_diagnosis OR t.result_date_time IS NOT r.result_date_time)
+"""
+
+
+# --- Reading ---
+def read_csv_batches(path, batch_size=LAB_INGEST_BATCH_SIZE):
+    """Yields DataFrames with COLUMNS from a CSV result file."""
+    offset = 0
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=batch_size):
+        chunk = chunk.rename(columns=lambda name: CSV_ALIASES.get(name.strip().lower(), name.strip().lower()))
+        for column in COLUMNS[1:]:
+            if column not in chunk.columns:
+                raise ValueError(f"{path}: missing column {column}")
+        chunk['source_row'] = range(offset + 1, offset + len(chunk) + 1)
+        offset += len(chunk)
+        yield chunk[COLUMNS]
+
+def _hl7_time(value):
+    """Converts an HL7 timestamp (YYYYMMDDHHMM[SS...]) to YYYY-MM-DD HH:MM; '' if it is not one.
+
+    Only the layout is checked here; match_batch() rejects impossible dates.
+    """
+    if len(value) < 12 or not value[:12].isdigit():
+        return ''
+    return f"{value[:4]}-{value[4:6]}-{value[6:8]} {value[8:10]}:{value[10:12]}"
+
+def _field(fields, index):
+    return fields[index] if len(fields) > index else ''
+
+def parse_hl7(segments):
+    """Yields (test ID, result text, result time) for every OBR group in a stream of HL7 v2 segments."""
+    separator = '|'
+    message_time = ''
+    order = None
+
+    def finish(order):
+        test_id, result_time, observations, observation_time = order
+        return test_id, '; '.join(observations), result_time or observation_time or message_time
+
+    for segment in segments:
+        segment = segment.rstrip('\r\n')
+        kind = segment[:3]
+        if kind == 'MSH':
+            if order:
+                yield finish(order)
+                order = None
+            separator = segment[3:4] or '|'
+            message_time = _hl7_time(_field(segment.split(separator), 6))  # MSH-7 (MSH-1 is the separator)
+            continue
+        if kind not in ('OBR', 'OBX'):
+            continue
+        fields = segment.split(separator)
+        if kind == 'OBR':
+            if order:
+                yield finish(order)
+            test_id = (_field(fields, 2) or _field(fields, 3)).split('^')[0]
+            order = [test_id, _hl7_time(_field(fields, 22)), [], '']
+        elif order is not None:
+            name = _field(fields, 3).split('^')
+            text_value = f"{name[1] if len(name) > 1 and name[1] else name[0]}: {_field(fields, 5)}"
+            units = _field(fields, 6).split('^')[0]
+            if units:
+                text_value += f" {units}"
+            if _field(fields, 7):
+                text_value += f" (ref {_field(fields, 7)})"
+            if _field(fields, 8) and _field(fields, 8) != 'N':
+                text_value += f" [{_field(fields, 8)}]"
+            order[2].append(text_value)
+            order[3] = max(order[3], _hl7_time(_field(fields, 14)))
+    if order:
+        yield finish(order)
+
+def read_hl7_batches(path, batch_size=LAB_INGEST_BATCH_SIZE):
+    """Yields DataFrames with COLUMNS from an HL7 result file (one row per OBR)."""
+    # Text mode turns the \r segment terminators into line ends, so the file is read segment by segment
+    with open(path, encoding='utf-8', errors='replace') as f:
+        batch = []
+        for row_number, result in enumerate(parse_hl7(f), start=1):
+            batch.append((row_number,) + result)
+            if len(batch) == batch_size:
+                yield pd.DataFrame(batch, columns=COLUMNS)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=COLUMNS)
+
+def read_batches(path, batch_size=LAB_INGEST_BATCH_SIZE):
+    if path.lower().endswith(HL7_EXTENSIONS):
+        return read_hl7_batches(path, batch_size)
+    return read_csv_batches(path, batch_size)
+
+
+# --- Matching and writing ---
+def match_batch(conn, batch):
+    """Splits a batch into (rows to apply as (result, time, id) tuples, unmatched rows with a reason)."""
+    batch = batch.copy()
+    for column in COLUMNS[1:]:
+        batch[column] = batch[column].fillna('').astype(str).str.strip()
+    reasons = pd.Series('', index=batch.index, dtype=object)
+
+    def reject(mask, reason):
+        reasons[mask & (reasons == '')] = reason
+
+    reject(batch['id'] == '', "missing test ID")
+    reject(batch['result_and_diagnosis'] == '', "missing result")
+    result_date_time, invalid = normalise_dates(batch['result_date_time'], DATE_TIME_FORMAT, '%d-%m-%Y (%H:%M)')
+    reject(invalid, "invalid result_date_time")
+    known = existing_ids(conn, 'medical_test_record', batch.loc[reasons == '', 'id'].unique())
+    reject(~batch['id'].isin(known), "unknown test ID")
+
+    matched = reasons == ''
+    unmatched = batch[~matched].copy()
+    unmatched['reason'] = reasons[~matched]
+    values = list(zip(batch.loc[matched, 'result_and_diagnosis'], result_date_time[matched], batch.loc[matched, 'id']))
+    return values, unmatched
+
+def _apply_results(conn, values):
+    """Runs on the writer thread; returns the number of tests whose result changed."""
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS lab_result_batch (
+            id TEXT PRIMARY KEY, result_and_diagnosis TEXT, result_date_time TEXT
+        )
+    """)
+    try:
+        # OR REPLACE keeps the last result when a test appears twice in the batch
+        conn.executemany("INSERT OR REPLACE INTO temp.lab_result_batch (result_and_diagnosis, result_date_time, id) "
+                         "VALUES (?, ?, ?)", values)
+        return conn.execute(UPDATE_RESULTS).rowcount
+    finally:
+        conn.execute("DELETE FROM temp.lab_result_batch")
+
+def ingest_file(path, report_path=None, batch_size=LAB_INGEST_BATCH_SIZE):
+    """Applies the results in a CSV/HL7 file and returns counts of what happened to its rows.
+
+    Unmatched rows are written to report_path (default '<path>.unmatched.csv'); no report is left
+    behind if every row matched.
+    """
+    db.require_summary_tables("Lab result ingestion")
+    report_path = report_path or path + '.unmatched.csv'
+    if os.path.exists(report_path):
+        os.remove(report_path)
+    summary = {'file': path, 'rows': 0, 'updated': 0, 'unchanged': 0, 'unmatched': 0}
+    start = time.perf_counter()
+
+    def finish(pending):
+        # Waits for a batch's update to commit, then counts it and reports its unmatched rows
+        values, unmatched, future = pending
+        updated = future.result() if future else 0
+        summary['updated'] += updated
+        summary['unchanged'] += len(values) - updated
+        summary['unmatched'] += len(unmatched)
+        if len(unmatched):
+            unmatched.to_csv(report_path, mode='a', index=False, header=not os.path.exists(report_path))
+
+    pending = None
+    try:
+        for batch in read_batches(path, batch_size):
+            summary['rows'] += len(batch)
+            conn, _ = db.connection()
+            try:
+                values, unmatched = match_batch(conn, batch)
+            finally:
+                conn.close()
+            # The update runs on the writer thread while the next batch is read and matched
+            future = db.writer.submit(_apply_results, values) if values else None
+            if pending:
+                finish(pending)
+            pending = (values, unmatched, future)
+        if pending:
+            finish(pending)
+    finally:
+        if summary['updated']:
+            query_cache.bump('medical_test_record')
+            patient_chart.invalidate()
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+# --- Watching a folder ---
+def _ready_files(folder, settle_seconds):
+    """Result files in folder that have not been modified for settle_seconds, oldest first."""
+    now = time.time()
+    files = []
+    for entry in os.scandir(folder):
+        if (entry.is_file() and not entry.name.startswith('.')
+                and entry.name.lower().endswith(CSV_EXTENSIONS + HL7_EXTENSIONS)):
+            modified = entry.stat().st_mtime
+            if now - modified >= settle_seconds:
+                files.append((modified, entry.path))
+    return [path for _, path in sorted(files)]
+
+def _move(path, folder):
+    os.makedirs(folder, exist_ok=True)
+    target = os.path.join(folder, os.path.basename(path))
+    if os.path.exists(target):
+        stem, extension = os.path.splitext(target)
+        target = f"{stem}.{time.strftime('%Y%m%d%H%M%S')}{extension}"
+    shutil.move(path, target)
+
+def watch(folder, interval=2.0, settle_seconds=LAB_INGEST_SETTLE_SECONDS, batch_size=LAB_INGEST_BATCH_SIZE,
+          progress=None, once=False):
+    """Ingests every result file dropped into folder, until interrupted (or one pass if once)."""
+    db.require_summary_tables("Lab result ingestion")  # Before the loop, which would retry it forever
+    processed, failed, reports = (os.path.join(folder, name) for name in ('processed', 'failed', 'reports'))
+    os.makedirs(reports, exist_ok=True)
+    while True:
+        for path in _ready_files(folder, settle_seconds):
+            report_path = os.path.join(reports, os.path.basename(path) + '.unmatched.csv')
+            try:
+                summary = ingest_file(path, report_path, batch_size)
+            except sql.Error as e:  # Not the file's fault; replaying it later is harmless
+                summary = {'file': path, 'error': str(e), 'retry': True}
+            except (ValueError, OSError, pd.errors.ParserError) as e:
+                _move(path, failed)
+                summary = {'file': path, 'error': str(e)}
+            else:
+                _move(path, processed)
+            if progress:
+                progress(summary)
+        if once:
+            return
+        time.sleep(interval)
+
+
+def report(summary):
+    if 'error' in summary:
+        retry = "; will retry" if summary.get('retry') else ""
+        print(f"{summary['file']}: failed ({summary['error']}{retry})")
+        return
+    rate = summary['rows'] / summary['seconds'] if summary['seconds'] else 0
+    print(f"{summary['file']}: {summary['rows']} rows, {summary['updated']} updated, "
+          f"{summary['unchanged']} unchanged, {summary['unmatched']} unmatched ({rate:,.0f} rows/sec)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest lab results from analyser CSV/HL7 files.")
+    parser.add_argument('files', nargs='*', help="Result files to ingest")
+    parser.add_argument('--watch', metavar='FOLDER', help="Keep ingesting files dropped into FOLDER")
+    parser.add_argument('--interval', type=float, default=2.0, help="Seconds between folder scans")
+    parser.add_argument('--batch-size', type=int, default=LAB_INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+    if not args.files and not args.watch:
+        parser.error("Give result files to ingest or --watch FOLDER")
+
+    db.db_init()
+    for path in args.files:
+        report(ingest_file(path, batch_size=args.batch_size))
+    if args.watch:
+        try:
+            watch(args.watch, args.interval, batch_size=args.batch_size, progress=report)
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == '__main__':
+    main()
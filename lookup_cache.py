@@ -0,0 +1,117 @@
+"""Shared cache for ID -> name and ID-existence lookups.
+
+The prescription and medical test forms look up the same patient, doctor and department IDs on
+every Streamlit rerun. Results are kept in one process-wide LRU cache with a time-to-live; the
+update/delete paths invalidate the entries for the rows they change, and the TTL bounds how long a
+change made by another process (e.g. a bulk import) can go unnoticed.
+
+Values are loaded outside the lock, so an invalidation can happen while a load is running; every
+invalidation bumps a generation counter and a load that started before it is returned but not
+stored. Negative results (False/None: no such row yet) are never cached, so a record is found as
+soon as it is created.
+"""
+import threading
+import time
+from collections import OrderedDict
+import database as db
+import db_metrics
+import config
+
+CACHE_SIZE = getattr(config, 'lookup_cache_size', 4096)
+CACHE_TTL = getattr(config, 'lookup_cache_ttl', 300)  # seconds
+
+
+class LookupCache:
+    """Thread-safe, size-bounded LRU cache with a TTL and hit/miss counters."""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, name='lookup'):
+        self.name = name  # Label of its hit/miss counts in db_metrics
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0  # Bumped by every invalidation
+        self.hits = self.misses = self.evictions = 0
+
+    def get_or_load(self, key, load):
+        """Returns the cached value for key, calling load() to fill it on a miss or expiry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                db_metrics.cache_event(self.name, 'hit')
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+        db_metrics.cache_event(self.name, 'miss')
+        value = load()
+        if value is None or value is False:
+            return value
+        with self._lock:
+            if self._generation != generation:  # Invalidated while loading: the value may be stale
+                return value
+            self._data[key] = (value, now)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, table_name, id_value=None):
+        """Drops the entries of one row, or of the whole table if id_value is None."""
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._data if k[1] == table_name and (id_value is None or k[2] == id_value)]:
+                del self._data[key]
+
+    def invalidate_matching(self, predicate):
+        """Drops every entry for which predicate(key, value) is true."""
+        with self._lock:
+            self._generation += 1
+            for key in [k for k, (value, _) in self._data.items() if predicate(k, value)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self):
+        """Returns size, hits, misses, evictions and hit ratio."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions,
+                    'hit_ratio': self.hits / total if total else 0.0}
+
+
+cache = LookupCache()
+
+def _query_one(query, params):
+    conn, c = db.connection()
+    try:
+        c.execute(query, params)
+        return c.fetchone()
+    finally:
+        conn.close()
+
+def id_exists(table_name, id_value):
+    """Cached check that a row with this ID exists in table_name."""
+    return cache.get_or_load(('exists', table_name, id_value),
+                             lambda: _query_one(f"SELECT 1 FROM {table_name} WHERE id = ?", (id_value,)) is not None)
+
+def fetch_name(table_name, id_value):
+    """Cached name of the row with this ID in table_name (None if there is no such row)."""
+    def load():
+        result = _query_one(f"SELECT name FROM {table_name} WHERE id = ?", (id_value,))
+        return result[0] if result else None
+    return cache.get_or_load(('name', table_name, id_value), load)
+
+def invalidate(table_name, id_value=None):
+    """Call after inserting, updating or deleting rows of table_name."""
+    cache.invalidate(table_name, id_value)
+
+def stats():
+    return cache.stats()
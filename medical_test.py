@@ -1,18 +1,17 @@
 import streamlit as st
 from datetime import datetime, time
-import database as db
-import pandas as pd
 import patient
-import doctor
+import id_generator
+import lookup_cache
+import repository
+import query_cache
+import async_db
+from repository import DATE_TIME_FORMAT
 
 # --- Utility Functions ---
 def verify_id_exists(table_name, id_value):
     """Verifies if an ID exists in a given table."""
-    conn, c = db.connection()
-    c.execute(f"SELECT id FROM {table_name} WHERE id = ?", (id_value,))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
+    return lookup_cache.id_exists(table_name, id_value)
 
 def show_details(list_of_records, titles):
     """Displays details in a Streamlit DataFrame."""
@@ -20,24 +19,16 @@ def show_details(list_of_records, titles):
         st.warning('No data to show')
         return
 
-    data = [list(record) for record in list_of_records]
-    df = pd.DataFrame(data, columns=titles)
+    df = query_cache.frame(list_of_records, titles)
     st.write(df)
 
-def generate_id(prefix='T'):
-    """Generates a unique ID."""
-    now = datetime.now()
-    id_1 = now.strftime('%S%M%H')
-    id_2 = now.strftime('%Y%m%d')[2:]
-    return f'{prefix}-{id_1}-{id_2}'
-
 def fetch_name(table_name, id_value):
     """Fetches a name from a given table by ID."""
-    conn, c = db.connection()
-    c.execute(f"SELECT name FROM {table_name} WHERE id = ?", (id_value,))
-    result = c.fetchone()
-    conn.close()
-    return result[0] if result else None
+    return lookup_cache.fetch_name(table_name, id_value)
+
+def medical_tests_in_range(start, end, **key):
+    """Returns the medical tests with test_date_time in [start, end], oldest first (see repository)."""
+    return repository.medical_tests.in_range(start, end, **key)
 
 
 # --- Medical Test Class ---
@@ -67,46 +58,50 @@ class Medical_Test:
 
         else:
              st.write('Enter medical test details:')
-             self.id = generate_id()
+             self.id = id_generator.generate_id("T")
              st.write(f'New Medical test ID: {self.id}')
 
         self.test_name = st.text_input('Test name')
         patient_id = st.text_input('Patient ID')
+        patient_status = st.container()
+        doctor_id = st.text_input('Doctor ID')
+        doctor_status = st.container()
+
+        # Look both IDs up concurrently; an unknown ID has no name
+        self.patient_name, self.doctor_name = async_db.run_sync(async_db.fetch_names(
+            ('patient_record', patient_id), ('doctor_record', doctor_id)))
 
         if patient_id:
-            if not patient.verify_patient_id(patient_id):
-                st.error('Invalid Patient ID')
+            if not self.patient_name:
+                patient_status.error('Invalid Patient ID')
             else:
-                st.success('Patient ID Verified')
+                patient_status.success('Patient ID Verified')
                 self.patient_id = patient_id
-                self.patient_name = fetch_name('patient_record', patient_id)
-                st.write(f'Patient Name: {self.patient_name}')
+                patient_status.write(f'Patient Name: {self.patient_name}')
         else:
              self.patient_id = None
-             st.warning('Patient ID is required.')
+             patient_status.warning('Patient ID is required.')
 
-        doctor_id = st.text_input('Doctor ID')
         if doctor_id:
-            if not doctor.verify_doctor_id(doctor_id):
-                st.error('Invalid Doctor ID')
+            if not self.doctor_name:
+                doctor_status.error('Invalid Doctor ID')
             else:
-                st.success('Doctor ID Verified')
+                doctor_status.success('Doctor ID Verified')
                 self.doctor_id = doctor_id
-                self.doctor_name = fetch_name('doctor_record', doctor_id)
-                st.write(f'Doctor Name: {self.doctor_name}')
+                doctor_status.write(f'Doctor Name: {self.doctor_name}')
         else:
              self.doctor_id = None
-             st.warning('Doctor ID is required.')
+             doctor_status.warning('Doctor ID is required.')
 
         self.medical_lab_scientist_id = st.text_input('Medical lab scientist ID')
 
         test_date = st.date_input('Test date (YYYY/MM/DD)')
         test_time = st.time_input('Test time (hh:mm)', time(0, 0))
-        self.test_date_time = f'{test_date.strftime("%d-%m-%Y")} ({test_time.strftime("%H:%M")})'
+        self.test_date_time = datetime.combine(test_date, test_time).strftime(DATE_TIME_FORMAT)
 
         result_date = st.date_input('Result date (YYYY/MM/DD)')
         result_time = st.time_input('Result time (hh:mm)', time(0, 0))
-        self.result_date_time = f'{result_date.strftime("%d-%m-%Y")} ({result_time.strftime("%H:%M")})'
+        self.result_date_time = datetime.combine(result_date, result_time).strftime(DATE_TIME_FORMAT)
 
         self.cost = st.number_input('Cost (INR)', value=0, min_value=0, max_value=10000)
         self.result_and_diagnosis = st.text_area('Result and diagnosis', value = "Test result awaited")
@@ -115,6 +110,10 @@ class Medical_Test:
 
         return st.button('Save')
 
+    def record(self):
+        """Returns the form values as a dict for the repository."""
+        return {column: getattr(self, column) for column in repository.medical_tests.columns}
+
     def add_medical_test(self):
         """Adds a new medical test record to the database."""
         if self.medical_test_form():
@@ -122,29 +121,12 @@ class Medical_Test:
                 st.error("Please complete all the input")
                 return
 
-            conn, c = db.connection()
             try:
-                c.execute(
-                    """
-                    INSERT INTO medical_test_record
-                    (id, test_name, patient_id, patient_name, doctor_id,
-                     doctor_name, medical_lab_scientist_id, test_date_time,
-                     result_date_time, cost, result_and_diagnosis, description,
-                     comments)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (self.id, self.test_name, self.patient_id, self.patient_name,
-                     self.doctor_id, self.doctor_name, self.medical_lab_scientist_id,
-                     self.test_date_time, self.result_date_time, self.cost,
-                     self.result_and_diagnosis, self.description, self.comments)
-                )
-                conn.commit() #save data if successful
+                repository.medical_tests.create(self.record())
                 st.success('Medical test details saved successfully.')
 
             except Exception as e:
                  st.error(f"Error saving medical test: {e}")
-            finally:
-                conn.close()
 
     def update_medical_test(self):
         """Updates an existing medical test record in the database."""
@@ -159,31 +141,14 @@ class Medical_Test:
         st.success('Medical Test ID Verified')
         if self.medical_test_form(medical_test_id):
 
-            conn, c = db.connection()
             try:
-                c.execute(
-                    """
-                    UPDATE medical_test_record
-                    SET test_name=?, patient_id=?, patient_name=?, doctor_id=?,
-                     doctor_name=?, medical_lab_scientist_id=?, test_date_time=?,
-                     result_date_time=?, cost=?, result_and_diagnosis=?, description=?,
-                     comments=?
-                    WHERE id = ?
-                    """,
-                    (self.test_name, self.patient_id, self.patient_name,
-                     self.doctor_id, self.doctor_name, self.medical_lab_scientist_id,
-                     self.test_date_time, self.result_date_time, self.cost,
-                     self.result_and_diagnosis, self.description, self.comments,
-                     medical_test_id)
-                )
-
-                conn.commit() #Save data if successful
+                record = self.record()
+                del record['id']
+                repository.medical_tests.update(medical_test_id, record)
                 st.success('Medical test details updated successfully.')
 
             except Exception as e:
                 st.error(f"Error updating medical test: {e}")
-            finally:
-                conn.close()
 
 
 
@@ -198,13 +163,10 @@ class Medical_Test:
             return
 
         st.success('Medical Test ID Verified')
-        conn, c = db.connection()
 
         try:
             # Show the current details before deletion
-            c.execute("SELECT * FROM medical_test_record WHERE id = ?", (medical_test_id,))
-            details = c.fetchall()
-            show_medical_test_details(details)
+            show_medical_test_details([repository.medical_tests.get(medical_test_id)])
 
             confirm_delete = st.checkbox('Confirm Deletion')
 
@@ -212,13 +174,10 @@ class Medical_Test:
                 delete = st.button('Delete')
 
                 if delete:
-                    c.execute("DELETE FROM medical_test_record WHERE id = ?", (medical_test_id,))
-                    conn.commit() #Save data if successful
+                    repository.medical_tests.delete(medical_test_id)
                     st.success('Medical test details deleted successfully.')
         except Exception as e:
             st.error(f"Error deleting medical test: {e}")
-        finally:
-             conn.close()
 
 
     def medical_tests_by_patient(self):
@@ -237,16 +196,12 @@ class Medical_Test:
             st.error("Patient name not found.")
             return
 
-        conn, c = db.connection()
         try:
-            c.execute("SELECT * FROM medical_test_record WHERE patient_id = ?", (patient_id,))
-            tests = c.fetchall()
+            tests = repository.medical_tests.where('patient_id', patient_id)
             st.write(f'Medical tests for {patient_name}:')
             show_medical_test_details(tests)
         except Exception as e:
             st.error(f"Error retrieving tests: {e}")
-        finally:
-             conn.close()
 
 
 # --- Display Functions ---
@@ -255,8 +210,8 @@ def show_medical_test_details(list_of_medical_tests):
     medical_test_titles = [
         'Medical Test ID', 'Test name', 'Patient ID', 'Patient name',
         'Doctor ID', 'Doctor name', 'Medical Lab Scientist ID',
-        'Test date and time [DD-MM-YYYY (hh:mm)]',
-        'Result date and time [DD-MM-YYYY (hh:mm)]',
+        'Test date and time [YYYY-MM-DD hh:mm]',
+        'Result date and time [YYYY-MM-DD hh:mm]',
         'Result and diagnosis', 'Description', 'Comments', 'Cost (INR)'
     ]
     show_details(list_of_medical_tests, medical_test_titles)
\ No newline at end of file
@@ -0,0 +1,616 @@
+"""Versioned schema migrations.
+
+Each migration is a function registered with @migration(version, description). migrate() applies
+every migration newer than the version stored in schema_version, in order. A migration runs in its
+own write transaction, so readers on a WAL database keep working while it is applied. Migrations
+registered with online=True manage their own (batched) transactions instead; they must be safe to
+re-run if the process stops halfway, and the version is recorded only once they finish.
+"""
+from datetime import datetime
+
+MIGRATIONS = []
+
+def migration(version, description, online=False):
+    """Registers the decorated function(conn) as schema migration `version`."""
+    def register(fn):
+        MIGRATIONS.append((version, description, fn, online))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+def current_version(conn):
+    """Returns the latest applied schema version (0 for a new database)."""
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def _record(conn, version, description):
+    conn.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                 (version, description, datetime.now().isoformat(timespec='seconds')))
+
+def migrate(conn, target=None):
+    """Applies pending migrations up to `target` (default: latest) and returns the new version."""
+    conn.isolation_level = None  # Transactions are managed explicitly
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        );
+    """)
+    for version, description, fn, online in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if version <= current_version(conn):
+            continue
+        if online:
+            fn(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            if version > current_version(conn):
+                _record(conn, version, description)
+            conn.execute("COMMIT")
+            continue
+        conn.execute("BEGIN IMMEDIATE")  # Take the write lock before re-checking the version
+        try:
+            if version > current_version(conn):  # Another process may have applied it meanwhile
+                fn(conn)
+                _record(conn, version, description)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return current_version(conn)
+
+
+@migration(1, "Initial schema")
+def initial_schema(conn):
+    # Patient Record Table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS patient_record (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            age INTEGER NOT NULL,
+            gender TEXT NOT NULL,
+            date_of_birth TEXT NOT NULL,
+            blood_group TEXT NOT NULL,
+            contact_number_1 TEXT NOT NULL,
+            contact_number_2 TEXT,
+            aadhar_or_voter_id TEXT NOT NULL UNIQUE,
+            weight INTEGER NOT NULL,
+            height INTEGER NOT NULL,
+            address TEXT NOT NULL,
+            city TEXT NOT NULL,
+            state TEXT NOT NULL,
+            pin_code TEXT NOT NULL,
+            next_of_kin_name TEXT NOT NULL,
+            next_of_kin_relation_to_patient TEXT NOT NULL,
+            next_of_kin_contact_number TEXT NOT NULL,
+            email_id TEXT,
+            date_of_registration TEXT NOT NULL,
+            time_of_registration TEXT NOT NULL
+        );
+        """)
+
+    # Doctor Record Table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS doctor_record (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            age INTEGER NOT NULL,
+            gender TEXT NOT NULL,
+            date_of_birth TEXT NOT NULL,
+            blood_group TEXT NOT NULL,
+            department_id TEXT NOT NULL,
+            department_name TEXT NOT NULL,
+            contact_number_1 TEXT NOT NULL,
+            contact_number_2 TEXT,
+            aadhar_or_voter_id TEXT NOT NULL UNIQUE,
+            email_id TEXT NOT NULL UNIQUE,
+            qualification TEXT NOT NULL,
+            specialisation TEXT NOT NULL,
+            years_of_experience INTEGER NOT NULL,
+            address TEXT NOT NULL,
+            city TEXT NOT NULL,
+            state TEXT NOT NULL,
+            pin_code TEXT NOT NULL,
+            FOREIGN KEY (department_id) REFERENCES department_record(id)
+                ON UPDATE CASCADE
+                ON DELETE RESTRICT
+        );
+        """)
+
+    # Department Record Table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS department_record (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            description TEXT NOT NULL,
+            contact_number_1 TEXT NOT NULL,
+            contact_number_2 TEXT,
+            address TEXT NOT NULL,
+            email_id TEXT NOT NULL UNIQUE
+        );
+        """)
+
+    # Prescription Record Table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS prescription_record (
+            id TEXT PRIMARY KEY,
+            patient_id TEXT NOT NULL,
+            patient_name TEXT NOT NULL,
+            doctor_id TEXT NOT NULL,
+            doctor_name TEXT NOT NULL,
+            diagnosis TEXT NOT NULL,
+            comments TEXT,
+            medicine_1_name TEXT NOT NULL,
+            medicine_1_dosage_description TEXT NOT NULL,
+            medicine_2_name TEXT,
+            medicine_2_dosage_description TEXT,
+            medicine_3_name TEXT,
+            medicine_3_dosage_description TEXT,
+            FOREIGN KEY (patient_id) REFERENCES patient_record(id)
+                ON UPDATE CASCADE
+                ON DELETE RESTRICT,
+            FOREIGN KEY (doctor_id) REFERENCES doctor_record(id)
+                ON UPDATE CASCADE
+                ON DELETE RESTRICT
+        );
+        """)
+
+    # Medical Test Record Table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS medical_test_record (
+            id TEXT PRIMARY KEY,
+            test_name TEXT NOT NULL,
+            patient_id TEXT NOT NULL,
+            patient_name TEXT NOT NULL,
+            doctor_id TEXT NOT NULL,
+            doctor_name TEXT NOT NULL,
+            medical_lab_scientist_id TEXT NOT NULL,
+            test_date_time TEXT NOT NULL,
+            result_date_time TEXT NOT NULL,
+            result_and_diagnosis TEXT,
+            description TEXT,
+            comments TEXT,
+            cost INTEGER NOT NULL,
+            FOREIGN KEY (patient_id) REFERENCES patient_record(id)
+                ON UPDATE CASCADE
+                ON DELETE RESTRICT,
+            FOREIGN KEY (doctor_id) REFERENCES doctor_record(id)
+                ON UPDATE CASCADE
+                ON DELETE RESTRICT
+        );
+        """)
+
+
+@migration(2, "Indexes for patient/doctor/department lookups")
+def lookup_indexes(conn):
+    # aadhar_or_voter_id is already covered by the implicit index of its UNIQUE constraint
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_prescription_patient ON prescription_record (patient_id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_prescription_doctor ON prescription_record (doctor_id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medical_test_patient ON medical_test_record (patient_id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medical_test_doctor ON medical_test_record (doctor_id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medical_test_date ON medical_test_record (test_date_time);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_doctor_department ON doctor_record (department_id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patient_city ON patient_record (city);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_doctor_city ON doctor_record (city);")
+
+
+# Full-text search indexes (external content: the text lives only in the record tables) and the
+# triggers that keep them in sync.
+SEARCH_INDEXES = {
+    'patient_search': ('patient_record', ['name', 'contact_number_1', 'contact_number_2', 'city']),
+    'doctor_search': ('doctor_record', ['name', 'specialisation']),
+    'prescription_search': ('prescription_record', ['diagnosis']),
+    'medical_test_search': ('medical_test_record', ['test_name', 'result_and_diagnosis']),
+}
+
+def create_search_index(conn, index_name, table_name, columns):
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {index_name} USING fts5(
+            {column_list}, content='{table_name}', content_rowid='rowid', prefix='2 3'
+        );
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {index_name}_insert AFTER INSERT ON {table_name} BEGIN
+            INSERT INTO {index_name} (rowid, {column_list}) VALUES (new.rowid, {new_values});
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {index_name}_delete AFTER DELETE ON {table_name} BEGIN
+            INSERT INTO {index_name} ({index_name}, rowid, {column_list}) VALUES ('delete', old.rowid, {old_values});
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {index_name}_update AFTER UPDATE OF {column_list} ON {table_name} BEGIN
+            INSERT INTO {index_name} ({index_name}, rowid, {column_list}) VALUES ('delete', old.rowid, {old_values});
+            INSERT INTO {index_name} (rowid, {column_list}) VALUES (new.rowid, {new_values});
+        END;
+    """)
+    conn.execute(f"INSERT INTO {index_name} ({index_name}) VALUES ('rebuild');")  # Index existing rows
+
+@migration(3, "Full-text search indexes")
+def search_indexes(conn):
+    for index_name, (table_name, columns) in SEARCH_INDEXES.items():
+        create_search_index(conn, index_name, table_name, columns)
+
+
+@migration(4, "Prescription items table")
+def prescription_items(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS prescription_item (
+            prescription_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            medicine_name TEXT NOT NULL,
+            dosage_description TEXT,
+            PRIMARY KEY (prescription_id, position),
+            FOREIGN KEY (prescription_id) REFERENCES prescription_record(id)
+                ON UPDATE CASCADE
+                ON DELETE CASCADE
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_prescription_item_medicine ON prescription_item (medicine_name COLLATE NOCASE);")
+
+MIGRATION_BATCH_SIZE = 5000
+
+@migration(5, "Copy medicine_1..3 columns into prescription_item", online=True)
+def copy_prescription_medicines(conn):
+    # Batches of prescriptions in rowid order, each in its own short transaction so the app keeps
+    # writing in between. INSERT OR IGNORE makes a re-run after an interruption harmless.
+    last_rowid = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT MAX(rowid) FROM (SELECT rowid FROM prescription_record WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+                               (last_rowid, MIGRATION_BATCH_SIZE)).fetchone()
+            if row[0] is None:
+                conn.execute("COMMIT")
+                return
+            for position in (1, 2, 3):
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO prescription_item (prescription_id, position, medicine_name, dosage_description)
+                    SELECT id, {position}, medicine_{position}_name, medicine_{position}_dosage_description
+                    FROM prescription_record
+                    WHERE rowid > ? AND rowid <= ? AND COALESCE(medicine_{position}_name, '') <> ''
+                """, (last_rowid, row[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        last_rowid = row[0]
+
+@migration(6, "Drop medicine_1..3 columns from prescription_record")
+def drop_prescription_medicine_columns(conn):
+    for position in (1, 2, 3):  # Catch rows written by older app versions after migration 5
+        conn.execute(f"""
+            INSERT OR IGNORE INTO prescription_item (prescription_id, position, medicine_name, dosage_description)
+            SELECT id, {position}, medicine_{position}_name, medicine_{position}_dosage_description
+            FROM prescription_record WHERE COALESCE(medicine_{position}_name, '') <> ''
+        """)
+    for position in (1, 2, 3):
+        conn.execute(f"ALTER TABLE prescription_record DROP COLUMN medicine_{position}_name;")
+        conn.execute(f"ALTER TABLE prescription_record DROP COLUMN medicine_{position}_dosage_description;")
+
+
+def _convert_in_batches(conn, table_name, column, pattern, expression):
+    """Rewrites `column` with `expression` for rows matching the GLOB `pattern`, batch by batch.
+
+    Each batch is its own short transaction; rows already converted no longer match the pattern,
+    so an interrupted run simply continues.
+    """
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            changed = conn.execute(f"""
+                UPDATE {table_name} SET {column} = {expression}
+                WHERE rowid IN (SELECT rowid FROM {table_name} WHERE {column} GLOB ? LIMIT ?)
+            """, (pattern, MIGRATION_BATCH_SIZE)).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if changed == 0:
+            return
+
+@migration(7, "Store test, result and registration dates as ISO-8601", online=True)
+def iso_dates(conn):
+    # "DD-MM-YYYY (hh:mm)" -> "YYYY-MM-DD hh:mm" and "DD-MM-YYYY" -> "YYYY-MM-DD"
+    for column in ('test_date_time', 'result_date_time'):
+        _convert_in_batches(
+            conn, 'medical_test_record', column, '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9] (*)',
+            f"substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2) || ' ' || substr({column}, 13, 5)",
+        )
+    _convert_in_batches(
+        conn, 'patient_record', 'date_of_registration', '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]',
+        "substr(date_of_registration, 7, 4) || '-' || substr(date_of_registration, 4, 2) || '-' || substr(date_of_registration, 1, 2)",
+    )
+
+@migration(8, "Indexes for date range scans")
+def date_range_indexes(conn):
+    # The (x, test_date_time) indexes also serve plain lookups on x, so the single-column ones go
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medical_test_patient_date ON medical_test_record (patient_id, test_date_time);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medical_test_doctor_date ON medical_test_record (doctor_id, test_date_time);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medical_test_scientist_date ON medical_test_record (medical_lab_scientist_id, test_date_time);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medical_test_result_date ON medical_test_record (result_date_time);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patient_registration_date ON patient_record (date_of_registration);")
+    conn.execute("DROP INDEX IF EXISTS idx_medical_test_patient;")
+    conn.execute("DROP INDEX IF EXISTS idx_medical_test_doctor;")
+
+
+@migration(9, "Lab turnaround rollups")
+def lab_turnaround_rollups(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lab_turnaround_daily (
+            day TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            dimension_value TEXT NOT NULL,
+            tests INTEGER NOT NULL,
+            mean_minutes REAL NOT NULL,
+            p50_minutes REAL NOT NULL,
+            p95_minutes REAL NOT NULL,
+            p99_minutes REAL NOT NULL,
+            PRIMARY KEY (dimension, dimension_value, day)
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lab_turnaround_day ON lab_turnaround_daily (day);")
+    # Days whose tests changed since the last refresh (a log: refresh consumes entries up to an id)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lab_turnaround_dirty (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            day TEXT NOT NULL
+        );
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS lab_turnaround_insert AFTER INSERT ON medical_test_record BEGIN
+            INSERT INTO lab_turnaround_dirty (day) VALUES (date(new.test_date_time));
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS lab_turnaround_update AFTER UPDATE OF
+            test_name, doctor_id, medical_lab_scientist_id, test_date_time, result_date_time, result_and_diagnosis
+        ON medical_test_record BEGIN
+            INSERT INTO lab_turnaround_dirty (day) VALUES (date(old.test_date_time));
+            INSERT INTO lab_turnaround_dirty (day) SELECT date(new.test_date_time)
+                WHERE date(new.test_date_time) IS NOT date(old.test_date_time);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS lab_turnaround_delete AFTER DELETE ON medical_test_record BEGIN
+            INSERT INTO lab_turnaround_dirty (day) VALUES (date(old.test_date_time));
+        END;
+    """)
+    conn.execute("INSERT INTO lab_turnaround_dirty (day) SELECT DISTINCT date(test_date_time) FROM medical_test_record;")
+
+
+@migration(10, "Monthly revenue summary")
+def revenue_summary(conn):
+    # Revenue per (department, doctor, month), kept equal to the sum over medical_test_record by the
+    # triggers below. Tests count towards their doctor's current department.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS revenue_monthly (
+            department_id TEXT NOT NULL,
+            doctor_id TEXT NOT NULL,
+            month TEXT NOT NULL,
+            tests INTEGER NOT NULL,
+            revenue INTEGER NOT NULL,
+            PRIMARY KEY (department_id, doctor_id, month)
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_revenue_monthly_month ON revenue_monthly (month);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_revenue_monthly_doctor ON revenue_monthly (doctor_id);")
+    add_new = """
+        INSERT INTO revenue_monthly (department_id, doctor_id, month, tests, revenue)
+        VALUES ((SELECT department_id FROM doctor_record WHERE id = new.doctor_id),
+                new.doctor_id, substr(new.test_date_time, 1, 7), 1, new.cost)
+        ON CONFLICT (department_id, doctor_id, month)
+        DO UPDATE SET tests = tests + 1, revenue = revenue + excluded.revenue;
+    """
+    remove_old = """
+        UPDATE revenue_monthly SET tests = tests - 1, revenue = revenue - old.cost
+        WHERE doctor_id = old.doctor_id AND month = substr(old.test_date_time, 1, 7);
+        DELETE FROM revenue_monthly
+        WHERE doctor_id = old.doctor_id AND month = substr(old.test_date_time, 1, 7) AND tests = 0;
+    """
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS revenue_insert AFTER INSERT ON medical_test_record BEGIN {add_new} END;")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS revenue_delete AFTER DELETE ON medical_test_record BEGIN {remove_old} END;")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS revenue_update AFTER UPDATE OF doctor_id, test_date_time, cost
+        ON medical_test_record BEGIN {remove_old} {add_new} END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS revenue_doctor_department AFTER UPDATE OF department_id ON doctor_record
+        WHEN new.department_id IS NOT old.department_id BEGIN
+            UPDATE revenue_monthly SET department_id = new.department_id WHERE doctor_id = new.id;
+        END;
+    """)
+    conn.execute("DELETE FROM revenue_monthly;")
+    conn.execute("""
+        INSERT INTO revenue_monthly (department_id, doctor_id, month, tests, revenue)
+        SELECT d.department_id, t.doctor_id, substr(t.test_date_time, 1, 7), COUNT(*), SUM(t.cost)
+        FROM medical_test_record t JOIN doctor_record d ON d.id = t.doctor_id
+        GROUP BY d.department_id, t.doctor_id, substr(t.test_date_time, 1, 7);
+    """)
+
+
+@migration(11, "Replace copied patient/doctor/department names with joined views")
+def name_views(conn):
+    for table_name, column in (('prescription_record', 'patient_name'), ('prescription_record', 'doctor_name'),
+                               ('medical_test_record', 'patient_name'), ('medical_test_record', 'doctor_name'),
+                               ('doctor_record', 'department_name')):
+        conn.execute(f"ALTER TABLE {table_name} DROP COLUMN {column};")
+    # Same column layout the tables had, so the display functions keep working unchanged
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS doctor_view AS
+        SELECT d.id, d.name, d.age, d.gender, d.date_of_birth, d.blood_group,
+               d.department_id, dp.name AS department_name, d.contact_number_1, d.contact_number_2,
+               d.aadhar_or_voter_id, d.email_id, d.qualification, d.specialisation,
+               d.years_of_experience, d.address, d.city, d.state, d.pin_code
+        FROM doctor_record d
+        JOIN department_record dp ON dp.id = d.department_id;
+    """)
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS prescription_view AS
+        SELECT p.id, p.patient_id, pt.name AS patient_name, p.doctor_id, d.name AS doctor_name,
+               p.diagnosis, p.comments
+        FROM prescription_record p
+        JOIN patient_record pt ON pt.id = p.patient_id
+        JOIN doctor_record d ON d.id = p.doctor_id;
+    """)
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS medical_test_view AS
+        SELECT t.id, t.test_name, t.patient_id, pt.name AS patient_name, t.doctor_id, d.name AS doctor_name,
+               t.medical_lab_scientist_id, t.test_date_time, t.result_date_time,
+               t.result_and_diagnosis, t.description, t.comments, t.cost
+        FROM medical_test_record t
+        JOIN patient_record pt ON pt.id = t.patient_id
+        JOIN doctor_record d ON d.id = t.doctor_id;
+    """)
+
+
+@migration(12, "Doctor worklists: pending results table and doctor/ID indexes")
+def doctor_worklists(conn):
+    # Tests still awaiting a result, per doctor in test order. The triggers below keep it equal to the
+    # awaited rows of medical_test_record, so a worklist reads only its doctor's pending tests.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pending_result (
+            doctor_id TEXT NOT NULL,
+            test_date_time TEXT NOT NULL,
+            test_id TEXT NOT NULL,
+            PRIMARY KEY (doctor_id, test_date_time, test_id)
+        ) WITHOUT ROWID;
+    """)
+    awaited = "'Test result awaited'"
+    add_new = f"""
+        INSERT OR IGNORE INTO pending_result (doctor_id, test_date_time, test_id)
+        SELECT new.doctor_id, new.test_date_time, new.id WHERE new.result_and_diagnosis = {awaited};
+    """
+    remove_old = """
+        DELETE FROM pending_result
+        WHERE doctor_id = old.doctor_id AND test_date_time = old.test_date_time AND test_id = old.id;
+    """
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS pending_result_insert AFTER INSERT ON medical_test_record BEGIN {add_new} END;")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS pending_result_delete AFTER DELETE ON medical_test_record
+        WHEN old.result_and_diagnosis = {awaited} BEGIN {remove_old} END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS pending_result_update AFTER UPDATE OF id, doctor_id, test_date_time, result_and_diagnosis
+        ON medical_test_record
+        WHEN new.id IS NOT old.id OR new.doctor_id IS NOT old.doctor_id OR new.test_date_time IS NOT old.test_date_time
+            OR (new.result_and_diagnosis = {awaited}) IS NOT (old.result_and_diagnosis = {awaited})
+        BEGIN {remove_old} {add_new} END;
+    """)
+    conn.execute("DELETE FROM pending_result;")
+    conn.execute(f"""
+        INSERT INTO pending_result (doctor_id, test_date_time, test_id)
+        SELECT doctor_id, test_date_time, id FROM medical_test_record WHERE result_and_diagnosis = {awaited};
+    """)
+    # IDs are time-ordered, so (doctor_id, id) gives a doctor's prescriptions since a point in time
+    # as one range scan; it also serves the plain doctor_id lookups of idx_prescription_doctor.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_prescription_doctor_id ON prescription_record (doctor_id, id);")
+    conn.execute("DROP INDEX IF EXISTS idx_prescription_doctor;")
+
+
+# Search index maintenance, current version (migration 13). Each index has a key table giving every
+# record a stable INTEGER PRIMARY KEY: VACUUM may renumber the implicit rowids of the record tables
+# (their primary keys are TEXT), which would leave an index keyed on them pointing at other rows.
+def create_search_triggers(conn, index_name, table_name, columns):
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+    new_key = f"(SELECT key FROM {index_name}_key WHERE id = new.id)"
+    old_key = f"(SELECT key FROM {index_name}_key WHERE id = old.id)"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {index_name}_insert AFTER INSERT ON {table_name} BEGIN
+            INSERT INTO {index_name}_key (id) VALUES (new.id);
+            INSERT INTO {index_name} (rowid, {column_list}) VALUES ({new_key}, {new_values});
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {index_name}_delete AFTER DELETE ON {table_name} BEGIN
+            INSERT INTO {index_name} ({index_name}, rowid, {column_list}) VALUES ('delete', {old_key}, {old_values});
+            DELETE FROM {index_name}_key WHERE id = old.id;
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {index_name}_update AFTER UPDATE OF id, {column_list} ON {table_name} BEGIN
+            INSERT INTO {index_name} ({index_name}, rowid, {column_list}) VALUES ('delete', {old_key}, {old_values});
+            UPDATE {index_name}_key SET id = new.id WHERE id = old.id AND new.id IS NOT old.id;
+            INSERT INTO {index_name} (rowid, {column_list}) VALUES ({new_key}, {new_values});
+        END;
+    """)
+
+def _drop_search_triggers(conn, index_name):
+    for suffix in ('insert', 'delete', 'update'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {index_name}_{suffix};")
+
+def suspend_search_index(conn, table_name):
+    """Drops the search triggers of table_name before a bulk insert; returns the table's last rowid.
+
+    Only inserts may run until resume_search_index(conn, table_name, last_rowid), which must follow
+    in the same transaction: it indexes the new rows with one INSERT ... SELECT per index, several
+    times faster than a trigger per row. (Within one transaction, new rows get rowids above the last.)
+    """
+    for index_name, (indexed_table, columns) in SEARCH_INDEXES.items():
+        if indexed_table == table_name:
+            _drop_search_triggers(conn, index_name)
+    return conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table_name}").fetchone()[0]
+
+def resume_search_index(conn, table_name, last_rowid):
+    """Indexes the rows inserted since suspend_search_index and recreates the search triggers."""
+    for index_name, (indexed_table, columns) in SEARCH_INDEXES.items():
+        if indexed_table != table_name:
+            continue
+        conn.execute(f"INSERT INTO {index_name}_key (id) SELECT id FROM {table_name} WHERE rowid > ? ORDER BY rowid;",
+                     (last_rowid,))
+        conn.execute(f"""
+            INSERT INTO {index_name} (rowid, {', '.join(columns)})
+            SELECT k.key, {', '.join(f't.{c}' for c in columns)}
+            FROM {table_name} t JOIN {index_name}_key k ON k.id = t.id
+            WHERE t.rowid > ?;
+        """, (last_rowid,))
+        create_search_triggers(conn, index_name, table_name, columns)
+
+@migration(13, "Key the search indexes on stable integer keys instead of record rowids")
+def stable_search_keys(conn):
+    for index_name, (table_name, columns) in SEARCH_INDEXES.items():
+        _drop_search_triggers(conn, index_name)
+        conn.execute(f"DROP TABLE IF EXISTS {index_name};")
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {index_name}_key (
+                key INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE
+            );
+        """)
+        conn.execute(f"INSERT INTO {index_name}_key (id) SELECT id FROM {table_name} ORDER BY rowid;")
+        # External content read through the key table, so 'rebuild' and bm25 find the text by key
+        conn.execute(f"""
+            CREATE VIEW IF NOT EXISTS {index_name}_source AS
+            SELECT k.key, {', '.join(f't.{c}' for c in columns)}
+            FROM {index_name}_key k JOIN {table_name} t ON t.id = k.id;
+        """)
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {index_name} USING fts5(
+                {', '.join(columns)}, content='{index_name}_source', content_rowid='key', prefix='2 3'
+            );
+        """)
+        create_search_triggers(conn, index_name, table_name, columns)
+        conn.execute(f"INSERT INTO {index_name} ({index_name}) VALUES ('rebuild');")
+
+
+@migration(14, "Bulk import checkpoints")
+def bulk_import_checkpoints(conn):
+    # Source rows done per (file, table), written in the same transaction as the rows themselves
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bulk_import_checkpoint (
+            source TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            rows_done INTEGER NOT NULL,
+            inserted INTEGER NOT NULL,
+            rejected INTEGER NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (source, table_name)
+        );
+    """)
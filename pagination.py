@@ -0,0 +1,117 @@
+"""Keyset pagination for the "Show complete ... record" screens.
+
+Pages are fetched with `WHERE id > ? ORDER BY id LIMIT ?` (a seek on the primary key), so each page
+costs the same regardless of how deep into the table it is. Only the visible page is turned into a
+DataFrame. The row count is cached and the next page is prefetched in the background while the
+current one is being read.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+import database as db
+import query_cache
+import config
+
+PAGE_SIZES = [25, 50, 100, 250, 500]
+DEFAULT_PAGE_SIZE = getattr(config, 'page_size', 50)
+COUNT_CACHE_TTL = getattr(config, 'count_cache_ttl', 30)  # seconds
+
+_count_cache = {}
+_count_lock = threading.Lock()
+_prefetcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='page-prefetch')
+
+def fetch_page(table_name, after_id=None, page_size=DEFAULT_PAGE_SIZE, cache=None, reader=None):
+    """Returns up to page_size rows following after_id, through cache (the session's query cache by default).
+
+    reader is the pool key of the session the page is read for, when fetching it on another thread.
+    """
+    cache = cache or query_cache.current_cache()
+    if after_id is None:
+        return cache.fetchall(f"SELECT * FROM {table_name} ORDER BY id LIMIT ?", (page_size,), reader)
+    return cache.fetchall(f"SELECT * FROM {table_name} WHERE id > ? ORDER BY id LIMIT ?", (after_id, page_size),
+                          reader)
+
+def has_rows_after(table_name, last_id):
+    """Tells if the table has a row with an ID greater than last_id."""
+    return bool(query_cache.fetchall(f"SELECT 1 FROM {table_name} WHERE id > ? ORDER BY id LIMIT 1", (last_id,)))
+
+def count_rows(table_name):
+    """Returns the number of rows in a table, cached for COUNT_CACHE_TTL seconds."""
+    now = time.monotonic()
+    with _count_lock:
+        cached = _count_cache.get(table_name)
+        if cached and now - cached[1] < COUNT_CACHE_TTL:
+            return cached[0]
+    conn, c = db.read_connection()
+    try:
+        c.execute(f"SELECT COUNT(*) FROM {table_name}")
+        count = c.fetchone()[0]
+    finally:
+        conn.close()
+    with _count_lock:
+        _count_cache[table_name] = (count, now)
+    return count
+
+def invalidate_count(table_name):
+    """Drops the cached row count of a table (call after inserts/deletes)."""
+    with _count_lock:
+        _count_cache.pop(table_name, None)
+
+def _previous_page(state):
+    state['starts'].pop()
+
+def _next_page(state):
+    state['starts'].append(state['last_id'])
+
+def show_paginated(table_name, show_records, key):
+    """Renders one page of a table with Previous/Next controls.
+
+    show_records is the module's display function (e.g. show_patient_details); it is only ever
+    given the rows of the visible page.
+    """
+    page_size = st.selectbox("Rows per page", PAGE_SIZES,
+                             index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE) if DEFAULT_PAGE_SIZE in PAGE_SIZES else 1,
+                             key=f"{key}_page_size")
+    state = st.session_state.setdefault(f"{key}_pagination", {'starts': [None], 'last_id': None,
+                                                             'has_more': False, 'page_size': page_size})
+    if state['page_size'] != page_size:  # Page size changed: start again from the first page
+        state.update(starts=[None], last_id=None, has_more=False, page_size=page_size)
+
+    after_id = state['starts'][-1]
+    rows = None
+    prefetched = st.session_state.get(f"{key}_prefetch")
+    if prefetched and prefetched[:2] == (after_id, page_size):
+        try:
+            rows = prefetched[2].result()
+        except Exception:
+            rows = None  # Fall back to a synchronous fetch below
+    if rows is None:
+        try:
+            rows = fetch_page(table_name, after_id, page_size)
+        except Exception as e:
+            st.error(f"Error retrieving records: {e}")
+            return
+
+    state['last_id'] = rows[-1][0] if rows else after_id
+    state['has_more'] = len(rows) == page_size and has_rows_after(table_name, state['last_id'])
+
+    total = count_rows(table_name)
+    page_number = len(state['starts'])
+    page_count = max(1, -(-total // page_size))
+    prev_col, info_col, next_col = st.columns([1, 3, 1])
+    # Button callbacks run before the next rerun, so the page they select is the one fetched then
+    prev_col.button("Previous", key=f"{key}_prev", disabled=page_number == 1,
+                    on_click=_previous_page, args=(state,))
+    next_col.button("Next", key=f"{key}_next", disabled=not state['has_more'],
+                    on_click=_next_page, args=(state,))
+    info_col.write(f"Page {page_number} of {page_count} ({total} records)")
+
+    next_page = (state['last_id'], page_size)
+    if state['has_more'] and (not prefetched or prefetched[:2] != next_page):
+        # Warm up the next page (in this session's query cache, reading as this session so that
+        # read-your-writes still applies) while the user reads this one
+        st.session_state[f"{key}_prefetch"] = (state['last_id'], page_size,
+                                               _prefetcher.submit(fetch_page, table_name, state['last_id'], page_size,
+                                                                  query_cache.current_cache(), db.pool.current_key()))
+    show_records(rows)
@@ -1,16 +1,19 @@
 import streamlit as st
-from datetime import datetime, date
-import database as db
-import pandas as pd
+from datetime import datetime
+import pagination
+import id_generator
+import lookup_cache
+import repository
+import query_cache
 
 # --- Utility Functions ---
 def verify_id_exists(table_name, id_value):
     """Verifies if an ID exists in a given table."""
-    conn, c = db.connection()
-    c.execute(f"SELECT id FROM {table_name} WHERE id = ?", (id_value,))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
+    return lookup_cache.id_exists(table_name, id_value)
+
+def verify_patient_id(patient_id):
+    """Checks if a patient ID exists in the patient_record table."""
+    return verify_id_exists("patient_record", patient_id)
 
 def show_details(list_of_records, titles):
     """Displays details in a Streamlit DataFrame."""
@@ -18,21 +21,12 @@ def show_details(list_of_records, titles):
         st.warning('No data to show')
         return
 
-    data = [list(record) for record in list_of_records]
-    df = pd.DataFrame(data, columns=titles)
+    df = query_cache.frame(list_of_records, titles)
     st.write(df)
 
-def generate_id(date_str, time_str, prefix='P'):
-    """Generates a unique ID."""
-    id_1 = ''.join(time_str.split(':')[::-1])
-    id_2 = ''.join(date_str.split('-')[::-1])[2:]
-    return f'{prefix}-{id_1}-{id_2}'
-
 def calculate_age(dob):
     """Calculates age from a date of birth."""
-    today = date.today()
-    age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-    return age
+    return repository.calculate_age(dob)
 
 
 # --- Patient Class ---
@@ -70,9 +64,9 @@ class Patient:
             self.id = patient_id
         else:
             st.write("Enter patient details:")
-            self.date_of_registration = datetime.now().strftime('%d-%m-%Y')
+            self.date_of_registration = datetime.now().strftime('%Y-%m-%d')
             self.time_of_registration = datetime.now().strftime('%H:%M:%S')
-            self.id = generate_id(self.date_of_registration, self.time_of_registration)
+            self.id = id_generator.generate_id("P")
             st.write(f"New Patient ID: {self.id}")
 
         self.name = st.text_input("Full name")
@@ -99,6 +93,10 @@ class Patient:
 
         return st.button("Save")
 
+    def record(self, columns):
+        """Returns the form values of the given columns as a dict for the repository."""
+        return {column: getattr(self, column) for column in columns}
+
     def add_patient(self):
         """Adds a new patient record to the database."""
         if self.patient_form():
@@ -106,36 +104,13 @@ class Patient:
                 st.error("Please fill in all the required fields.")
                 return
 
-            conn, c = db.connection()
             try:
-                c.execute(
-                    """
-                    INSERT INTO patient_record (
-                        id, name, age, gender, date_of_birth, blood_group,
-                        contact_number_1, contact_number_2, aadhar_or_voter_id,
-                        weight, height, address, city, state, pin_code,
-                        next_of_kin_name, next_of_kin_relation_to_patient,
-                        next_of_kin_contact_number, email_id,
-                        date_of_registration, time_of_registration
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        self.id, self.name, self.age, self.gender, self.date_of_birth,
-                        self.blood_group, self.contact_number_1, self.contact_number_2,
-                        self.aadhar_or_voter_id, self.weight, self.height, self.address,
-                        self.city, self.state, self.pin_code, self.next_of_kin_name,
-                        self.next_of_kin_relation_to_patient, self.next_of_kin_contact_number,
-                        self.email_id, self.date_of_registration, self.time_of_registration
-                    )
-                )
-                conn.commit()
+                repository.patients.create(self.record(repository.patients.columns))
                 st.success("Patient details saved successfully.")
                 st.write(f"Your Patient ID is: {self.id}")
 
             except Exception as e:
                  st.error(f"Error saving patient: {e}")
-            finally:
-                conn.close()
 
     def update_patient(self):
         """Updates an existing patient record."""
@@ -150,40 +125,12 @@ class Patient:
         st.success("Patient ID Verified")
 
         if self.patient_form(patient_id):
-            conn, c = db.connection()
             try:
-                #Recalculate age.
-                c.execute("SELECT date_of_birth FROM patient_record WHERE id = ?", (patient_id,))
-                dob_str = c.fetchone()[0]
-
-                dob = datetime.strptime(dob_str, "%d-%m-%Y").date()
-                self.age = calculate_age(dob)
-
-                c.execute(
-                    """
-                    UPDATE patient_record
-                    SET age = ?, contact_number_1 = ?, contact_number_2 = ?,
-                        weight = ?, height = ?, address = ?, city = ?,
-                        state = ?, pin_code = ?, next_of_kin_name = ?,
-                        next_of_kin_relation_to_patient = ?,
-                        next_of_kin_contact_number = ?, email_id = ?
-                    WHERE id = ?
-                    """,
-                    (
-                        self.age, self.contact_number_1, self.contact_number_2,
-                        self.weight, self.height, self.address, self.city,
-                        self.state, self.pin_code, self.next_of_kin_name,
-                        self.next_of_kin_relation_to_patient,
-                        self.next_of_kin_contact_number, self.email_id,
-                        patient_id
-                    )
-                )
-                conn.commit()
+                # Age is recalculated from the stored date of birth by the repository
+                repository.patients.update(patient_id, self.record(repository.patients.updatable))
                 st.success("Patient details updated successfully.")
             except Exception as e:
                 st.error(f"Error updating patient: {e}")
-            finally:
-                conn.close()
 
     def delete_patient(self):
         """Deletes an existing patient record."""
@@ -197,61 +144,50 @@ class Patient:
 
         st.success("Patient ID Verified")
 
-        conn, c = db.connection()
         try:
             # Show the current details before deletion
-            c.execute("SELECT * FROM patient_record WHERE id = ?", (patient_id,))
-            details = c.fetchall()
-            show_patient_details(details)
+            show_patient_details([repository.patients.get(patient_id)])
 
             confirm_delete = st.checkbox("Confirm Deletion")
             if confirm_delete:
                 delete = st.button("Delete")
                 if delete:
-                    c.execute("DELETE FROM patient_record WHERE id = ?", (patient_id,))
-                    conn.commit()
+                    repository.patients.delete(patient_id)
                     st.success("Patient details deleted successfully.")
         except Exception as e:
             st.error(f"Error deleting patient: {e}")
-        finally:
-            conn.close()
 
     def show_all_patients(self):
-        """Shows all patient records."""
-        conn, c = db.connection()
-        try:
-            c.execute("SELECT * FROM patient_record")
-            patients = c.fetchall()
-            show_patient_details(patients)
-        except Exception as e:
-            st.error(f"Error retrieving patients: {e}")
-        finally:
-            conn.close()
+        """Shows all patient records, one page at a time."""
+        pagination.show_paginated("patient_record", show_patient_details, key="patients")
 
     def search_patient(self):
-        """Searches for a patient by ID."""
-        patient_id = st.text_input("Enter Patient ID to search")
+        """Searches for a patient by ID, or by name, contact number or city."""
+        patient_id = st.text_input("Enter Patient ID, name, contact number or city to search")
         if not patient_id:
             return
 
         if not verify_id_exists("patient_record", patient_id):
-            st.error("Invalid Patient ID")
+            try:
+                patients = repository.patients.search(patient_id)
+            except Exception as e:
+                st.error(f"Error searching patients: {e}")
+                return
+            if patients:
+                st.write(f"Patients matching '{patient_id}':")
+                show_patient_details(patients)
+            else:
+                st.error("No patient found with this ID, name, contact number or city")
             return
 
         st.success("Patient ID Verified")
 
-        conn, c = db.connection()
         try:
-            c.execute("SELECT * FROM patient_record WHERE id = ?", (patient_id,))
-            patient = c.fetchone()
-            if patient:
-                show_patient_details([patient])
-            else:
-                st.error("Patient not found.")
+            show_patient_details([repository.patients.get(patient_id)])
+        except repository.RecordNotFound:
+            st.error("Patient not found.")
         except Exception as e:
             st.error(f"Error retrieving patient: {e}")
-        finally:
-            conn.close()
 
 
 # --- Display Functions ---
@@ -264,6 +200,6 @@ def show_patient_details(list_of_patients):
         "City", "State", "PIN code", "Next of kin's name",
         "Next of kin's relation to patient",
         "Next of kin's contact number", "Email ID",
-        "Date of registration (DD-MM-YYYY)", "Time of registration (hh:mm:ss)"
+        "Date of registration (YYYY-MM-DD)", "Time of registration (hh:mm:ss)"
     ]
     show_details(list_of_patients, patient_titles)
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""Patient chart: a patient's details, prescriptions and medical tests on one screen.
+
+The chart is loaded with one pooled connection and three index-backed queries (the patient by
+primary key, prescriptions through idx_prescription_patient, tests through the (patient_id,
+test_date_time) index). Assembled charts are cached per patient. Every write path that can change
+a chart calls invalidate(); the TTL bounds how stale a chart can get after a change made by another
+process.
+
+    python patient_chart.py P-01M56NRHEW-QG000 --repeat 200
+"""
+import argparse
+import time
+import streamlit as st
+import database as db
+import lookup_cache
+import config
+
+CHART_CACHE_SIZE = getattr(config, 'chart_cache_size', 256)
+CHART_CACHE_TTL = getattr(config, 'chart_cache_ttl', 120)  # seconds
+
+cache = lookup_cache.LookupCache(maxsize=CHART_CACHE_SIZE, ttl=CHART_CACHE_TTL, name='chart')
+
+def load_chart(patient_id):
+    """Reads a chart from the database: {'patient': row, 'prescriptions': rows, 'medical_tests': rows}.
+
+    Returns None if there is no such patient.
+    """
+    # Imported here because the repository imports patient_chart to invalidate it on writes
+    from repository import PRESCRIPTION_SELECT
+    conn, c = db.connection()
+    try:
+        c.execute("SELECT * FROM patient_record WHERE id = ?", (patient_id,))
+        patient = c.fetchone()
+        if patient is None:
+            return None
+        c.execute(PRESCRIPTION_SELECT + " WHERE p.patient_id = ? ORDER BY p.id", (patient_id,))
+        prescriptions = c.fetchall()
+        c.execute("SELECT * FROM medical_test_view WHERE patient_id = ? ORDER BY test_date_time DESC", (patient_id,))
+        medical_tests = c.fetchall()
+    finally:
+        conn.close()
+    return {'patient': patient, 'prescriptions': prescriptions, 'medical_tests': medical_tests}
+
+def get_chart(patient_id):
+    """Cached load_chart()."""
+    return cache.get_or_load(('chart', 'patient_record', patient_id), lambda: load_chart(patient_id))
+
+def invalidate(patient_id=None, record_id=None):
+    """Drops the charts that a write may have changed.
+
+    Pass the patient_id of an inserted/updated row, and/or the record_id of an updated or deleted
+    prescription or medical test (any chart containing it is dropped). With neither, every chart is
+    dropped.
+    """
+    if patient_id is None and record_id is None:
+        cache.clear()
+        return
+    if patient_id is not None:
+        cache.invalidate('patient_record', patient_id)
+    if record_id is not None:
+        cache.invalidate_matching(lambda key, chart: chart is not None and any(
+            row[0] == record_id for row in chart['prescriptions'] + chart['medical_tests']))
+
+def chart_page():
+    """Streamlit page showing the chart of one patient."""
+    from patient import verify_patient_id, show_patient_details
+    from prescription import show_prescription_details
+    from medical_test import show_medical_test_details
+
+    st.subheader("Patient Chart")
+    patient_id = st.text_input("Enter Patient ID")
+    if not patient_id:
+        return
+    if not verify_patient_id(patient_id):
+        st.error("Invalid Patient ID")
+        return
+
+    try:
+        chart = get_chart(patient_id)
+    except Exception as e:
+        st.error(f"Error loading patient chart: {e}")
+        return
+    if chart is None:
+        st.error("Patient not found.")
+        return
+
+    if st.button("Refresh"):
+        invalidate(patient_id)
+        chart = get_chart(patient_id)
+
+    st.write(f"**{chart['patient'][1]}** ({patient_id})")
+    show_patient_details([chart['patient']])
+    st.write(f"Prescriptions ({len(chart['prescriptions'])}):")
+    show_prescription_details(chart['prescriptions'])
+    st.write(f"Medical tests ({len(chart['medical_tests'])}, latest first):")
+    show_medical_test_details(chart['medical_tests'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Time loading a patient chart from the database.")
+    parser.add_argument('patient_id')
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        chart = load_chart(args.patient_id)
+        timings.append((time.perf_counter() - start) * 1000)
+    if chart is None:
+        parser.error(f"No patient with ID {args.patient_id}")
+    timings.sort()
+    print(f"{len(chart['prescriptions'])} prescriptions, {len(chart['medical_tests'])} tests: "
+          f"p50 {timings[len(timings) // 2]:.1f} ms, p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms (uncached)")
+
+if __name__ == '__main__':
+    main()
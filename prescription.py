@@ -1,18 +1,15 @@
 import streamlit as st
-from datetime import datetime
-import database as db
-import pandas as pd
 import patient
-import doctor
+import id_generator
+import lookup_cache
+import repository
+import query_cache
+import async_db
 
 # --- Utility Functions ---
 def verify_id_exists(table_name, id_value):
     """Verifies if an ID exists in a given table."""
-    conn, c = db.connection()
-    c.execute(f"SELECT id FROM {table_name} WHERE id = ?", (id_value,))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
+    return lookup_cache.id_exists(table_name, id_value)
 
 def show_details(list_of_records, titles):
     """Displays details in a Streamlit DataFrame."""
@@ -20,24 +17,16 @@ def show_details(list_of_records, titles):
         st.warning('No data to show')
         return
 
-    data = [list(record) for record in list_of_records]
-    df = pd.DataFrame(data, columns=titles)
+    df = query_cache.frame(list_of_records, titles)
     st.write(df)
 
-def generate_id(prefix='M'):
-    """Generates a unique ID."""
-    now = datetime.now()
-    id_1 = now.strftime('%S%M%H')
-    id_2 = now.strftime('%Y%m%d')[2:]
-    return f'{prefix}-{id_1}-{id_2}'
-
 def fetch_name(table_name, id_value):
     """Fetches a name from a given table by ID."""
-    conn, c = db.connection()
-    c.execute(f"SELECT name FROM {table_name} WHERE id = ?", (id_value,))
-    result = c.fetchone()
-    conn.close()
-    return result[0] if result else None
+    return lookup_cache.fetch_name(table_name, id_value)
+
+def prescriptions_by_medicine(medicine_name):
+    """Returns all prescriptions (in repository.PRESCRIPTION_SELECT layout) that include a medicine (case-insensitive)."""
+    return repository.prescriptions.by_medicine(medicine_name)
 
 # --- Prescription Class ---
 class Prescription:
@@ -50,12 +39,7 @@ class Prescription:
         self.doctor_name = str()
         self.diagnosis = str()
         self.comments = str()
-        self.medicine_1_name = str()
-        self.medicine_1_dosage_description = str()
-        self.medicine_2_name = str()
-        self.medicine_2_dosage_description = str()
-        self.medicine_3_name = str()
-        self.medicine_3_dosage_description = str()
+        self.medicines = list()  # (name, dosage and description) pairs
 
     def prescription_form(self, prescription_id=None):
         """Unified form for adding/updating prescriptions."""
@@ -66,78 +50,67 @@ class Prescription:
             self.id = prescription_id
         else:
             st.write("Enter prescription details:")
-            self.id = generate_id()
+            self.id = id_generator.generate_id("M")
             st.write(f"New Prescription ID: {self.id}")
 
         patient_id = st.text_input("Patient ID")
-        if patient_id:
-            if not patient.verify_patient_id(patient_id):
-                st.error("Invalid Patient ID")
-            else:
-                st.success("Patient ID Verified")
-                self.patient_id = patient_id
-                self.patient_name = fetch_name("patient_record", patient_id)
-                st.write(f"Patient Name: {self.patient_name}")
-        else:
-            st.error("Patient ID is required.")
-            return False
-
+        patient_status = st.container()
         doctor_id = st.text_input("Doctor ID")
-        if doctor_id:
-            if not doctor.verify_doctor_id(doctor_id):
-                st.error("Invalid Doctor ID")
-            else:
-                st.success("Doctor ID Verified")
-                self.doctor_id = doctor_id
-                self.doctor_name = fetch_name("doctor_record", doctor_id)
-                st.write(f"Doctor Name: {self.doctor_name}")
+        doctor_status = st.container()
+
+        # Look both IDs up concurrently; an unknown ID has no name
+        self.patient_name, self.doctor_name = async_db.run_sync(async_db.fetch_names(
+            ("patient_record", patient_id), ("doctor_record", doctor_id)))
+
+        if not patient_id:
+            patient_status.error("Patient ID is required.")
+            return False
+        if not self.patient_name:
+            patient_status.error("Invalid Patient ID")
         else:
-            st.error("Doctor ID is required.")
+            patient_status.success("Patient ID Verified")
+            self.patient_id = patient_id
+            patient_status.write(f"Patient Name: {self.patient_name}")
+
+        if not doctor_id:
+            doctor_status.error("Doctor ID is required.")
             return False
+        if not self.doctor_name:
+            doctor_status.error("Invalid Doctor ID")
+        else:
+            doctor_status.success("Doctor ID Verified")
+            self.doctor_id = doctor_id
+            doctor_status.write(f"Doctor Name: {self.doctor_name}")
 
         self.diagnosis = st.text_area("Diagnosis")
         self.comments = st.text_area("Comments (if any)", value="")
-        self.medicine_1_name = st.text_input("Medicine 1 name")
-        self.medicine_1_dosage_description = st.text_area("Medicine 1 dosage and description")
-        self.medicine_2_name = st.text_input("Medicine 2 name (if any)", value="")
-        self.medicine_2_dosage_description = st.text_area("Medicine 2 dosage and description", value="")
-        self.medicine_3_name = st.text_input("Medicine 3 name (if any)", value="")
-        self.medicine_3_dosage_description = st.text_area("Medicine 3 dosage and description", value="")
+        medicine_count = st.number_input("Number of medicines", value=1, min_value=1, max_value=30)
+        self.medicines = []
+        for i in range(1, medicine_count + 1):
+            name = st.text_input(f"Medicine {i} name")
+            dosage = st.text_area(f"Medicine {i} dosage and description")
+            if name:
+                self.medicines.append((name, dosage))
 
         return st.button("Save")
 
     def add_prescription(self):
         """Adds a new prescription record to the database."""
         if self.prescription_form():
-            if not all([self.patient_id, self.doctor_id]):
+            if not all([self.patient_id, self.doctor_id, self.medicines]):
                 st.error("Please fill in all required fields.")
                 return
 
-            conn, c = db.connection()
             try:
-                c.execute(
-                    """
-                    INSERT INTO prescription_record (
-                        id, patient_id, patient_name, doctor_id, doctor_name,
-                        diagnosis, comments, medicine_1_name, medicine_1_dosage_description,
-                        medicine_2_name, medicine_2_dosage_description, medicine_3_name,
-                        medicine_3_dosage_description
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        self.id, self.patient_id, self.patient_name, self.doctor_id,
-                        self.doctor_name, self.diagnosis, self.comments,
-                        self.medicine_1_name, self.medicine_1_dosage_description,
-                        self.medicine_2_name, self.medicine_2_dosage_description,
-                        self.medicine_3_name, self.medicine_3_dosage_description,
-                    ),
-                )
-                conn.commit()
+                repository.prescriptions.create(self.record())
                 st.success("Prescription details saved successfully.")
             except Exception as e:
                 st.error(f"Error saving prescription: {e}")
-            finally:
-                conn.close()
+
+    def record(self):
+        """Returns the form values as a dict for the repository."""
+        return {'id': self.id, 'patient_id': self.patient_id, 'doctor_id': self.doctor_id,
+                'diagnosis': self.diagnosis, 'comments': self.comments, 'medicines': self.medicines}
 
     def update_prescription(self):
         """Updates an existing prescription record."""
@@ -152,30 +125,17 @@ class Prescription:
         st.success("Prescription ID Verified")
 
         if self.prescription_form(prescription_id):
-            conn, c = db.connection()
+            if not self.medicines:
+                st.error("Please enter at least one medicine.")
+                return
+
             try:
-                c.execute(
-                    """
-                    UPDATE prescription_record
-                    SET diagnosis = ?, comments = ?, medicine_1_name = ?,
-                        medicine_1_dosage_description = ?, medicine_2_name = ?,
-                        medicine_2_dosage_description = ?, medicine_3_name = ?,
-                        medicine_3_dosage_description = ?
-                    WHERE id = ?
-                    """,
-                    (
-                        self.diagnosis, self.comments, self.medicine_1_name,
-                        self.medicine_1_dosage_description, self.medicine_2_name,
-                        self.medicine_2_dosage_description, self.medicine_3_name,
-                        self.medicine_3_dosage_description, prescription_id,
-                    ),
-                )
-                conn.commit()
+                repository.prescriptions.update(prescription_id, {
+                    'diagnosis': self.diagnosis, 'comments': self.comments, 'medicines': self.medicines,
+                })
                 st.success("Prescription details updated successfully.")
             except Exception as e:
                 st.error(f"Error updating prescription: {e}")
-            finally:
-                conn.close()
 
     def delete_prescription(self):
         """Deletes an existing prescription record."""
@@ -189,24 +149,18 @@ class Prescription:
 
         st.success("Prescription ID Verified")
 
-        conn, c = db.connection()
         try:
             # Show the current details before deletion
-            c.execute("SELECT * FROM prescription_record WHERE id = ?", (prescription_id,))
-            details = c.fetchall()
-            show_prescription_details(details)
+            show_prescription_details([repository.prescriptions.get(prescription_id)])
 
             confirm_delete = st.checkbox("Confirm Deletion")
             if confirm_delete:
                 delete = st.button("Delete")
                 if delete:
-                    c.execute("DELETE FROM prescription_record WHERE id = ?", (prescription_id,))
-                    conn.commit()
+                    repository.prescriptions.delete(prescription_id)
                     st.success("Prescription details deleted successfully.")
         except Exception as e:
             st.error(f"Error deleting prescription: {e}")
-        finally:
-            conn.close()
 
     def prescriptions_by_patient(self):
         """Shows all prescriptions of a particular patient."""
@@ -224,16 +178,12 @@ class Prescription:
             st.error("Patient name not found.")
             return
 
-        conn, c = db.connection()
         try:
-            c.execute("SELECT * FROM prescription_record WHERE patient_id = ?", (patient_id,))
-            prescriptions = c.fetchall()
+            prescriptions = repository.prescriptions.where('patient_id', patient_id)
             st.write(f"Prescriptions for {patient_name}:")
             show_prescription_details(prescriptions)
         except Exception as e:
             st.error(f"Error retrieving prescriptions: {e}")
-        finally:
-            conn.close()
 
 
 # --- Display Functions ---
@@ -241,9 +191,6 @@ def show_prescription_details(list_of_prescriptions):
     """Displays prescription details."""
     prescription_titles = [
         "Prescription ID", "Patient ID", "Patient name", "Doctor ID",
-        "Doctor name", "Diagnosis", "Comments", "Medicine 1 name",
-        "Medicine 1 dosage and description", "Medicine 2 name",
-        "Medicine 2 dosage and description", "Medicine 3 name",
-        "Medicine 3 dosage and description",
+        "Doctor name", "Diagnosis", "Comments", "Medicines (name - dosage and description)",
     ]
     show_details(list_of_prescriptions, prescription_titles)
\ No newline at end of file
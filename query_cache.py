@@ -0,0 +1,236 @@
+"""Per-session cache of query results and the DataFrames built from them.
+
+Streamlit reruns the whole script on every widget interaction, so without a cache each rerun
+re-queries and rebuilds the same tables. Results are keyed on (query, params) and stamped with the
+write counters of the tables the query reads (found from the table and view names in the SQL).
+The repository bumps a table's counter on every insert/update/delete, so a cached result is served
+until exactly the moment its data changes. Entries also expire after QUERY_CACHE_TTL seconds, which
+bounds staleness after writes made by another process (e.g. a bulk import). Results read from a
+replica snapshot (see database.ReplicaSet) are also stamped with its generation, so they are
+re-read once a newer snapshot is in place.
+
+Each Streamlit session gets its own cache, limited to QUERY_CACHE_BYTES (least recently used
+entries are evicted first); code running outside a session shares one process-wide cache.
+"""
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+import database as db
+import db_metrics
+import config
+
+try:
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # Streamlit is optional for scripts, the API and CLI tools
+    get_script_run_ctx = None
+
+QUERY_CACHE_BYTES = getattr(config, 'query_cache_bytes', 32 * 1024 * 1024)
+QUERY_CACHE_TTL = getattr(config, 'query_cache_ttl', 300)  # seconds
+
+# Tables each view reads; a write to any of them changes the view
+VIEW_TABLES = {
+    'doctor_view': ('doctor_record', 'department_record'),
+    'prescription_view': ('prescription_record', 'patient_record', 'doctor_record'),
+    'medical_test_view': ('medical_test_record', 'patient_record', 'doctor_record'),
+}
+_TABLE_NAME = re.compile(r'\b(\w+_record|\w+_view|prescription_item)\b')
+
+_versions = {}
+_versions_lock = threading.Lock()
+_tables_of = {}
+
+def bump(*table_names):
+    """Marks tables as changed; cached results that read them are no longer served."""
+    with _versions_lock:
+        for table_name in table_names:
+            _versions[table_name] = _versions.get(table_name, 0) + 1
+
+def tables_of(query):
+    """Returns the base tables a query reads."""
+    tables = _tables_of.get(query)
+    if tables is None:
+        names = set(_TABLE_NAME.findall(query))
+        tables = tuple(sorted({table for name in names for table in VIEW_TABLES.get(name, (name,))}))
+        _tables_of[query] = tables
+    return tables
+
+def _version(tables):
+    with _versions_lock:
+        return tuple(_versions.get(table, 0) for table in tables)
+
+def _size_of(rows):
+    """Approximate memory used by a list of row tuples."""
+    return sys.getsizeof(rows) + sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+                                     for row in rows)
+
+
+class _Entry:
+    __slots__ = ('rows', 'tables', 'version', 'created', 'size', 'frames')
+
+    def __init__(self, rows, tables, version):
+        self.rows = rows
+        self.tables = tables
+        self.version = version
+        self.created = time.monotonic()
+        self.size = _size_of(rows)
+        self.frames = {}
+
+
+class QueryCache:
+    """LRU cache of query results bounded by an approximate byte budget."""
+
+    def __init__(self, max_bytes=QUERY_CACHE_BYTES, ttl=QUERY_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_rows = {}  # id(rows) -> key, to find the entry a DataFrame is built from
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self.frame_hits = self.frame_misses = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._by_rows.pop(id(entry.rows), None)
+        self.bytes -= entry.size
+
+    def fetchall(self, query, params=(), reader=None):
+        """Returns the rows of query, from the cache while the tables it reads are unchanged.
+
+        reader is the pool key to read as (see database.read_connection), if not the caller's.
+        """
+        key = (query, tuple(params))
+        tables = tables_of(query)
+        version = _version(tables) + (db.read_generation(reader),)  # A new replica snapshot changes every result
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.version == version and time.monotonic() - entry.created < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    db_metrics.cache_event('query', 'hit')
+                    return entry.rows
+                self._drop(key)
+                self.invalidations += 1
+            self.misses += 1
+        db_metrics.cache_event('query', 'miss')
+        conn, c = db.read_connection(reader)
+        try:
+            c.execute(query, params)
+            rows = c.fetchall()
+        finally:
+            conn.close()
+        entry = _Entry(rows, tables, version)
+        if entry.size > self.max_bytes // 4:
+            return rows  # Too big to be worth caching
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._by_rows[id(rows)] = key
+            self.bytes += entry.size
+            self._evict()
+        return rows
+
+    def frame(self, rows, columns):
+        """Returns pd.DataFrame(rows, columns=columns), reusing the one built for cached rows."""
+        columns = tuple(columns)
+        with self._lock:
+            key = self._by_rows.get(id(rows))
+            entry = self._entries.get(key) if key is not None else None
+            if entry is not None and entry.rows is rows:
+                df = entry.frames.get(columns)
+                if df is not None:
+                    self.frame_hits += 1
+                    return df
+            self.frame_misses += 1
+        import pandas as pd  # Imported on first use; pandas is the slowest import of the app
+        df = pd.DataFrame([list(row) for row in rows], columns=list(columns))
+        if entry is not None and entry.rows is rows:
+            size = int(df.memory_usage(deep=True).sum())
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    entry.frames[columns] = df
+                    entry.size += size
+                    self.bytes += size
+                    self._evict()
+        return df
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_rows.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Returns entry count, memory used and hit/miss counters."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {'entries': len(self._entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations,
+                    'evictions': self.evictions, 'frame_hits': self.frame_hits,
+                    'frame_misses': self.frame_misses, 'hit_ratio': self.hits / total if total else 0.0}
+
+
+_shared = QueryCache()
+
+def current_cache():
+    """The calling Streamlit session's cache, or the process-wide one outside a session."""
+    if get_script_run_ctx is not None and get_script_run_ctx(suppress_warning=True) is not None:
+        if '_query_cache' not in st.session_state:
+            st.session_state['_query_cache'] = QueryCache()
+        return st.session_state['_query_cache']
+    return _shared
+
+def fetchall(query, params=()):
+    """Cached cursor.fetchall() of query for the current session."""
+    return current_cache().fetchall(query, params)
+
+def frame(rows, columns):
+    """DataFrame of rows, cached alongside the rows if they came from fetchall().
+
+    The display pages call this on every rerun; while the rows stay cached, the same DataFrame is
+    returned instead of being rebuilt.
+    """
+    return current_cache().frame(rows, columns)
+
+def versions():
+    with _versions_lock:
+        return dict(_versions)
+
+def stats_page():
+    """Streamlit page with the statistics of the caches."""
+    import pandas as pd
+    import lookup_cache
+    import patient_chart
+
+    st.subheader("Query cache (this session)")
+    cache = current_cache()
+    stats = cache.stats()
+    st.write(f"{stats['entries']} entries, {stats['bytes'] / 1024 / 1024:.1f} of "
+             f"{stats['max_bytes'] / 1024 / 1024:.0f} MiB, hit ratio {stats['hit_ratio']:.1%}")
+    st.write(pd.DataFrame([stats]))
+    if st.button("Clear this session's cache"):
+        cache.clear()
+        st.success("Query cache cleared.")
+
+    st.subheader("Query cache (outside sessions: API, prefetch)")
+    st.write(pd.DataFrame([_shared.stats()]))
+    st.subheader("Table write counters")
+    st.write(pd.DataFrame(sorted(versions().items()), columns=['Table', 'Writes']))
+    st.subheader("ID lookup cache")
+    st.write(pd.DataFrame([lookup_cache.stats()]))
+    st.subheader("Patient chart cache")
+    st.write(pd.DataFrame([patient_chart.cache.stats()]))
+    st.subheader("Statements by total time (this server process)")
+    st.write(pd.DataFrame(db_metrics.summary()))
+    st.caption(f"Statements slower than {db_metrics.SLOW_QUERY_MS} ms are logged with their query plan "
+               f"to {db_metrics.SLOW_QUERY_LOG}.")
@@ -0,0 +1,403 @@
+"""UI-free data access for patients, doctors, departments, prescriptions and medical tests.
+
+The Streamlit modules and the HTTP API (api.py) both go through these repositories, so validation,
+derived columns (ages, registration time, IDs) and cache invalidation live in one place. Reads use
+the pooled connections, writes the writer queue. Rows are returned as tuples in the layout of the
+module's display function; as_dict() turns one into a {column: value} dict. The queries run on
+either storage backend (see backends.py).
+"""
+from datetime import datetime, date, time, timedelta
+import database as db
+import id_generator
+import lookup_cache
+import pagination
+import patient_chart
+import query_cache
+import search
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+DATE_FORMAT = '%d-%m-%Y'  # Date of birth
+DATE_TIME_FORMAT = '%Y-%m-%d %H:%M'  # Test and result times (ISO-8601, sortable)
+RANGE_KEYS = {'patient_id', 'doctor_id', 'medical_lab_scientist_id'}
+
+# Prescription columns followed by its medicines as one "name - dosage; ..." text column
+PRESCRIPTION_SELECT = """
+    SELECT p.*, (
+        SELECT group_concat(item, '; ') FROM (
+            SELECT i.medicine_name || ' - ' || COALESCE(i.dosage_description, '') AS item
+            FROM prescription_item i WHERE i.prescription_id = p.id ORDER BY i.position
+        ) AS items
+    ) AS medicines
+    FROM prescription_view p
+"""
+
+
+class ValidationError(ValueError):
+    """The submitted data is incomplete or invalid."""
+
+
+class RecordNotFound(LookupError):
+    """There is no record with the given ID."""
+
+
+def calculate_age(dob):
+    """Calculates age from a date of birth."""
+    today = date.today()
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+def _parse(value, fmt, column):
+    try:
+        return datetime.strptime(value, fmt)
+    except (TypeError, ValueError):
+        raise ValidationError(f"Invalid {column}: {value!r}") from None
+
+def _check_exists(table_name, record_id, column):
+    if not lookup_cache.id_exists(table_name, record_id):
+        raise ValidationError(f"Unknown {column}: {record_id!r}")
+
+
+class Repository:
+    """Create/read/update/delete/search for one table.
+
+    select is the read query (aliased as `alias`) whose layout the rows come back in; columns are
+    the writable table columns, required those that must be non-empty on create (and that an update
+    cannot empty), and updatable those an update may change. count_key is the name pagination counts
+    the rows under.
+    """
+
+    def __init__(self, table_name, prefix, select, alias, columns, required, updatable, search_fn,
+                 count_key=None):
+        self.table_name = table_name
+        self.count_key = count_key or table_name
+        self.prefix = prefix
+        self.select = select
+        self.alias = alias
+        self.columns = columns
+        self.required = required
+        self.updatable = updatable
+        self.search_fn = search_fn
+        self._fields = None
+
+    # --- Reading ---
+    @property
+    def fields(self):
+        """Column names of the rows returned by the read methods."""
+        if self._fields is None:
+            conn, c = db.connection()
+            try:
+                c.execute(self.select + " LIMIT 0")
+                self._fields = [column[0] for column in c.description]
+            finally:
+                conn.close()
+        return self._fields
+
+    def as_dict(self, row):
+        return dict(zip(self.fields, row))
+
+    def _query(self, where='', params=(), suffix=''):
+        return query_cache.fetchall(f"{self.select} {where} {suffix}", params)
+
+    def exists(self, record_id):
+        return lookup_cache.id_exists(self.table_name, record_id)
+
+    def get(self, record_id):
+        """Returns the row with this ID; raises RecordNotFound if there is none."""
+        rows = self._query(f"WHERE {self.alias}.id = ?", (record_id,))
+        if not rows:
+            raise RecordNotFound(f"No {self.table_name} with ID {record_id!r}")
+        return rows[0]
+
+    def list(self, after_id=None, limit=DEFAULT_LIMIT):
+        """Returns up to limit rows in ID order, starting after after_id (keyset pagination)."""
+        limit = max(1, min(limit, MAX_LIMIT))
+        if after_id is None:
+            return self._query(suffix=f"ORDER BY {self.alias}.id LIMIT ?", params=(limit,))
+        return self._query(f"WHERE {self.alias}.id > ?", (after_id, limit), f"ORDER BY {self.alias}.id LIMIT ?")
+
+    def search(self, text, limit=search.DEFAULT_LIMIT):
+        """Full-text search (see search.py), best matches first."""
+        return self.search_fn(text, limit)
+
+    def where(self, column, value):
+        """Returns the rows whose column equals value (column must be one of self.columns)."""
+        if column not in self.columns:
+            raise ValidationError(f"Unknown column: {column}")
+        return self._query(f"WHERE {self.alias}.{column} = ?", (value,))
+
+    # --- Writing ---
+    def prepare(self, record, is_update):
+        """Validates record and fills in derived columns (overridden per table)."""
+
+    def create(self, data):
+        """Inserts a record from a {column: value} dict and returns its ID."""
+        record = {column: data.get(column) for column in self.columns + self.updatable}
+        missing = [column for column in self.required if record.get(column) in (None, '')]
+        if missing:
+            raise ValidationError(f"Missing required field(s): {', '.join(missing)}")
+        record['id'] = record.get('id') or id_generator.generate_id(self.prefix)
+        self.prepare(record, is_update=False)
+        db.run_write(self._insert, record)
+        self.invalidate(record['id'], record)
+        return record['id']
+
+    def _insert(self, conn, record):
+        columns = [column for column in self.columns if column in record]
+        conn.execute(
+            f"INSERT INTO {self.table_name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [record[column] for column in columns],
+        )
+
+    def update(self, record_id, data):
+        """Updates the updatable columns present in data."""
+        unknown = [column for column in data if column not in self.updatable]
+        if unknown:
+            raise ValidationError(f"Field(s) cannot be updated: {', '.join(unknown)}")
+        emptied = [column for column in self.required if column in data and data[column] in (None, '')]
+        if emptied:
+            raise ValidationError(f"Required field(s) cannot be emptied: {', '.join(emptied)}")
+        if not self.exists(record_id):
+            raise RecordNotFound(f"No {self.table_name} with ID {record_id!r}")
+        record = dict(data, id=record_id)
+        self.prepare(record, is_update=True)
+        if not db.run_write(self._update, record):
+            raise RecordNotFound(f"No {self.table_name} with ID {record_id!r}")
+        self.invalidate(record_id, record)
+
+    def _update(self, conn, record):
+        columns = [column for column in self.columns if column in record and column != 'id']
+        if not columns:
+            return 1
+        assignments = ', '.join(f"{column} = ?" for column in columns)
+        return conn.execute(f"UPDATE {self.table_name} SET {assignments} WHERE id = ?",
+                            [record[column] for column in columns] + [record['id']]).rowcount
+
+    def delete(self, record_id):
+        """Deletes a record; raises RecordNotFound if there is none."""
+        if not db.execute_write(f"DELETE FROM {self.table_name} WHERE id = ?", (record_id,)):
+            raise RecordNotFound(f"No {self.table_name} with ID {record_id!r}")
+        self.invalidate(record_id, None)
+
+    def invalidate(self, record_id, record):
+        """Drops the cached row count, lookups and query results a write to record_id may have changed."""
+        query_cache.bump(self.table_name)
+        pagination.invalidate_count(self.count_key)
+        lookup_cache.invalidate(self.table_name, record_id)
+
+
+class PatientRepository(Repository):
+
+    def prepare(self, record, is_update):
+        if is_update:
+            dob = self.as_dict(self.get(record['id']))['date_of_birth']
+            record['age'] = calculate_age(_parse(dob, DATE_FORMAT, 'date_of_birth').date())
+            return
+        record['age'] = calculate_age(_parse(record['date_of_birth'], DATE_FORMAT, 'date_of_birth').date())
+        now = datetime.now()
+        record['date_of_registration'] = record.get('date_of_registration') or now.strftime('%Y-%m-%d')
+        record['time_of_registration'] = record.get('time_of_registration') or now.strftime('%H:%M:%S')
+        for column in ('contact_number_2', 'email_id'):
+            record[column] = record.get(column) or ''
+        for column in ('weight', 'height'):
+            record[column] = record.get(column) or 0
+
+    def invalidate(self, record_id, record):
+        super().invalidate(record_id, record)
+        patient_chart.invalidate(record_id)
+
+
+class DoctorRepository(Repository):
+
+    def prepare(self, record, is_update):
+        if record.get('department_id') is not None:
+            _check_exists('department_record', record['department_id'], 'department_id')
+        if is_update:
+            dob = self.as_dict(self.get(record['id']))['date_of_birth']
+        else:
+            dob = record['date_of_birth']
+            record['years_of_experience'] = record.get('years_of_experience') or 0
+        record['age'] = calculate_age(_parse(dob, DATE_FORMAT, 'date_of_birth').date())
+
+
+def _medicines(value):
+    """Validates a list of (name, dosage) pairs (dosage may be None) and returns it as tuples."""
+    if not value:
+        raise ValidationError("A prescription needs at least one medicine")
+    if isinstance(value, (str, dict)) or not isinstance(value, (list, tuple)):
+        raise ValidationError("medicines must be a list of (name, dosage) pairs")
+    medicines = []
+    for medicine in value:
+        if isinstance(medicine, (str, dict)) or not isinstance(medicine, (list, tuple)) or len(medicine) != 2:
+            raise ValidationError(f"Invalid medicine {medicine!r}: expected a (name, dosage) pair")
+        name, dosage = medicine
+        if not isinstance(name, str) or not name.strip() or not isinstance(dosage, (str, type(None))):
+            raise ValidationError(f"Invalid medicine {medicine!r}: name must be text and dosage text or null")
+        medicines.append((name, dosage))
+    return medicines
+
+
+class PrescriptionRepository(Repository):
+    """Prescriptions; create/update also take 'medicines', a list of (name, dosage) pairs."""
+
+    def create(self, data):
+        return super().create(dict(data, medicines=_medicines(data.get('medicines'))))
+
+    def prepare(self, record, is_update):
+        if not is_update:
+            _check_exists('patient_record', record['patient_id'], 'patient_id')
+            _check_exists('doctor_record', record['doctor_id'], 'doctor_id')
+            record['comments'] = record.get('comments') or ''
+
+    def update(self, record_id, data):
+        if 'medicines' in data:
+            data = dict(data, medicines=_medicines(data['medicines']))
+        super().update(record_id, data)
+
+    def _insert(self, conn, record):
+        super()._insert(conn, record)
+        save_prescription_items(conn, record['id'], record['medicines'])
+
+    def _update(self, conn, record):
+        rowcount = super()._update(conn, record)
+        if rowcount and 'medicines' in record:
+            save_prescription_items(conn, record['id'], record['medicines'])
+        return rowcount
+
+    def search(self, text, limit=search.DEFAULT_LIMIT):
+        # The search index returns prescription_view rows; re-read them with their medicines
+        ids = [row[0] for row in self.search_fn(text, limit)]
+        if not ids:
+            return []
+        rows = {row[0]: row for row in self._query(f"WHERE p.id IN ({', '.join('?' * len(ids))})", ids)}
+        return [rows[i] for i in ids if i in rows]
+
+    def by_medicine(self, medicine_name):
+        """Returns all prescriptions that include a medicine (case-insensitive)."""
+        return self._query(
+            "WHERE p.id IN (SELECT prescription_id FROM prescription_item WHERE medicine_name = ? COLLATE NOCASE)",
+            (medicine_name,),
+        )
+
+    def invalidate(self, record_id, record):
+        super().invalidate(record_id, record)
+        query_cache.bump('prescription_item')
+        patient_chart.invalidate(record.get('patient_id') if record else None, record_id)
+
+
+class MedicalTestRepository(Repository):
+
+    def prepare(self, record, is_update):
+        for column in ('patient_id', 'doctor_id'):
+            if record.get(column) is not None:
+                _check_exists(column.replace('_id', '_record'), record[column], column)
+        for column in ('test_date_time', 'result_date_time'):
+            if record.get(column) is not None:
+                _parse(record[column], DATE_TIME_FORMAT, column)
+        if not is_update:
+            record['result_and_diagnosis'] = record.get('result_and_diagnosis') or "Test result awaited"
+            record['cost'] = record.get('cost') or 0
+            for column in ('description', 'comments'):
+                record[column] = record.get(column) or ''
+
+    def in_range(self, start, end, **key):
+        """Returns the tests whose test_date_time lies between start and end, oldest first.
+
+        start and end are dates or datetimes (a date `end` includes that whole day). Optionally narrow
+        to one patient_id, doctor_id or medical_lab_scientist_id; each has a (key, test_date_time)
+        index, so the query is a single index range scan.
+        """
+        if len(key) > 1 or not RANGE_KEYS.issuperset(key):
+            raise ValueError(f"Expected at most one of {', '.join(sorted(RANGE_KEYS))}")
+        if not isinstance(start, datetime):
+            start = datetime.combine(start, time.min)
+        if not isinstance(end, datetime):
+            end = datetime.combine(end + timedelta(days=1), time.min) - timedelta(minutes=1)
+        where = "WHERE t.test_date_time BETWEEN ? AND ?"
+        params = [start.strftime(DATE_TIME_FORMAT), end.strftime(DATE_TIME_FORMAT)]
+        for column, value in key.items():
+            where += f" AND t.{column} = ?"
+            params.append(value)
+        return self._query(where, params, "ORDER BY t.test_date_time")
+
+    def invalidate(self, record_id, record):
+        super().invalidate(record_id, record)
+        patient_chart.invalidate(record.get('patient_id') if record else None, record_id)
+
+
+def save_prescription_items(conn, prescription_id, medicines):
+    """Replaces the items of a prescription with medicines, a list of (name, dosage) pairs."""
+    conn.execute("DELETE FROM prescription_item WHERE prescription_id = ?", (prescription_id,))
+    conn.executemany(
+        "INSERT INTO prescription_item (prescription_id, position, medicine_name, dosage_description) VALUES (?, ?, ?, ?)",
+        [(prescription_id, position, name, dosage) for position, (name, dosage) in enumerate(medicines, start=1)],
+    )
+
+
+patients = PatientRepository(
+    'patient_record', 'P', "SELECT * FROM patient_record t", 't',
+    columns=['id', 'name', 'age', 'gender', 'date_of_birth', 'blood_group',
+             'contact_number_1', 'contact_number_2', 'aadhar_or_voter_id',
+             'weight', 'height', 'address', 'city', 'state', 'pin_code',
+             'next_of_kin_name', 'next_of_kin_relation_to_patient',
+             'next_of_kin_contact_number', 'email_id',
+             'date_of_registration', 'time_of_registration'],
+    required=['name', 'gender', 'date_of_birth', 'blood_group', 'contact_number_1',
+              'aadhar_or_voter_id', 'next_of_kin_name', 'next_of_kin_relation_to_patient',
+              'next_of_kin_contact_number', 'address', 'city', 'state', 'pin_code'],
+    updatable=['contact_number_1', 'contact_number_2', 'weight', 'height', 'address', 'city',
+               'state', 'pin_code', 'next_of_kin_name', 'next_of_kin_relation_to_patient',
+               'next_of_kin_contact_number', 'email_id'],
+    search_fn=search.search_patients,
+)
+
+doctors = DoctorRepository(
+    'doctor_record', 'DR', "SELECT * FROM doctor_view t", 't',
+    columns=['id', 'name', 'age', 'gender', 'date_of_birth', 'blood_group', 'department_id',
+             'contact_number_1', 'contact_number_2', 'aadhar_or_voter_id', 'email_id',
+             'qualification', 'specialisation', 'years_of_experience',
+             'address', 'city', 'state', 'pin_code'],
+    required=['name', 'gender', 'date_of_birth', 'blood_group', 'department_id',
+              'contact_number_1', 'aadhar_or_voter_id', 'email_id', 'qualification',
+              'specialisation', 'address', 'city', 'state', 'pin_code'],
+    updatable=['department_id', 'contact_number_1', 'contact_number_2', 'email_id', 'qualification',
+               'specialisation', 'years_of_experience', 'address', 'city', 'state', 'pin_code'],
+    search_fn=search.search_doctors,
+    count_key='doctor_view',
+)
+
+departments = Repository(
+    'department_record', 'D', "SELECT * FROM department_record t", 't',
+    columns=['id', 'name', 'description', 'contact_number_1', 'contact_number_2', 'address', 'email_id'],
+    required=['name', 'description', 'contact_number_1', 'address', 'email_id'],
+    updatable=['description', 'contact_number_1', 'contact_number_2', 'address', 'email_id'],
+    search_fn=search.search_departments,
+)
+
+prescriptions = PrescriptionRepository(
+    'prescription_record', 'M', PRESCRIPTION_SELECT, 'p',
+    columns=['id', 'patient_id', 'doctor_id', 'diagnosis', 'comments'],
+    required=['patient_id', 'doctor_id', 'diagnosis'],
+    updatable=['diagnosis', 'comments', 'medicines'],
+    search_fn=search.search_prescriptions,
+)
+
+medical_tests = MedicalTestRepository(
+    'medical_test_record', 'T', "SELECT * FROM medical_test_view t", 't',
+    columns=['id', 'test_name', 'patient_id', 'doctor_id', 'medical_lab_scientist_id',
+             'test_date_time', 'result_date_time', 'result_and_diagnosis', 'description',
+             'comments', 'cost'],
+    required=['test_name', 'patient_id', 'doctor_id', 'medical_lab_scientist_id',
+              'test_date_time', 'result_date_time'],
+    updatable=['test_name', 'patient_id', 'doctor_id', 'medical_lab_scientist_id',
+               'test_date_time', 'result_date_time', 'result_and_diagnosis', 'description',
+               'comments', 'cost'],
+    search_fn=search.search_medical_tests,
+)
+
+REPOSITORIES = {
+    'patients': patients,
+    'doctors': doctors,
+    'departments': departments,
+    'prescriptions': prescriptions,
+    'medical_tests': medical_tests,
+}
@@ -0,0 +1,86 @@
+"""Revenue from medical tests by department, doctor and month.
+
+Reads only revenue_monthly, the summary the migration-10 triggers keep in step with every insert,
+update and delete on medical_test_record, so a report costs O(groups) rather than O(tests).
+"""
+import pandas as pd
+import streamlit as st
+import database as db
+
+GROUPINGS = {
+    'department': ("r.department_id", "dp.name", "Department"),
+    'doctor': ("r.doctor_id", "dr.name", "Doctor"),
+    'month': ("r.month", None, "Month (YYYY-MM)"),
+}
+
+def revenue(group_by=('department', 'month'), start_month=None, end_month=None,
+            department_id=None, doctor_id=None):
+    """Returns a DataFrame of tests and revenue grouped by any of 'department', 'doctor', 'month'.
+
+    Months are 'YYYY-MM' strings; both ends of the range are inclusive.
+    """
+    db.require_summary_tables("The revenue report")
+    unknown = [g for g in group_by if g not in GROUPINGS]
+    if unknown:
+        raise ValueError(f"Unknown grouping: {', '.join(unknown)}")
+    select, group, columns = [], [], []
+    for name in group_by:
+        key, label, title = GROUPINGS[name]
+        select.append(key)
+        group.append(key)
+        columns.append(f"{title} ID" if label else title)
+        if label:
+            select.append(label)
+            group.append(label)
+            columns.append(f"{title} name")
+    conditions, params = [], []
+    for column, value in (("r.month >= ?", start_month), ("r.month <= ?", end_month),
+                          ("r.department_id = ?", department_id), ("r.doctor_id = ?", doctor_id)):
+        if value:
+            conditions.append(column)
+            params.append(value)
+
+    query = f"""
+        SELECT {', '.join(select + ['SUM(r.tests)', 'SUM(r.revenue)'])}
+        FROM revenue_monthly r
+        LEFT JOIN department_record dp ON dp.id = r.department_id
+        LEFT JOIN doctor_record dr ON dr.id = r.doctor_id
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        {'GROUP BY ' + ', '.join(group) if group else ''}
+        {'ORDER BY ' + ', '.join(group) if group else ''}
+    """
+    conn, c = db.connection()
+    try:
+        c.execute(query, params)
+        rows = c.fetchall()
+    finally:
+        conn.close()
+    return pd.DataFrame([list(row) for row in rows], columns=columns + ["Tests", "Revenue (INR)"])
+
+
+# --- Streamlit page ---
+def revenue_page():
+    """Streamlit view of revenue by department, doctor and month."""
+    if not db.backend.summary_tables:
+        st.info(f"Revenue reports are not available on the {db.backend.name} backend.")
+        return
+    group_by = st.multiselect("Group by", list(GROUPINGS), default=['department', 'month'])
+    start_month = st.text_input("From month (YYYY-MM, optional)")
+    end_month = st.text_input("To month (YYYY-MM, optional)")
+    try:
+        report = revenue(group_by, start_month or None, end_month or None)
+    except Exception as e:
+        st.error(f"Error retrieving revenue: {e}")
+        return
+    if report.empty:
+        st.warning('No data to show')
+        return
+    st.metric("Total revenue (INR)", f"{report['Revenue (INR)'].sum():,}")
+    if 'month' in group_by and len(group_by) <= 2:  # Chart revenue over months, one series per other key
+        other = [g for g in group_by if g != 'month']
+        index = "Month (YYYY-MM)"
+        series = f"{GROUPINGS[other[0]][2]} name" if other else None
+        chart = report.pivot_table(index=index, columns=series, values="Revenue (INR)", aggfunc='sum') \
+            if series else report.set_index(index)["Revenue (INR)"]
+        st.bar_chart(chart)
+    st.write(report)
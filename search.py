@@ -0,0 +1,83 @@
+"""Full-text search over patients, doctors, diagnoses and test results (SQLite FTS5).
+
+The *_search tables are created and kept in sync by triggers (see migrations.py). Every word typed
+is matched as a prefix, so "ram pu" finds "Ramesh" in "Pune", and results are ordered by relevance
+(bm25). The index picks the best `limit` matches itself (a top-N sort over the matching rows) and
+only those are joined, through the index's key table, to their records. Doctors, prescriptions and
+tests are returned in the layout of their *_view (with the joined patient/doctor/department names).
+Results are served from query_cache until a write changes the table.
+
+Backends without FTS5 (PostgreSQL, see backends.py) match every word as a case-insensitive
+substring of the same columns instead, unranked, in ID order. Departments, of which there are few,
+are always searched that way.
+"""
+import re
+import database as db
+import migrations
+import query_cache
+
+DEFAULT_LIMIT = 20
+
+def fts_query(text):
+    """Turns free text into an FTS5 query that prefix-matches every word (None if there are none)."""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+def _substring_search(table_name, columns, text, limit, view_name=None):
+    """Rows every word of text occurs in (in any of columns, ignoring case), in ID order."""
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return []
+    match = ' OR '.join(f"lower(t.{column}) LIKE ?" for column in columns)
+    view_join = f"JOIN {view_name} v ON v.id = t.id" if view_name else ""
+    return query_cache.fetchall(
+        f"""
+        SELECT {'v' if view_name else 't'}.* FROM {table_name} t
+        {view_join}
+        WHERE {' AND '.join(f'({match})' for _ in words)}
+        ORDER BY t.id
+        LIMIT ?
+        """,
+        [f'%{word}%' for word in words for _ in columns] + [limit],
+    )
+
+def _search(index_name, table_name, text, limit, view_name=None):
+    if not db.backend.full_text_search:
+        return _substring_search(table_name, migrations.SEARCH_INDEXES[index_name][1], text, limit, view_name)
+    query = fts_query(text)
+    if query is None:
+        return []
+    # The index is keyed on its key table (see migrations.stable_search_keys), which holds the record IDs
+    return query_cache.fetchall(
+        f"""
+        SELECT t.* FROM (
+            SELECT rowid, rank FROM {index_name} WHERE {index_name} MATCH ? ORDER BY rank LIMIT ?
+        ) s
+        JOIN {index_name}_key k ON k.key = s.rowid
+        JOIN {view_name or table_name} t ON t.id = k.id
+        ORDER BY s.rank
+        """,
+        (query, limit),
+    )
+
+def search_patients(text, limit=DEFAULT_LIMIT):
+    """Patients whose name, contact numbers or city match the text."""
+    return _search('patient_search', 'patient_record', text, limit)
+
+def search_doctors(text, limit=DEFAULT_LIMIT):
+    """Doctors whose name or specialisation match the text."""
+    return _search('doctor_search', 'doctor_record', text, limit, 'doctor_view')
+
+def search_departments(text, limit=DEFAULT_LIMIT):
+    """Departments whose name or description contain the text."""
+    return _substring_search('department_record', ['name', 'description'], text, limit)
+
+def search_prescriptions(text, limit=DEFAULT_LIMIT):
+    """Prescriptions whose diagnosis matches the text."""
+    return _search('prescription_search', 'prescription_record', text, limit, 'prescription_view')
+
+def search_medical_tests(text, limit=DEFAULT_LIMIT):
+    """Medical tests whose name or result and diagnosis match the text."""
+    return _search('medical_test_search', 'medical_test_record', text, limit, 'medical_test_view')
@@ -0,0 +1,173 @@
+"""Shared fixtures: every test that asks for `hims_db` gets a fresh, migrated SQLite database.
+
+The application reads its settings from a `config` module. The tests install their own, pointing at
+a temporary directory, before anything imports the application, so a developer's config.py and
+database are never touched.
+
+Tests that ask for `any_db` run once on SQLite and once on PostgreSQL, each time in a fresh schema of
+the database at HIMS_TEST_POSTGRES_DSN, or else of a throwaway server started with initdb/pg_ctl.
+The PostgreSQL runs are skipped when psycopg (an optional dependency) or a server is not available.
+
+    python -m pytest -q tests
+    HIMS_TEST_POSTGRES_DSN='dbname=hims_test' python -m pytest -q tests
+"""
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_DATA_DIR = tempfile.mkdtemp(prefix='hims-tests-')
+config = types.ModuleType('config')
+config.database_name = os.path.join(_DATA_DIR, 'hims')
+config.password = config.edit_mode_password = config.dr_mls_access_code = 'test'
+config.replica_dir = os.path.join(_DATA_DIR, 'replicas')
+sys.modules['config'] = config
+
+import backends  # noqa: E402  (imported after the config above)
+import database as db  # noqa: E402
+import lookup_cache  # noqa: E402
+import pagination  # noqa: E402
+import patient_chart  # noqa: E402
+import query_cache  # noqa: E402
+
+
+def use_database(backend, path=None):
+    """Points the data layer at a new database: fresh pool and writer, empty caches."""
+    db.backend = backend
+    if path is not None:
+        db.DATABASE_PATH = path
+    db.pool.close_all()
+    db.pool = db.ConnectionPool()
+    db.writer = db.WriteQueue()
+    lookup_cache.cache.clear()
+    patient_chart.cache.clear()
+    query_cache._shared.clear()
+    with pagination._count_lock:
+        pagination._count_cache.clear()
+
+
+@pytest.fixture
+def hims_db(tmp_path):
+    """A fresh SQLite database with the current schema; yields its path."""
+    use_database(backends.SQLiteBackend(), str(tmp_path / 'hims.db'))
+    db.db_init()
+    yield db.DATABASE_PATH
+    db.pool.close_all()
+
+
+def _postgres_binaries():
+    for directory in [None] + sorted(glob.glob('/usr/lib/postgresql/*/bin'), reverse=True):
+        initdb, pg_ctl = shutil.which('initdb', path=directory), shutil.which('pg_ctl', path=directory)
+        if initdb and pg_ctl:
+            return initdb, pg_ctl
+    return None
+
+@pytest.fixture(scope='session')
+def postgres_dsn(tmp_path_factory):
+    """DSN of a PostgreSQL database to test against; skips the test if there is none."""
+    if backends.psycopg is None:
+        pytest.skip("psycopg is not installed (pip install 'psycopg[binary]')")
+    if os.environ.get('HIMS_TEST_POSTGRES_DSN'):
+        yield os.environ['HIMS_TEST_POSTGRES_DSN']
+        return
+    binaries = _postgres_binaries()
+    if binaries is None:
+        pytest.skip("No PostgreSQL server: set HIMS_TEST_POSTGRES_DSN or put initdb/pg_ctl on PATH")
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        pytest.skip("PostgreSQL does not run as root: set HIMS_TEST_POSTGRES_DSN")
+    initdb, pg_ctl = binaries
+    data = tmp_path_factory.mktemp('postgres')
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    subprocess.run([initdb, '-D', str(data), '-U', 'postgres', '-A', 'trust', '-E', 'UTF8'], check=True,
+                   capture_output=True)
+    subprocess.run([pg_ctl, '-D', str(data), '-l', str(data / 'server.log'), '-w', 'start',
+                    '-o', f"-p {port} -k {data} -c listen_addresses=''"], check=True, capture_output=True)
+    try:
+        yield f"host={data} port={port} user=postgres dbname=postgres"
+    finally:
+        subprocess.run([pg_ctl, '-D', str(data), '-m', 'fast', 'stop'], capture_output=True)
+
+
+@pytest.fixture(params=['sqlite', 'postgres'])
+def any_db(request, tmp_path):
+    """A fresh database with the current schema on each backend in turn; yields the backend."""
+    if request.param == 'sqlite':
+        request.getfixturevalue('hims_db')
+        yield db.backend
+        return
+    dsn = request.getfixturevalue('postgres_dsn')
+    schema = f"hims_test_{_unique()}"
+    with backends.psycopg.connect(dsn, autocommit=True) as admin:
+        admin.execute(f"CREATE SCHEMA {schema}")
+    use_database(backends.PostgresBackend(f"{dsn} application_name={schema} options='-c search_path={schema}'"))
+    try:
+        db.db_init()
+        yield db.backend
+    finally:
+        db.pool.close_all()
+        use_database(backends.SQLiteBackend())
+        with backends.psycopg.connect(dsn, autocommit=True) as admin:
+            # Including the connection of the replaced writer thread, which is never closed
+            admin.execute("SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE application_name = %s",
+                          (schema,))
+            admin.execute(f"DROP SCHEMA {schema} CASCADE")
+
+
+# --- Records ---
+_counter = [0]
+
+def _unique():
+    _counter[0] += 1
+    return f"{os.getpid()}{_counter[0]:06d}"
+
+def department_data(**fields):
+    stamp = _unique()
+    return dict({'name': f"Department {stamp}", 'description': "Test department", 'contact_number_1': '0200000000',
+                 'address': "Block A", 'email_id': f"dept{stamp}@hims.test"}, **fields)
+
+def doctor_data(department_id, **fields):
+    stamp = _unique()
+    return dict({'name': f"Dr. Asha {stamp}", 'gender': 'Female', 'date_of_birth': '01-01-1980', 'blood_group': 'O+',
+                 'department_id': department_id, 'contact_number_1': '0200000001',
+                 'aadhar_or_voter_id': f"DR-{stamp}", 'email_id': f"dr{stamp}@hims.test", 'qualification': 'MBBS',
+                 'specialisation': 'Cardiology', 'address': "Ring Road", 'city': 'Pune', 'state': 'Maharashtra',
+                 'pin_code': '411001'}, **fields)
+
+def patient_data(**fields):
+    stamp = _unique()
+    return dict({'name': f"Ravi Kumar {stamp}", 'gender': 'Male', 'date_of_birth': '15-08-1990', 'blood_group': 'A+',
+                 'contact_number_1': stamp[-10:].rjust(10, '9'), 'aadhar_or_voter_id': f"P-{stamp}",
+                 'address': "MG Road", 'city': 'Nagpur', 'state': 'Maharashtra', 'pin_code': '440001',
+                 'next_of_kin_name': "Sita", 'next_of_kin_relation_to_patient': 'Sibling',
+                 'next_of_kin_contact_number': '0200000003'}, **fields)
+
+def medical_test_data(patient_id, doctor_id, **fields):
+    return dict({'test_name': 'ECG', 'patient_id': patient_id, 'doctor_id': doctor_id,
+                 'medical_lab_scientist_id': 'MLS-1', 'test_date_time': '2024-01-01 09:00',
+                 'result_date_time': '2024-01-01 10:30', 'cost': 250}, **fields)
+
+
+@pytest.fixture
+def department_id(hims_db):
+    import repository
+    return repository.departments.create(department_data())
+
+@pytest.fixture
+def doctor_id(department_id):
+    import repository
+    return repository.doctors.create(doctor_data(department_id))
+
+@pytest.fixture
+def patient_id(hims_db):
+    import repository
+    return repository.patients.create(patient_data())
@@ -0,0 +1,86 @@
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import database as db
+import repository
+from conftest import department_data, doctor_data, medical_test_data, patient_data
+
+
+@pytest.fixture
+def client(hims_db):
+    with TestClient(api.app, headers={'X-API-Key': 'test'}) as client:
+        yield client
+
+
+def _create(client, collection, data):
+    response = client.post(f'/{collection}', json=data)
+    assert response.status_code == 201, response.text
+    return response.json()['id']
+
+
+def test_records_are_created_read_updated_listed_and_deleted(client):
+    department_id = _create(client, 'departments', department_data())
+    doctor_id = _create(client, 'doctors', doctor_data(department_id))
+    patient_id = _create(client, 'patients', patient_data(city='Satara'))
+    test_id = _create(client, 'medical_tests', medical_test_data(patient_id, doctor_id))
+    prescription_id = _create(client, 'prescriptions', {'patient_id': patient_id, 'doctor_id': doctor_id,
+                                                        'diagnosis': "Viral fever", 'medicines': [['Paracetamol', '500 mg']]})
+
+    assert client.get(f'/doctors/{doctor_id}').json()['department_id'] == department_id
+    assert client.patch(f'/patients/{patient_id}', json={'city': 'Wardha'}).status_code == 200
+    assert client.get(f'/patients/{patient_id}').json()['city'] == 'Wardha'
+    assert [p['id'] for p in client.get('/patients/search', params={'q': 'wardha'}).json()] == [patient_id]
+    assert client.get('/prescriptions').json()[0]['medicines'] == "Paracetamol - 500 mg"
+    chart = client.get(f'/patients/{patient_id}/chart').json()
+    assert ([t['id'] for t in chart['medical_tests']], [p['id'] for p in chart['prescriptions']]) == \
+        ([test_id], [prescription_id])
+
+    assert client.delete(f'/medical_tests/{test_id}').status_code == 204
+    assert client.get(f'/medical_tests/{test_id}').status_code == 404
+    assert client.delete(f'/medical_tests/{test_id}').status_code == 404
+
+
+def test_pages_follow_each_other(client):
+    ids = sorted(_create(client, 'patients', patient_data()) for _ in range(5))
+    first = client.get('/patients', params={'limit': 3}).json()
+    rest = client.get('/patients', params={'limit': 3, 'after_id': first[-1]['id']}).json()
+    assert [p['id'] for p in first + rest] == ids
+
+
+@pytest.mark.parametrize('path, params', [('/patients', {}), ('/patients/search', {'q': 'ravi'})])
+@pytest.mark.parametrize('limit', [0, -1, repository.MAX_LIMIT + 1, 'many'])
+def test_out_of_range_limits_are_rejected(client, path, params, limit):
+    assert client.get(path, params=dict(params, limit=limit)).status_code == 422
+    assert client.get(path, params=dict(params, limit=repository.MAX_LIMIT)).status_code == 200
+
+
+def test_invalid_records_get_422_duplicates_409(client, patient_id, doctor_id):
+    assert client.post('/patients', json=patient_data(date_of_birth='1990-08-15')).status_code == 422
+    assert client.post('/prescriptions', json={'patient_id': patient_id, 'doctor_id': doctor_id,
+                                               'medicines': [['Paracetamol', None]]}).status_code == 422
+    assert client.post('/prescriptions', json={'patient_id': patient_id, 'doctor_id': doctor_id, 'diagnosis': "Fever",
+                                               'medicines': 'Paracetamol'}).status_code == 422
+    assert client.patch(f'/patients/{patient_id}', json={'name': "Someone else"}).status_code == 422
+    duplicate = patient_data(aadhar_or_voter_id=repository.patients.as_dict(repository.patients.get(patient_id))[
+        'aadhar_or_voter_id'])
+    assert client.post('/patients', json=duplicate).status_code == 409
+
+
+def test_requests_need_the_api_key_and_a_known_collection(client):
+    assert client.get('/patients', headers={'X-API-Key': 'wrong'}).status_code == 401
+    assert client.get('/wards').status_code == 404
+
+
+def test_importing_the_api_does_not_touch_the_database(hims_db, monkeypatch):
+    # Regression: create_app() migrated the database at import time, so importing api (a test, a
+    # tool, a worker that fails to start) ran the migrations.
+    calls = []
+    monkeypatch.setattr(db, 'db_init', lambda: calls.append('db_init'))
+    app = importlib.reload(api).app
+    assert calls == []
+    with TestClient(app, headers={'X-API-Key': 'test'}) as client:
+        assert calls == ['db_init']
+        assert client.get('/departments').status_code == 200
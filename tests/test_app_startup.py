@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import database as db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_the_login_screen_does_not_import_the_pages_or_pandas(tmp_path):
+    (tmp_path / 'config.py').write_text(f"database_name = {str(tmp_path / 'hims')!r}\n"
+                                        "password = edit_mode_password = dr_mls_access_code = 'test'\n")
+    script = ("import runpy, sys; runpy.run_path('hims_app.py'); "
+              "print(sorted(m for m in ('pandas', 'patient', 'doctor', 'repository') if m in sys.modules))")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(tmp_path), ROOT]))
+    completed = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, capture_output=True, text=True,
+                               timeout=60)
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.strip().splitlines()[-1] == '[]'
+
+
+def test_the_schema_is_initialised_once_per_process(hims_db, monkeypatch):
+    calls = []
+    monkeypatch.setattr(db, 'db_init', lambda: calls.append(1))
+    st.cache_resource.clear()
+    app = AppTest.from_file(os.path.join(ROOT, 'hims_app.py'), default_timeout=30)
+    app.run()
+    assert calls == []  # Not before the password is given
+    app.sidebar.text_input[0].input('test').run()
+    app.sidebar.selectbox[0].select('Patients').run()
+    other_session = AppTest.from_file(os.path.join(ROOT, 'hims_app.py'), default_timeout=30)
+    other_session.run()
+    other_session.sidebar.text_input[0].input('test').run()
+    assert calls == [1]
+    st.cache_resource.clear()
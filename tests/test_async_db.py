@@ -0,0 +1,121 @@
+import asyncio
+import sqlite3 as sql
+import threading
+import time
+
+import pytest
+
+import async_db
+import database as db
+import repository
+from conftest import patient_data
+
+SLOW_QUERY = "WITH RECURSIVE r(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM r LIMIT 100000000) SELECT COUNT(*) FROM r"
+
+
+def _slow_read(connect, outcome):
+    conn, c = connect()
+    try:
+        c.execute(SLOW_QUERY).fetchone()
+        outcome.append('finished')
+    except sql.OperationalError as e:
+        outcome.append(str(e))
+        raise
+    finally:
+        conn.close()
+
+def _wait_for(outcome, seconds=5):
+    deadline = time.monotonic() + seconds
+    while not outcome and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return outcome
+
+
+@pytest.fixture
+def replica(hims_db, tmp_path, monkeypatch):
+    replicas = db.ReplicaSet(directory=str(tmp_path / 'replicas'), interval=3600, consistency='snapshot')
+    replicas.refresh()
+    monkeypatch.setattr(db, 'replicas', replicas)
+    yield replicas
+    replicas.close()
+
+
+def test_independent_reads_run_concurrently(patient_id, doctor_id):
+    names = async_db.run_sync(async_db.fetch_names(('patient_record', patient_id), ('doctor_record', doctor_id)))
+    assert names[0].startswith("Ravi Kumar") and names[1].startswith("Dr. Asha")
+
+
+def test_a_query_over_its_timeout_is_interrupted(hims_db):
+    outcome = []
+    with pytest.raises(asyncio.TimeoutError):
+        async_db.run_sync(async_db.run(_slow_read, db.connection, outcome, timeout=0.2))
+    assert _wait_for(outcome) == ['interrupted']
+
+
+def test_a_replica_query_over_its_timeout_is_interrupted(replica):
+    # Regression: only the call's pooled primary connection was interrupted, so a query on a read
+    # replica connection ran on to completion after its caller had been answered with a timeout.
+    outcome = []
+    with pytest.raises(asyncio.TimeoutError):
+        async_db.run_sync(async_db.run(_slow_read, db.read_connection, outcome, timeout=0.2))
+    assert _wait_for(outcome) == ['interrupted']
+
+
+def test_a_released_replica_connection_is_not_interrupted_for_its_next_user(replica):
+    acquired = threading.Event()
+    outcome = []
+
+    def read_then_wait():
+        conn, c = db.read_connection()
+        c.execute("SELECT 1").fetchone()
+        conn.close()  # Back to the replica pool, where another thread picks it up
+        acquired.wait(5)
+        time.sleep(1)
+
+    def other_reader():
+        conn, c = db.read_connection()
+        acquired.set()
+        try:
+            outcome.append(c.execute("WITH RECURSIVE r(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM r LIMIT 3000000) "
+                                     "SELECT COUNT(*) FROM r").fetchone()[0])
+        finally:
+            conn.close()
+
+    other = threading.Thread(target=other_reader)
+    with pytest.raises(asyncio.TimeoutError):
+        async def timed_out_call():
+            other.start()
+            return await async_db.run(read_then_wait, timeout=0.3)
+        async_db.run_sync(timed_out_call())
+    other.join()
+    assert outcome == [3000000]
+
+
+def test_a_write_queued_before_the_timeout_is_awaited(hims_db):
+    # Regression: a call that timed out while its write waited on the writer queue was answered
+    # 504 although the write was then committed.
+    release = threading.Event()
+    blocker = db.writer.submit(lambda conn: release.wait(5))  # Keeps the writer busy past the timeout
+    threading.Timer(0.5, release.set).start()
+    record = patient_data()
+    patient_id = async_db.run_sync(async_db.run(repository.patients.create, record, timeout=0.1))
+    blocker.result()
+    assert repository.patients.as_dict(repository.patients.get(patient_id))['name'] == record['name']
+
+
+def test_a_call_timed_out_before_starting_is_dropped(hims_db, monkeypatch):
+    monkeypatch.setattr(async_db, '_executor', async_db.ThreadPoolExecutor(max_workers=1))
+    busy = threading.Event()
+    ran = []
+
+    async def calls():
+        first = asyncio.ensure_future(async_db.run(busy.wait, 1, timeout=5))
+        await asyncio.sleep(0.05)  # The first call takes the only worker
+        with pytest.raises(asyncio.TimeoutError):
+            await async_db.run(ran.append, 'second', timeout=0.1)
+        busy.set()
+        await first
+
+    async_db.run_sync(calls())
+    async_db._executor.shutdown(wait=True)
+    assert ran == []
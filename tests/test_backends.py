@@ -0,0 +1,107 @@
+import io
+import sqlite3 as sql
+
+import pytest
+
+import backends
+import database as db
+import export
+import lab_ingest
+import repository
+from conftest import department_data, doctor_data, medical_test_data, patient_data
+
+
+@pytest.fixture
+def records(any_db):
+    """One record of every type on the backend under test: {collection: ID}."""
+    ids = {'departments': repository.departments.create(department_data())}
+    ids['doctors'] = repository.doctors.create(doctor_data(ids['departments']))
+    ids['patients'] = repository.patients.create(patient_data())
+    ids['prescriptions'] = repository.prescriptions.create({
+        'patient_id': ids['patients'], 'doctor_id': ids['doctors'], 'diagnosis': 'Viral fever',
+        'medicines': [('Paracetamol 500mg', '1 tablet'), ('ORS', None)]})
+    ids['medical_tests'] = repository.medical_tests.create(medical_test_data(ids['patients'], ids['doctors']))
+    return ids
+
+
+# collection: (a column to update, its new value, a search that finds the record only after the update)
+UPDATES = {
+    'departments': ('description', 'Cardiac wing', 'cardiac'),
+    'doctors': ('specialisation', 'Nephrology', 'nephrology'),
+    'patients': ('city', 'Solapur', 'solapur'),
+    'prescriptions': ('diagnosis', 'Dengue fever', 'dengue'),
+    'medical_tests': ('test_name', 'Lipid profile', 'lipid'),
+}
+
+
+@pytest.mark.parametrize('collection', UPDATES)
+def test_records_are_created_read_updated_searched_and_deleted(records, collection):
+    repo = repository.REPOSITORIES[collection]
+    record_id = records[collection]
+    column, value, text = UPDATES[collection]
+    assert repo.get(record_id)[0] == record_id
+    assert record_id in [row[0] for row in repo.list()]
+    assert repo.search(text) == []
+    repo.update(record_id, {column: value})
+    assert repo.as_dict(repo.get(record_id))[column] == value
+    assert [row[0] for row in repo.search(text)] == [record_id]
+    created_later = list(records)[list(records).index(collection) + 1:]  # Those that may refer to this one
+    for later in reversed(created_later):
+        repository.REPOSITORIES[later].delete(records[later])
+    repo.delete(record_id)
+    with pytest.raises(repository.RecordNotFound):
+        repo.get(record_id)
+    assert repo.search(text) == []
+
+
+def test_joined_columns_and_medicines_read_the_same(records):
+    prescription = repository.prescriptions.as_dict(repository.prescriptions.get(records['prescriptions']))
+    assert prescription['medicines'] == 'Paracetamol 500mg - 1 tablet; ORS - '
+    assert repository.prescriptions.by_medicine('PARACETAMOL 500mg')
+    doctor = repository.doctors.as_dict(repository.doctors.get(records['doctors']))
+    assert doctor['department_name'].startswith('Department')
+
+
+def test_a_record_in_use_cannot_be_deleted(records):
+    with pytest.raises(sql.IntegrityError):
+        repository.departments.delete(records['departments'])
+    assert repository.departments.get(records['departments'])
+
+
+def test_the_backend_check_passes(any_db):
+    assert backends.check() == ['create', 'read', 'update', 'search', 'summaries', 'delete']
+
+
+def test_tables_and_views_export_as_csv(records):
+    conn, c = db.connection()
+    try:
+        columns = [(name, declared.upper()) for name, declared in export.table_columns(conn, 'medical_test_record')]
+    finally:
+        conn.close()
+    assert columns[0] == ('id', 'TEXT') and ('cost', 'INTEGER') in columns
+    assert export.count_rows('prescription_view', filters=[('diagnosis', '=', 'Viral fever')]) == 1
+    out = io.StringIO()
+    assert export.export_table('doctor_view', out, columns=['id', 'department_name']) == 1
+    assert out.getvalue().splitlines()[1].startswith(records['doctors'])
+
+
+def test_lab_ingestion_is_refused_without_the_summary_tables(records, tmp_path):
+    path = tmp_path / 'results.csv'
+    path.write_text(f"test_id,result,result_date_time\n{records['medical_tests']},Normal,2024-01-01 11:00\n")
+    if db.backend.summary_tables:
+        assert lab_ingest.ingest_file(str(path))['updated'] == 1
+    else:
+        with pytest.raises(sql.NotSupportedError):
+            lab_ingest.ingest_file(str(path))
+        with pytest.raises(sql.NotSupportedError):
+            lab_ingest.watch(str(tmp_path), settle_seconds=0, once=True)
+
+
+@pytest.mark.parametrize('query, has_params, expected', [
+    ("SELECT * FROM t WHERE id = ? AND name = '?'", True, "SELECT * FROM t WHERE id = %s AND name = '?'"),
+    ("SELECT * FROM t WHERE name LIKE ?", True, "SELECT * FROM t WHERE name LIKE %s"),
+    ("SELECT '50%' FROM t WHERE id = ?", True, "SELECT '50%%' FROM t WHERE id = %s"),
+    ("SELECT '50%' FROM t", False, "SELECT '50%' FROM t"),
+])
+def test_placeholders_are_translated_for_psycopg(query, has_params, expected):
+    assert backends.translate(query, has_params) == expected
@@ -0,0 +1,132 @@
+import pandas as pd
+import pytest
+
+import bulk_import
+import database as db
+import lookup_cache
+import pagination
+import repository
+from conftest import medical_test_data, patient_data
+
+
+def _count(query, params=()):
+    conn, c = db.connection()
+    try:
+        return c.execute(query, params).fetchone()[0]
+    finally:
+        conn.close()
+
+def _write_csv(path, records):
+    pd.DataFrame(records).to_csv(path, index=False)
+    return str(path)
+
+def _tests_csv(tmp_path, patient_id, doctor_id, count):
+    return _write_csv(tmp_path / 'tests.csv', [medical_test_data(patient_id, doctor_id, test_name=f"Test {n}")
+                                               for n in range(count)])
+
+
+def test_valid_rows_are_inserted_and_the_rest_reported(hims_db, tmp_path):
+    records = [patient_data() for _ in range(5)]
+    records[1]['name'] = ''
+    records[2]['date_of_birth'] = '1990-08-15'  # Not DD-MM-YYYY
+    records[4]['aadhar_or_voter_id'] = records[3]['aadhar_or_voter_id']
+    source = _write_csv(tmp_path / 'patients.csv', records)
+    result = bulk_import.import_file('patient_record', source)
+    assert (result['rows_done'], result['inserted'], result['rejected']) == (5, 2, 3)
+    rejected = pd.read_csv(source + '.rejected.csv')
+    assert rejected['source_row'].tolist() == [2, 3, 5]
+    assert rejected['reject_reason'].tolist() == ["missing name", "invalid date_of_birth (expected DD-MM-YYYY)",
+                                                  "duplicate aadhar_or_voter_id in file"]
+    assert _count("SELECT COUNT(*) FROM patient_record") == 2
+    assert _count("SELECT age FROM patient_record WHERE aadhar_or_voter_id = ?", (records[0]['aadhar_or_voter_id'],)) > 30
+
+
+def test_rows_failing_a_constraint_are_rejected_one_by_one(hims_db, tmp_path):
+    existing = patient_data()
+    repository.patients.create(existing)
+    records = [patient_data(), patient_data(aadhar_or_voter_id=existing['aadhar_or_voter_id']), patient_data()]
+    source = _write_csv(tmp_path / 'patients.csv', records)
+    result = bulk_import.import_file('patient_record', source)
+    assert (result['inserted'], result['rejected']) == (2, 1)
+    assert 'UNIQUE' in pd.read_csv(source + '.rejected.csv')['reject_reason'][0]
+    assert repository.patients.search(records[2]['name'])  # Indexed after the bulk load
+
+
+def test_a_finished_import_is_not_repeated(hims_db, tmp_path, patient_id, doctor_id):
+    source = _tests_csv(tmp_path, patient_id, doctor_id, 7)
+    bulk_import.import_file('medical_test_record', source, chunk_size=3)
+    result = bulk_import.import_file('medical_test_record', source, chunk_size=3)
+    assert (result['rows_done'], result['inserted']) == (7, 7)
+    assert _count("SELECT COUNT(*) FROM medical_test_record") == 7
+
+
+def test_an_interrupted_import_resumes_without_duplicates(hims_db, tmp_path, patient_id, doctor_id):
+    source = _tests_csv(tmp_path, patient_id, doctor_id, 10)
+
+    def interrupt(checkpoint):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        bulk_import.import_file('medical_test_record', source, chunk_size=3, progress=interrupt)
+    db.run_write(lambda conn: None)  # Let chunks already handed to the writer commit
+    done = bulk_import.load_checkpoint(source, 'medical_test_record')['rows_done']
+    assert 0 < done < 10 and _count("SELECT COUNT(*) FROM medical_test_record") == done
+
+    result = bulk_import.import_file('medical_test_record', source, chunk_size=3)
+    assert (result['rows_done'], result['inserted']) == (10, 10)
+    assert _count("SELECT COUNT(DISTINCT test_name) FROM medical_test_record") == 10
+    assert _count("SELECT COUNT(*) FROM medical_test_record") == 10
+
+
+def test_a_chunk_after_a_failed_one_is_not_committed(hims_db, tmp_path, patient_id, doctor_id, monkeypatch):
+    source = _tests_csv(tmp_path, patient_id, doctor_id, 9)
+    insert_rows = bulk_import._insert_rows
+    calls = []
+
+    def fail_second_chunk(conn, table_name, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+        return insert_rows(conn, table_name, rows)
+
+    monkeypatch.setattr(bulk_import, '_insert_rows', fail_second_chunk)
+    with pytest.raises(RuntimeError):
+        bulk_import.import_file('medical_test_record', source, chunk_size=3)
+    db.run_write(lambda conn: None)
+    assert bulk_import.load_checkpoint(source, 'medical_test_record')['rows_done'] == 3
+    assert _count("SELECT COUNT(*) FROM medical_test_record") == 3  # The third chunk was refused
+
+    monkeypatch.setattr(bulk_import, '_insert_rows', insert_rows)
+    bulk_import.import_file('medical_test_record', source, chunk_size=3)
+    assert _count("SELECT COUNT(DISTINCT test_name) FROM medical_test_record") == 9
+    assert _count("SELECT COUNT(*) FROM medical_test_record") == 9
+
+
+def test_parquet_nulls_become_empty_but_text_values_are_kept(hims_db, tmp_path):
+    # Regression: Parquet values were blanked by matching the strings 'None' and 'nan', which also
+    # erased real values spelled that way.
+    records = [patient_data(next_of_kin_name='None', contact_number_2=None, weight=70),
+               patient_data(next_of_kin_name='nan', contact_number_2='0200000009', weight=None)]
+    path = tmp_path / 'patients.parquet'
+    pd.DataFrame(records).astype({'weight': 'Int64'}).to_parquet(path)
+    chunk = next(bulk_import.read_chunks(str(path)))
+    assert chunk['next_of_kin_name'].tolist() == ['None', 'nan']
+    assert chunk['contact_number_2'].tolist() == ['', '0200000009']
+    assert chunk['weight'].tolist() == ['70', '']
+    result = bulk_import.import_file('patient_record', str(path))
+    assert result['inserted'] == 2
+    assert _count("SELECT COUNT(*) FROM patient_record WHERE next_of_kin_name IN ('None', 'nan')") == 2
+
+
+def test_imported_rows_are_visible_through_the_caches(hims_db, tmp_path):
+    # Regression: nothing invalidated the caches after an import, so counts, query results and IDs
+    # looked up (and cached as unknown) before it stayed stale until their TTL.
+    repository.patients.create(patient_data())
+    assert pagination.count_rows('patient_record') == 1
+    assert len(repository.patients.list()) == 1
+    assert not lookup_cache.id_exists('patient_record', 'P-IMPORTED')
+    source = _write_csv(tmp_path / 'patients.csv', [patient_data(id='P-IMPORTED'), patient_data()])
+    bulk_import.import_file('patient_record', source)
+    assert lookup_cache.id_exists('patient_record', 'P-IMPORTED')
+    assert pagination.count_rows('patient_record') == 3
+    assert len(repository.patients.list()) == 3
@@ -0,0 +1,121 @@
+import sys
+import threading
+
+import database as db
+
+
+def test_nested_acquires_share_one_connection(hims_db):
+    outer = db.pool.acquire()
+    inner = db.pool.acquire()
+    assert inner is outer and outer._users == 2
+    inner.close()
+    assert outer._users == 1
+    outer.close()
+    assert outer._users == 0
+
+
+def test_released_connection_is_reused(hims_db):
+    first = db.pool.acquire()
+    first.close()
+    second = db.pool.acquire()
+    try:
+        assert second is first
+    finally:
+        second.close()
+
+
+def test_release_rolls_back_an_open_transaction(hims_db):
+    conn, c = db.connection()
+    c.execute("INSERT INTO department_record (id, name, description, contact_number_1, address, email_id) "
+              "VALUES ('D-1', 'Left open', 'x', '0', 'x', 'open@hims.test')")
+    conn.close()
+    conn, c = db.connection()
+    try:
+        assert c.execute("SELECT COUNT(*) FROM department_record").fetchone()[0] == 0
+    finally:
+        conn.close()
+
+
+def test_threads_get_their_own_connections(hims_db):
+    seen = {}
+    barrier = threading.Barrier(4)
+
+    def worker(n):
+        conn = db.pool.acquire()
+        barrier.wait()  # All four hold a connection at once
+        seen[n] = conn._conn
+        conn.execute("SELECT 1")
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(conn) for conn in seen.values()}) == 4
+
+
+def test_idle_connections_are_bounded(hims_db):
+    pool = db.ConnectionPool(max_idle=2)
+    keys = iter(range(10))
+    pool.current_key = lambda: ('thread', next(keys))
+    held = [pool.acquire() for _ in range(5)]
+    for conn in held:
+        conn.close()
+    assert len(pool._idle) == 2
+    pool.close_all()
+
+
+def test_concurrent_acquires_of_one_key_keep_the_user_count(hims_db):
+    # Regression: _users was incremented outside the pool lock, so concurrent acquires of one key
+    # (threads serving the same session) lost counts and released connections still in use.
+    pool = db.ConnectionPool()
+    pool.current_key = lambda: ('session', 'shared')
+    connections = set()
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        for _ in range(500):
+            conn = pool.acquire()
+            conn.execute("SELECT 1")
+            connections.add(id(conn))
+            conn.close()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible
+    try:
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert len(connections) == 1
+    assert not pool._in_use and [conn._users for conn in pool._idle.values()] == [0]
+    pool.close_all()
+
+
+def test_a_connection_released_while_another_thread_connects_is_reused(hims_db):
+    # Regression: a thread that connected outside the lock only looked for its key among the
+    # connections in use. One another thread had meanwhile released to the idle list was shadowed
+    # by a second connection for the same key and leaked.
+    created = []
+
+    def factory():
+        conn = db.create_connection()
+        created.append(conn)
+        if len(created) == 1:  # While this thread connects, another acquires and releases
+            other = threading.Thread(target=lambda: pool.acquire().close())
+            other.start()
+            other.join()
+        return conn
+
+    pool = db.ConnectionPool(factory=factory)
+    pool.current_key = lambda: ('session', 'shared')
+    conn = pool.acquire()
+    assert conn._conn is created[1]
+    conn.close()
+    assert list(pool._idle.values()) == [conn] and not pool._in_use
+    pool.close_all()
@@ -0,0 +1,55 @@
+import json
+import sqlite3 as sql
+
+import pytest
+
+import database as db
+from benchmarks import datagen
+
+
+@pytest.fixture
+def generate(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, 'DATABASE_PATH', db.DATABASE_PATH)  # generate() points the data layer at its file
+
+    def generate(name, patients=200, **options):
+        path = str(tmp_path / name)
+        return path, datagen.generate(path, patients, **options)
+    return generate
+
+
+def _dump(path):
+    conn = sql.connect(path)
+    try:
+        return {table: conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall() for table in datagen.INSERTS}
+    finally:
+        conn.close()
+
+
+def test_the_same_seed_gives_the_same_rows_whatever_the_chunk_size(generate):
+    first, counts = generate('a.db', seed=7)
+    second, _ = generate('b.db', seed=7, chunk_size=37)
+    other, _ = generate('c.db', seed=8)
+    assert _dump(first) == _dump(second)
+    assert _dump(first) != _dump(other)
+    assert counts['patient_record'] == 200
+    assert {table: len(rows) for table, rows in _dump(first).items()} == counts
+    with open(first + '.json') as f:
+        assert json.load(f)['counts'] == counts
+
+
+def test_generated_rows_satisfy_the_schema(generate):
+    path, counts = generate('hims.db')
+    conn = sql.connect(path)
+    try:
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+        assert conn.execute("SELECT COUNT(*) FROM medical_test_record WHERE result_date_time < test_date_time "
+                            "OR substr(test_date_time, 5, 1) != '-'").fetchone()[0] == 0
+    finally:
+        conn.close()
+    assert counts['doctor_record'] >= 1 and counts['medical_test_record'] > 0
+
+
+def test_an_existing_file_is_never_overwritten(generate, tmp_path):
+    (tmp_path / 'hims.db').write_text('')
+    with pytest.raises(FileExistsError):
+        generate('hims.db')
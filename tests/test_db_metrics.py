@@ -0,0 +1,84 @@
+import json
+import sqlite3 as sql
+
+import pytest
+
+import database as db
+import db_metrics
+from db_metrics import Histogram
+
+
+@pytest.fixture
+def metrics(hims_db):
+    db_metrics.reset()
+    yield db_metrics
+    db_metrics.reset()
+
+
+def _stats(query):
+    return next(row for row in db_metrics.summary() if row['statement'] == db_metrics.normalise(query))
+
+
+def test_statements_are_labelled_without_their_whitespace_or_in_lists():
+    assert db_metrics.normalise("SELECT *\n    FROM t WHERE id IN (?, ?,?)") == "SELECT * FROM t WHERE id IN (?, ...)"
+
+
+def test_a_statement_is_counted_with_its_rows_once_they_are_fetched(metrics):
+    conn = db.create_connection()
+    query = "SELECT id FROM temp.t WHERE id > ?"
+    conn.execute("CREATE TEMP TABLE t (id TEXT)")
+    conn.execute("INSERT INTO temp.t VALUES ('a'), ('b')")
+    c = conn.cursor()
+    c.execute(query, ('',))
+    assert not any(row['statement'] == query for row in db_metrics.summary())  # Rows not fetched yet
+    assert len(c.fetchall()) == 2
+    assert (_stats(query)['calls'], _stats(query)['rows']) == (1, 2)
+    assert _stats("INSERT INTO temp.t VALUES ('a'), ('b')")['rows'] == 2
+    with pytest.raises(sql.OperationalError):
+        conn.execute("SELECT nothing FROM temp.t")
+    assert _stats("SELECT nothing FROM temp.t")['errors'] == 1
+    conn.close()
+
+
+def test_slow_statements_are_logged_with_their_plan_but_not_their_parameters(metrics, tmp_path, monkeypatch):
+    monkeypatch.setattr(db_metrics, 'SLOW_QUERY_MS', 0)
+    monkeypatch.setattr(db_metrics, 'SLOW_QUERY_LOG', str(tmp_path / 'slow.log'))
+    conn = db.create_connection()
+    conn.execute("SELECT name FROM patient_record WHERE id = ?", ('P-SECRET',)).fetchall()
+    conn.close()
+    log = (tmp_path / 'slow.log').read_text()
+    assert 'P-SECRET' not in log
+    entry = next(entry for entry in map(json.loads, log.splitlines())
+                 if entry['statement'] == "SELECT name FROM patient_record WHERE id = ?")
+    assert entry['rows'] == 0
+    assert any('patient_record' in step for step in entry['plan'])
+
+
+def test_histogram_quantiles_are_bucket_upper_bounds():
+    histogram = Histogram((1, 5, 10))
+    for value in (0.5, 2, 3, 4, 20):
+        histogram.observe(value)
+    assert (histogram.quantile(0.2), histogram.quantile(0.8), histogram.quantile(1)) == (1, 5, float('inf'))
+
+
+def test_metrics_render_in_prometheus_text_format(metrics):
+    conn = db.create_connection()
+    conn.execute('SELECT "quoted" FROM patient_record').fetchall()
+    conn.close()
+    db_metrics.cache_event('query', 'hit')
+    text = db_metrics.render()
+    assert 'hims_db_query_duration_seconds_count{statement="SELECT \\"quoted\\" FROM patient_record"} 1' in text
+    assert 'hims_cache_events_total{cache="query",result="hit"} 1' in text
+    assert text.endswith('\n')
+
+
+def test_the_counts_of_a_rerun_are_observed_when_the_next_one_starts(metrics):
+    conn = db.create_connection()
+    db_metrics.rerun_started()
+    for _ in range(3):
+        conn.execute("SELECT 1").fetchall()
+    conn.close()
+    db_metrics.rerun_started()
+    histogram = db_metrics._rerun_histograms['statements']
+    assert (histogram.count, histogram.sum) == (1, 3)
+    db_metrics._local.run = None
@@ -0,0 +1,76 @@
+import csv
+import io
+import sys
+
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+import pytest
+
+import export
+import repository
+from conftest import medical_test_data
+
+
+@pytest.fixture
+def test_ids(patient_id, doctor_id):
+    return [repository.medical_tests.create(medical_test_data(patient_id, doctor_id, test_name=f"Test {n}",
+                                                              test_date_time=f"2024-01-{n + 1:02d} 09:00",
+                                                              cost=100 * (n + 1)))
+            for n in range(7)]
+
+
+def test_csv_export_streams_every_row_in_batches(test_ids, tmp_path):
+    path = tmp_path / 'tests.csv'
+    count = export.export_table('medical_test_record', str(path), columns=['id', 'test_name', 'cost'], batch_size=3)
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert count == 7
+    assert rows[0] == ['id', 'test_name', 'cost']
+    assert sorted(row[0] for row in rows[1:]) == sorted(test_ids)
+
+
+def test_parquet_export_writes_one_row_group_per_batch(test_ids, tmp_path):
+    path = tmp_path / 'tests.parquet'
+    assert export.export_table('medical_test_record', str(path), 'parquet', ['id', 'cost'], batch_size=3) == 7
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert str(table.schema.field('cost').type) == 'int64'
+    assert sorted(table.column('cost').to_pylist()) == [100, 200, 300, 400, 500, 600, 700]
+
+
+def test_arrow_export_round_trips(test_ids):
+    out = io.BytesIO()
+    assert export.export_table('medical_test_record', out, 'arrow', ['id', 'test_name'], batch_size=2) == 7
+    table = pa_ipc.open_stream(out.getvalue()).read_all()
+    assert sorted(table.column('id').to_pylist()) == sorted(test_ids)
+
+
+def test_filters_and_date_ranges_select_rows(test_ids):
+    filters = export.date_range('test_date_time', '2024-01-02', '2024-01-04') + [('cost', '!=', 300)]
+    out = io.StringIO()
+    assert export.export_table('medical_test_record', out, columns=['cost'], filters=filters) == 2
+    assert out.getvalue().split() == ['cost', '200', '400']
+
+
+def test_unknown_tables_columns_and_operators_are_refused(test_ids):
+    with pytest.raises(ValueError, match="Unknown table"):
+        export.count_rows('sqlite_master')
+    with pytest.raises(ValueError, match="Unknown column"):
+        export.count_rows('medical_test_record', ['id; DROP TABLE patient_record'])
+    with pytest.raises(ValueError, match="Unsupported operator"):
+        export.count_rows('medical_test_record', filters=[('cost', 'or 1=1 --', 0)])
+
+
+def test_count_rows_stops_at_the_limit(test_ids):
+    assert export.count_rows('medical_test_record') == 7
+    assert export.count_rows('medical_test_record', limit=4) == 4
+
+
+def test_stdout_export_honours_the_format(test_ids, monkeypatch, capsysbinary):
+    monkeypatch.setattr(sys, 'argv', ['export.py', 'medical_test_record', '-', '--format', 'arrow',
+                                      '--columns', 'id,cost'])
+    export.main()
+    captured = capsysbinary.readouterr()
+    assert pa_ipc.open_stream(captured.out).read_all().num_rows == 7
+    assert b"Exported 7 rows" in captured.err
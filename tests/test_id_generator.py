@@ -0,0 +1,71 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+import id_generator
+from id_generator import IdGenerator
+
+
+def test_ids_are_unique_and_sorted_in_creation_order():
+    generator = IdGenerator(node=7)
+    ids = [generator.generate_id('P') for _ in range(5000)] + generator.generate_ids('P', 5000)
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert all(id_generator.is_generated(record_id) for record_id in ids)
+
+
+def test_threads_never_get_the_same_id():
+    generator = IdGenerator(node=1)
+    results = []
+
+    def worker():
+        results.extend(generator.generate_id('T') for _ in range(2000))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(results)) == 16000
+
+
+def test_clock_going_backwards_does_not_reuse_ids(monkeypatch):
+    generator = IdGenerator(node=3)
+    now = [1_700_000_000_000_000_000]
+    monkeypatch.setattr(id_generator.time, 'time_ns', lambda: now[0])
+    first = generator.generate_ids('M', 3)
+    now[0] -= 5_000_000_000  # Five seconds back
+    second = generator.generate_ids('M', 3)
+    assert first + second == sorted(first + second) and len(set(first + second)) == 6
+
+
+def test_sequence_overflow_moves_to_the_next_millisecond(monkeypatch):
+    generator = IdGenerator(node=3)
+    monkeypatch.setattr(id_generator.time, 'time_ns', lambda: 1_700_000_000_000_000_000)
+    values = generator.next_values(id_generator.MAX_SEQUENCE + 3)
+    assert values == sorted(values) and len(set(values)) == len(values)
+    assert values[-1] >> (id_generator.NODE_BITS + id_generator.SEQUENCE_BITS) == 1_700_000_000_001
+
+
+def test_id_timestamp_and_floor_bracket_the_creation_time():
+    before = datetime.now() - timedelta(milliseconds=1)
+    record_id = id_generator.generate_id('DR')
+    after = datetime.now() + timedelta(milliseconds=1)
+    assert before <= id_generator.id_timestamp(record_id) <= after
+    assert id_generator.id_floor('DR', before) <= record_id < id_generator.id_floor('DR', after)
+
+
+def test_is_generated_rejects_other_layouts():
+    assert not id_generator.is_generated('P-12345')
+    assert not id_generator.is_generated('P-01JAB3K9QZ-0G00')
+    assert not id_generator.is_generated('P-01JAB3K9QZ-0G00A-extra')
+
+
+def test_each_generator_leases_a_node_no_live_process_holds(tmp_path, monkeypatch):
+    monkeypatch.setattr(id_generator, 'NODE_LOCK_DIR', str(tmp_path))
+    first, second = IdGenerator(), IdGenerator()
+    first_id, second_id = first.generate_id('P'), second.generate_id('P')
+    assert first._node != second._node
+    assert first_id.split('-')[-1][:2] != second_id.split('-')[-1][:2]
+    for generator in (first, second):
+        os.close(generator._node_fd)
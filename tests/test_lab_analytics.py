@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import lab_analytics
+import repository
+from conftest import medical_test_data
+
+
+def _test(patient_id, doctor_id, day, minutes, **fields):
+    start = f"2024-02-{day:02d} 09:00"
+    end = f"2024-02-{day:02d} {9 + minutes // 60:02d}:{minutes % 60:02d}"
+    return repository.medical_tests.create(medical_test_data(patient_id, doctor_id, test_date_time=start,
+                                                             result_date_time=end, **fields))
+
+def _rollups():
+    return lab_analytics.turnaround('test_name').to_dict('records')
+
+
+@pytest.fixture
+def lab_tests(patient_id, doctor_id):
+    ids = [_test(patient_id, doctor_id, 1, minutes, result_and_diagnosis="Normal") for minutes in (30, 60, 90, 120)]
+    ids.append(_test(patient_id, doctor_id, 2, 45, result_and_diagnosis="Normal"))
+    ids.append(_test(patient_id, doctor_id, 2, 500))  # Still awaited: not counted
+    return ids
+
+
+def test_rollups_hold_counts_means_and_percentiles_per_day(lab_tests):
+    assert lab_analytics.refresh() == 2
+    first, second = _rollups()
+    assert (first['day'], first['tests'], first['mean_minutes'], first['p50_minutes']) == ('2024-02-01', 4, 75, 75)
+    assert first['p95_minutes'] == pytest.approx(115.5)
+    assert (second['day'], second['tests'], second['p99_minutes']) == ('2024-02-02', 1, 45)
+    assert set(lab_analytics.turnaround('doctor_id')['tests']) == {4, 1}
+
+
+def test_only_changed_days_are_recomputed(lab_tests):
+    lab_analytics.refresh()
+    assert lab_analytics.refresh() == 0 and lab_analytics.pending_days() == 0
+    repository.medical_tests.update(lab_tests[-1], {'result_and_diagnosis': "Normal"})
+    assert lab_analytics.pending_days() == 1
+    assert lab_analytics.refresh() == 1
+    assert [row['tests'] for row in _rollups()] == [4, 2]
+    incremental = _rollups()
+    assert lab_analytics.refresh(full=True) is None
+    assert _rollups() == incremental
+
+
+def test_a_day_left_without_results_is_refreshed(lab_tests):
+    # Regression: an empty frame made compute_rollups fail, before the changed days were cleared,
+    # so every later refresh failed the same way.
+    lab_analytics.refresh()
+    repository.medical_tests.delete(lab_tests[4])  # The only result of 2 February
+    assert lab_analytics.refresh() == 1
+    assert [row['day'] for row in _rollups()] == ['2024-02-01']
+    assert lab_analytics.refresh() == 0
+
+
+def test_an_empty_database_refreshes(hims_db):
+    assert lab_analytics.refresh() == 0
+    assert lab_analytics.refresh(full=True) is None
+    assert _rollups() == []
+
+
+def test_a_refresh_is_not_overwritten_by_an_older_one(lab_tests, monkeypatch):
+    # Regression: a refresh read the tests on its own connection and stored the rollups later, so a
+    # refresh that read before a change could overwrite the newer rollups of another session.
+    compute_rollups = lab_analytics.compute_rollups
+    calls = []
+
+    def change_and_refresh_meanwhile(frame):
+        calls.append(frame)
+        if len(calls) == 1:
+            other = threading.Thread(target=lambda: (
+                repository.medical_tests.update(lab_tests[0], {'result_date_time': '2024-02-01 17:00'}),
+                lab_analytics.refresh()))
+            other.start()
+            other.join(timeout=0.5)  # Blocks behind this refresh when refreshes are serialised
+            threads.append(other)
+        return compute_rollups(frame)
+
+    threads = []
+    monkeypatch.setattr(lab_analytics, 'compute_rollups', change_and_refresh_meanwhile)
+    lab_analytics.refresh()
+    threads[0].join()
+    lab_analytics.refresh()
+    latest = _rollups()
+    monkeypatch.setattr(lab_analytics, 'compute_rollups', compute_rollups)
+    lab_analytics.refresh(full=True)
+    assert latest == _rollups()
+    assert latest[0]['mean_minutes'] == (480 + 60 + 90 + 120) / 4
+
+
+def _dashboard_app():
+    import lab_analytics
+    lab_analytics.dashboard()
+
+
+def test_the_dashboard_refreshes_only_when_asked(lab_tests, monkeypatch):
+    refreshes = []
+    refresh = lab_analytics.refresh
+    monkeypatch.setattr(lab_analytics, 'refresh', lambda full=False: refreshes.append(full) or refresh(full))
+    app = AppTest.from_function(_dashboard_app)
+    app.run()
+    app.run()
+    assert refreshes == []
+    assert "2 day(s) changed" in app.caption[0].value
+    app.button[0].click().run()
+    assert refreshes == [False]
+    assert "Recomputed 2 day(s)" in app.success[0].value
@@ -0,0 +1,99 @@
+import os
+import sqlite3 as sql
+
+import pandas as pd
+import pytest
+
+import lab_ingest
+import repository
+from conftest import medical_test_data
+
+
+@pytest.fixture
+def test_ids(patient_id, doctor_id):
+    return [repository.medical_tests.create(medical_test_data(patient_id, doctor_id))
+            for _ in range(3)]
+
+
+def _result(test_id):
+    row = repository.medical_tests.as_dict(repository.medical_tests.get(test_id))
+    return row['result_and_diagnosis'], row['result_date_time']
+
+
+def _write_csv(path, rows):
+    pd.DataFrame(rows, columns=['test_id', 'result', 'result_date_time']).to_csv(path, index=False)
+    return str(path)
+
+
+def test_csv_results_are_applied_and_unknown_rows_reported(tmp_path, test_ids):
+    path = _write_csv(tmp_path / 'results.csv', [
+        (test_ids[0], 'Normal sinus rhythm', '2024-01-01 11:00'),
+        (test_ids[1], 'Left axis deviation', '02-01-2024 (08:15)'),
+        ('MT-UNKNOWN', 'Normal', '2024-01-01 11:00'),
+        (test_ids[2], '', '2024-01-01 11:00'),
+    ])
+    summary = lab_ingest.ingest_file(path, batch_size=2)
+    assert (summary['rows'], summary['updated'], summary['unchanged'], summary['unmatched']) == (4, 2, 0, 2)
+    assert _result(test_ids[0]) == ('Normal sinus rhythm', '2024-01-01 11:00')
+    assert _result(test_ids[1]) == ('Left axis deviation', '2024-01-02 08:15')
+    report = pd.read_csv(path + '.unmatched.csv', dtype=str, keep_default_na=False)
+    assert list(report['reason']) == ['unknown test ID', 'missing result']
+
+
+def test_replaying_a_file_changes_nothing(tmp_path, test_ids):
+    path = _write_csv(tmp_path / 'results.csv', [(test_id, 'Normal', '2024-01-01 11:00') for test_id in test_ids])
+    assert lab_ingest.ingest_file(path)['updated'] == 3
+    summary = lab_ingest.ingest_file(path)
+    assert (summary['updated'], summary['unchanged']) == (0, 3)
+    assert not os.path.exists(path + '.unmatched.csv')
+
+
+def test_the_last_result_for_a_test_wins(tmp_path, test_ids):
+    path = _write_csv(tmp_path / 'results.csv', [(test_ids[0], 'Preliminary', '2024-01-01 11:00'),
+                                                 (test_ids[0], 'Final', '2024-01-01 12:00')])
+    lab_ingest.ingest_file(path)
+    assert _result(test_ids[0]) == ('Final', '2024-01-01 12:00')
+
+
+def test_hl7_observations_are_joined_into_the_result(tmp_path, test_ids):
+    path = tmp_path / 'run.hl7'
+    path.write_text('\r'.join([
+        'MSH|^~\\&|ANALYSER|LAB|HIMS|HOSP|202401011200||ORU^R01|1|P|2.5',
+        f'OBR|1|{test_ids[0]}||ECG|||202401010900|||||||||||||||202401011130',
+        'OBX|1|NM|HR^Heart rate||72|bpm|60-100|N',
+        'OBX|2|ST|QT^QT interval||480|ms|350-450|H',
+        f'OBR|2||{test_ids[1]}|ECG',
+        'OBX|1|ST|RHY^Rhythm||Sinus|||||||||202401011145',
+    ]) + '\r')
+    summary = lab_ingest.ingest_file(str(path))
+    assert (summary['rows'], summary['updated']) == (2, 2)
+    assert _result(test_ids[0]) == ('Heart rate: 72 bpm (ref 60-100); QT interval: 480 ms (ref 350-450) [H]',
+                                    '2024-01-01 11:30')
+    assert _result(test_ids[1]) == ('Rhythm: Sinus', '2024-01-01 11:45')
+
+
+def test_watch_moves_files_by_outcome(tmp_path, test_ids):
+    _write_csv(tmp_path / 'good.csv', [(test_ids[0], 'Normal', '2024-01-01 11:00')])
+    (tmp_path / 'bad.csv').write_text("id,result\nMT-1,Normal\n")
+    summaries = []
+    lab_ingest.watch(str(tmp_path), settle_seconds=0, progress=summaries.append, once=True)
+    assert sorted(os.listdir(tmp_path / 'processed')) == ['good.csv']
+    assert sorted(os.listdir(tmp_path / 'failed')) == ['bad.csv']
+    assert len(summaries) == 2
+
+
+def test_watch_leaves_a_file_to_retry_after_a_database_error(tmp_path, test_ids, monkeypatch):
+    # Regression: a sqlite3.Error (e.g. a locked database) escaped watch() and stopped the watcher.
+    path = _write_csv(tmp_path / 'results.csv', [(test_ids[0], 'Normal', '2024-01-01 11:00')])
+
+    def locked(*args):
+        raise sql.OperationalError("database is locked")
+
+    summaries = []
+    monkeypatch.setattr(lab_ingest, 'ingest_file', locked)
+    lab_ingest.watch(str(tmp_path), settle_seconds=0, progress=summaries.append, once=True)
+    assert summaries == [{'file': path, 'error': "database is locked", 'retry': True}]
+    assert os.path.exists(path)
+    monkeypatch.undo()
+    lab_ingest.watch(str(tmp_path), settle_seconds=0, once=True)
+    assert _result(test_ids[0]) == ('Normal', '2024-01-01 11:00')
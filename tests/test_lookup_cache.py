@@ -0,0 +1,82 @@
+import database as db
+import lookup_cache
+import repository
+from conftest import patient_data
+from lookup_cache import LookupCache
+
+
+def test_values_are_loaded_once_and_then_hit():
+    cache, calls = LookupCache(), []
+    for _ in range(3):
+        assert cache.get_or_load(('name', 't', 1), lambda: calls.append(1) or 'Asha') == 'Asha'
+    assert len(calls) == 1
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (2, 1)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = LookupCache(maxsize=2)
+    cache.get_or_load(('name', 't', 1), lambda: 'a')
+    cache.get_or_load(('name', 't', 2), lambda: 'b')
+    cache.get_or_load(('name', 't', 1), lambda: 'reloaded')  # 1 is now the most recent
+    cache.get_or_load(('name', 't', 3), lambda: 'c')
+    assert cache.get_or_load(('name', 't', 1), lambda: 'reloaded') == 'a'
+    assert cache.get_or_load(('name', 't', 2), lambda: 'reloaded') == 'reloaded'
+    assert cache.stats()['evictions'] == 2
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(lookup_cache.time, 'monotonic', lambda: now[0])
+    cache = LookupCache(ttl=10)
+    cache.get_or_load(('name', 't', 1), lambda: 'old')
+    now[0] += 11
+    assert cache.get_or_load(('name', 't', 1), lambda: 'new') == 'new'
+
+
+def test_invalidate_drops_one_row_or_the_whole_table():
+    cache = LookupCache()
+    for key in [('name', 't', 1), ('exists', 't', 1), ('name', 't', 2), ('name', 'u', 1)]:
+        cache.get_or_load(key, lambda: 'cached')
+    cache.invalidate('t', 1)
+    assert cache.stats()['size'] == 2
+    cache.invalidate('t')
+    assert cache.stats()['size'] == 1
+
+
+def test_an_invalidation_during_a_load_is_not_lost():
+    # Regression: load() runs outside the lock, and a value read before a concurrent write was
+    # stored after that write had invalidated the key, so the stale value stayed until its TTL.
+    cache = LookupCache()
+
+    def load_then_write():
+        value = 'before the write'
+        cache.invalidate('t', 1)  # The write commits and invalidates while the load is running
+        return value
+
+    assert cache.get_or_load(('name', 't', 1), load_then_write) == 'before the write'
+    assert cache.get_or_load(('name', 't', 1), lambda: 'after the write') == 'after the write'
+
+
+def test_negative_results_are_not_cached(hims_db):
+    # Regression: "no such ID" was cached for the whole TTL, so a record created by another process
+    # stayed unknown to the forms for five minutes.
+    record = patient_data(id='P-LATER')
+    assert not lookup_cache.id_exists('patient_record', 'P-LATER')
+    assert lookup_cache.fetch_name('patient_record', 'P-LATER') is None
+    repository.patients.prepare(record, is_update=False)
+    conn = db.create_connection()
+    conn.execute(f"INSERT INTO patient_record ({', '.join(repository.patients.columns)}) "
+                 f"VALUES ({', '.join('?' * len(repository.patients.columns))})",
+                 [record.get(column) for column in repository.patients.columns])
+    conn.commit()
+    conn.close()
+    assert lookup_cache.id_exists('patient_record', 'P-LATER')
+    assert lookup_cache.fetch_name('patient_record', 'P-LATER') == record['name']
+
+
+def test_a_repository_delete_invalidates_the_row(hims_db, department_id):
+    assert lookup_cache.id_exists('department_record', department_id)
+    assert lookup_cache.fetch_name('department_record', department_id).startswith('Department')
+    repository.departments.delete(department_id)
+    assert not lookup_cache.id_exists('department_record', department_id)
+    assert lookup_cache.fetch_name('department_record', department_id) is None
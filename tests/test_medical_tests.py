@@ -0,0 +1,53 @@
+from datetime import date, datetime
+
+import pytest
+
+import repository
+from conftest import doctor_data, medical_test_data, patient_data
+from repository import ValidationError
+
+
+@pytest.fixture
+def tests_by_day(patient_id, doctor_id):
+    """Two tests a day from 1 to 5 March 2024, at 00:00 and 23:59."""
+    return [repository.medical_tests.create(medical_test_data(patient_id, doctor_id, test_date_time=f"2024-03-0{day} {t}",
+                                                              result_date_time=f"2024-03-0{day} {t}"))
+            for day in range(1, 6) for t in ('00:00', '23:59')]
+
+
+def _ids(rows):
+    return [row[0] for row in rows]
+
+
+def test_dates_are_stored_as_sortable_iso_text(hims_db, patient_id, doctor_id):
+    test_id = repository.medical_tests.create(medical_test_data(patient_id, doctor_id))
+    row = repository.medical_tests.as_dict(repository.medical_tests.get(test_id))
+    assert (row['test_date_time'], row['result_date_time']) == ('2024-01-01 09:00', '2024-01-01 10:30')
+    patient = repository.patients.as_dict(repository.patients.get(patient_id))
+    assert patient['date_of_registration'] == date.today().isoformat()
+
+
+def test_other_date_layouts_are_rejected(patient_id, doctor_id):
+    with pytest.raises(ValidationError, match='test_date_time'):
+        repository.medical_tests.create(medical_test_data(patient_id, doctor_id, test_date_time='01-01-2024 (09:00)'))
+
+
+def test_a_date_range_includes_the_whole_last_day(tests_by_day):
+    assert _ids(repository.medical_tests.in_range(date(2024, 3, 2), date(2024, 3, 3))) == tests_by_day[2:6]
+    assert _ids(repository.medical_tests.in_range(datetime(2024, 3, 2, 12), datetime(2024, 3, 4, 0, 0))) == \
+        tests_by_day[3:7]
+
+
+def test_a_range_can_be_narrowed_to_one_doctor(tests_by_day, patient_id, department_id):
+    other_doctor = repository.doctors.create(doctor_data(department_id))
+    other_patient = repository.patients.create(patient_data())
+    other = repository.medical_tests.create(medical_test_data(other_patient, other_doctor,
+                                                              test_date_time='2024-03-02 10:00'))
+    march = (date(2024, 3, 1), date(2024, 3, 31))
+    assert _ids(repository.medical_tests.in_range(*march, doctor_id=other_doctor)) == [other]
+    assert _ids(repository.medical_tests.in_range(*march, patient_id=patient_id)) == tests_by_day
+    assert len(repository.medical_tests.in_range(*march)) == 11
+    with pytest.raises(ValueError):
+        repository.medical_tests.in_range(*march, doctor_id=other_doctor, patient_id=patient_id)
+    with pytest.raises(ValueError):
+        repository.medical_tests.in_range(*march, cost=250)
@@ -0,0 +1,98 @@
+import sqlite3 as sql
+
+import pytest
+
+import migrations
+
+LATEST = migrations.MIGRATIONS[-1][0]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sql.connect(tmp_path / 'migrations.db')
+    yield conn
+    conn.close()
+
+def _versions(conn):
+    return [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+
+def _plan(conn, query, params=()):
+    return ' '.join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+
+
+def test_a_new_database_gets_every_migration_once(conn):
+    assert migrations.migrate(conn) == LATEST
+    assert _versions(conn) == [version for version, *_ in migrations.MIGRATIONS]
+    assert migrations.migrate(conn) == LATEST  # Re-running is a no-op
+    assert len(_versions(conn)) == len(migrations.MIGRATIONS)
+
+
+def test_migrate_stops_at_the_target_and_resumes_from_it(conn):
+    assert migrations.migrate(conn, target=2) == 2
+    assert _versions(conn) == [1, 2]
+    assert migrations.migrate(conn) == LATEST
+
+
+def test_a_failing_migration_is_rolled_back_and_not_recorded(conn, monkeypatch):
+    def broken(conn):
+        conn.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("boom")
+
+    migrations.migrate(conn)
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS + [(LATEST + 1, "Broken", broken, False)])
+    with pytest.raises(RuntimeError):
+        migrations.migrate(conn)
+    assert migrations.current_version(conn) == LATEST
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+
+
+def test_lookups_by_patient_and_doctor_use_indexes(conn):
+    migrations.migrate(conn)
+    assert 'idx_prescription_patient' in _plan(conn, "SELECT * FROM prescription_record WHERE patient_id = ?", ('P',))
+    assert 'idx_prescription_doctor' in _plan(conn, "SELECT * FROM prescription_record WHERE doctor_id = ?", ('D',))
+    assert 'idx_medical_test_patient_date' in _plan(conn, "SELECT * FROM medical_test_record WHERE patient_id = ?",
+                                                     ('P',))
+    assert 'idx_doctor_department' in _plan(conn, "SELECT * FROM doctor_record WHERE department_id = ?", ('D',))
+
+
+def test_legacy_medicine_columns_are_copied_into_items(conn):
+    migrations.migrate(conn, target=4)
+    conn.executemany(
+        "INSERT INTO prescription_record (id, patient_id, patient_name, doctor_id, doctor_name, diagnosis, "
+        "medicine_1_name, medicine_1_dosage_description, medicine_2_name, medicine_2_dosage_description, "
+        "medicine_3_name, medicine_3_dosage_description) VALUES (?, 'P', 'Ravi', 'D', 'Asha', 'Fever', ?, ?, ?, ?, ?, ?)",
+        [('M-1', 'Paracetamol', '500 mg', 'Cetirizine', '10 mg', None, None),
+         ('M-2', 'Ibuprofen', '400 mg', '', '', 'Saline', None)])
+    conn.commit()
+    migrations.migrate(conn, target=5)
+    conn.execute("INSERT INTO prescription_record (id, patient_id, patient_name, doctor_id, doctor_name, diagnosis, "
+                 "medicine_1_name, medicine_1_dosage_description) "
+                 "VALUES ('M-3', 'P', 'Ravi', 'D', 'Asha', 'Cold', 'Vitamin C', '1 daily')")  # An older app writing
+    conn.commit()
+    migrations.migrate(conn, target=6)
+    assert conn.execute("SELECT * FROM prescription_item ORDER BY prescription_id, position").fetchall() == [
+        ('M-1', 1, 'Paracetamol', '500 mg'), ('M-1', 2, 'Cetirizine', '10 mg'),
+        ('M-2', 1, 'Ibuprofen', '400 mg'), ('M-2', 3, 'Saline', None),
+        ('M-3', 1, 'Vitamin C', '1 daily')]
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(prescription_record)")]
+    assert not [column for column in columns if column.startswith('medicine_')]
+
+
+def test_legacy_dates_are_converted_to_iso(conn):
+    migrations.migrate(conn, target=6)
+    conn.execute("INSERT INTO medical_test_record (id, test_name, patient_id, patient_name, doctor_id, doctor_name, "
+                 "medical_lab_scientist_id, test_date_time, result_date_time, cost) "
+                 "VALUES ('T-1', 'ECG', 'P', 'Ravi', 'D', 'Asha', 'MLS', '28-02-2024 (23:45)', '01-03-2024 (08:05)', 250)")
+    conn.execute("INSERT INTO patient_record (id, name, age, gender, date_of_birth, blood_group, contact_number_1, "
+                 "aadhar_or_voter_id, weight, height, address, city, state, pin_code, next_of_kin_name, "
+                 "next_of_kin_relation_to_patient, next_of_kin_contact_number, date_of_registration, time_of_registration) "
+                 "VALUES ('P', 'Ravi', 33, 'Male', '15-08-1990', 'A+', '1', 'A', 0, 0, '', '', '', '', '', '', '', "
+                 "'05-01-2024', '10:00:00')")
+    conn.commit()
+    migrations.migrate(conn, target=8)
+    assert conn.execute("SELECT test_date_time, result_date_time FROM medical_test_record").fetchone() == \
+        ('2024-02-28 23:45', '2024-03-01 08:05')
+    assert conn.execute("SELECT date_of_birth, date_of_registration FROM patient_record").fetchone() == \
+        ('15-08-1990', '2024-01-05')
+    assert 'idx_medical_test_doctor_date' in _plan(
+        conn, "SELECT * FROM medical_test_record WHERE doctor_id = ? AND test_date_time BETWEEN ? AND ?", ('D', 'a', 'b'))
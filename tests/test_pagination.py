@@ -0,0 +1,65 @@
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import database as db
+import pagination
+import repository
+from conftest import patient_data
+
+
+@pytest.fixture
+def patient_ids(hims_db):
+    return sorted(repository.patients.create(patient_data()) for _ in range(25))
+
+
+def test_pages_follow_each_other_in_id_order(patient_ids):
+    pages, after_id = [], None
+    while True:
+        page = pagination.fetch_page('patient_record', after_id, page_size=10)
+        if not page:
+            break
+        pages.append([row[0] for row in page])
+        after_id = page[-1][0]
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert sum(pages, []) == patient_ids
+
+
+def test_has_rows_after(patient_ids):
+    assert pagination.has_rows_after('patient_record', patient_ids[-2])
+    assert not pagination.has_rows_after('patient_record', patient_ids[-1])
+
+
+def test_row_count_is_cached_until_a_write(patient_ids):
+    assert pagination.count_rows('patient_record') == 25
+    conn = db.create_connection()
+    conn.execute("DELETE FROM patient_record WHERE id = ?", (patient_ids[0],))
+    conn.commit()
+    conn.close()
+    assert pagination.count_rows('patient_record') == 25  # Written behind the repository's back
+    repository.patients.create(patient_data())
+    assert pagination.count_rows('patient_record') == 25  # One deleted, one created
+
+
+def _paginated_app():
+    import streamlit as st
+    import pagination
+    pagination.show_paginated('patient_record', lambda rows: st.text(','.join(row[0] for row in rows)), 'patients')
+
+
+def test_next_and_previous_buttons_move_between_pages(patient_ids, monkeypatch):
+    monkeypatch.setattr(pagination, 'PAGE_SIZES', [10, 25])
+    app = AppTest.from_function(_paginated_app)
+    app.run()
+    assert app.selectbox(key='patients_page_size').value == 25
+    assert app.text[0].value.split(',') == patient_ids
+    assert app.button(key='patients_next').disabled
+
+    app.selectbox(key='patients_page_size').set_value(10).run()
+    assert app.text[0].value.split(',') == patient_ids[:10]
+    app.button(key='patients_next').click().run()
+    assert app.text[0].value.split(',') == patient_ids[10:20]
+    app.button(key='patients_next').click().run()
+    assert app.text[0].value.split(',') == patient_ids[20:]
+    assert app.button(key='patients_next').disabled
+    app.button(key='patients_prev').click().run()
+    assert app.text[0].value.split(',') == patient_ids[10:20]
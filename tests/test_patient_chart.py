@@ -0,0 +1,58 @@
+import pytest
+
+import patient_chart
+import repository
+from conftest import medical_test_data, patient_data
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Counts the charts read from the database."""
+    calls = []
+    load_chart = patient_chart.load_chart
+    monkeypatch.setattr(patient_chart, 'load_chart', lambda patient_id: calls.append(patient_id) or load_chart(patient_id))
+    return calls
+
+def _test_ids(patient_id):
+    return [row[0] for row in patient_chart.get_chart(patient_id)['medical_tests']]
+
+
+def test_a_chart_holds_the_patient_prescriptions_and_newest_tests_first(patient_id, doctor_id):
+    older = repository.medical_tests.create(medical_test_data(patient_id, doctor_id, test_date_time='2024-01-01 09:00'))
+    newer = repository.medical_tests.create(medical_test_data(patient_id, doctor_id, test_date_time='2024-02-01 09:00'))
+    prescription_id = repository.prescriptions.create({'patient_id': patient_id, 'doctor_id': doctor_id,
+                                                       'diagnosis': "Viral fever", 'medicines': [('Paracetamol', None)]})
+    chart = patient_chart.get_chart(patient_id)
+    assert chart['patient'][0] == patient_id
+    assert [row[0] for row in chart['prescriptions']] == [prescription_id]
+    assert _test_ids(patient_id) == [newer, older]
+    assert patient_chart.get_chart('P-UNKNOWN') is None
+
+
+def test_charts_are_cached_until_a_write_changes_them(patient_id, doctor_id, loads):
+    patient_chart.get_chart(patient_id)
+    patient_chart.get_chart(patient_id)
+    assert loads == [patient_id]
+    test_id = repository.medical_tests.create(medical_test_data(patient_id, doctor_id))
+    assert _test_ids(patient_id) == [test_id] and len(loads) == 2
+    repository.patients.update(patient_id, {'city': 'Wardha'})
+    assert repository.patients.as_dict(patient_chart.get_chart(patient_id)['patient'])['city'] == 'Wardha'
+    assert len(loads) == 3
+
+
+def test_a_record_moved_to_another_patient_leaves_both_charts_correct(patient_id, doctor_id):
+    other = repository.patients.create(patient_data())
+    test_id = repository.medical_tests.create(medical_test_data(patient_id, doctor_id))
+    assert _test_ids(patient_id) == [test_id] and _test_ids(other) == []
+    repository.medical_tests.update(test_id, {'patient_id': other})
+    assert _test_ids(patient_id) == [] and _test_ids(other) == [test_id]
+    repository.medical_tests.delete(test_id)
+    assert _test_ids(other) == []
+
+
+def test_a_deleted_prescription_leaves_the_chart(patient_id, doctor_id):
+    prescription_id = repository.prescriptions.create({'patient_id': patient_id, 'doctor_id': doctor_id,
+                                                       'diagnosis': "Viral fever", 'medicines': [('Paracetamol', None)]})
+    assert len(patient_chart.get_chart(patient_id)['prescriptions']) == 1
+    repository.prescriptions.delete(prescription_id)
+    assert patient_chart.get_chart(patient_id)['prescriptions'] == []
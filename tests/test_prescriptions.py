@@ -0,0 +1,57 @@
+import pytest
+
+import database as db
+import repository
+from repository import ValidationError
+
+
+def _items(prescription_id):
+    conn, c = db.connection()
+    try:
+        return c.execute("SELECT position, medicine_name, dosage_description FROM prescription_item "
+                         "WHERE prescription_id = ? ORDER BY position", (prescription_id,)).fetchall()
+    finally:
+        conn.close()
+
+def _prescription(patient_id, doctor_id, medicines, **fields):
+    return dict({'patient_id': patient_id, 'doctor_id': doctor_id, 'diagnosis': 'Viral fever',
+                 'medicines': medicines}, **fields)
+
+
+def test_any_number_of_medicines_is_kept_in_order(patient_id, doctor_id):
+    medicines = [(f"Medicine {n}", f"{n} tablet(s) daily") for n in range(1, 6)] + [('Saline', None)]
+    prescription_id = repository.prescriptions.create(_prescription(patient_id, doctor_id, medicines))
+    assert _items(prescription_id) == [(n, name, dosage) for n, (name, dosage) in enumerate(medicines, start=1)]
+    row = repository.prescriptions.as_dict(repository.prescriptions.get(prescription_id))
+    assert row['medicines'].startswith("Medicine 1 - 1 tablet(s) daily; Medicine 2")
+    assert row['medicines'].endswith("; Saline - ")
+
+
+def test_updating_medicines_replaces_the_items(patient_id, doctor_id):
+    prescription_id = repository.prescriptions.create(
+        _prescription(patient_id, doctor_id, [('Paracetamol', '500 mg'), ('Cetirizine', '10 mg')]))
+    repository.prescriptions.update(prescription_id, {'medicines': [('Ibuprofen', '400 mg')]})
+    assert _items(prescription_id) == [(1, 'Ibuprofen', '400 mg')]
+    repository.prescriptions.update(prescription_id, {'comments': "Review in a week"})
+    assert _items(prescription_id) == [(1, 'Ibuprofen', '400 mg')]  # Untouched without 'medicines'
+
+
+def test_prescriptions_are_found_by_any_of_their_medicines(patient_id, doctor_id):
+    first = repository.prescriptions.create(_prescription(patient_id, doctor_id, [('Paracetamol', '500 mg')]))
+    second = repository.prescriptions.create(
+        _prescription(patient_id, doctor_id, [('Cetirizine', '10 mg'), ('paracetamol', '650 mg')]))
+    repository.prescriptions.create(_prescription(patient_id, doctor_id, [('Ibuprofen', '400 mg')]))
+    assert sorted(row[0] for row in repository.prescriptions.by_medicine('PARACETAMOL')) == sorted([first, second])
+
+
+def test_deleting_a_prescription_deletes_its_items(patient_id, doctor_id):
+    prescription_id = repository.prescriptions.create(_prescription(patient_id, doctor_id, [('Paracetamol', None)]))
+    repository.prescriptions.delete(prescription_id)
+    assert _items(prescription_id) == []
+
+
+@pytest.mark.parametrize('medicines', [None, [], 'Paracetamol', [('Paracetamol',)], [('', '500 mg')],
+                                       [('Paracetamol', 500)], [{'name': 'Paracetamol'}]])
+def test_invalid_medicines_are_rejected(patient_id, doctor_id, medicines):
+    with pytest.raises(ValidationError):
+        repository.prescriptions.create(_prescription(patient_id, doctor_id, medicines))
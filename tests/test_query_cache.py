@@ -0,0 +1,44 @@
+import query_cache
+import repository
+from conftest import patient_data
+from query_cache import QueryCache
+
+QUERY = "SELECT id, name FROM patient_record ORDER BY id"
+
+
+def test_rows_are_served_from_the_cache_until_a_table_they_read_is_written(patient_id):
+    cache = QueryCache()
+    rows = cache.fetchall(QUERY)
+    assert cache.fetchall(QUERY) is rows
+    repository.patients.create(patient_data())
+    assert len(cache.fetchall(QUERY)) == len(rows) + 1
+    assert (cache.stats()['hits'], cache.stats()['misses'], cache.stats()['invalidations']) == (1, 2, 1)
+
+
+def test_a_write_to_a_table_a_view_reads_changes_the_view():
+    assert query_cache.tables_of("SELECT * FROM prescription_view WHERE id = ?") == (
+        'doctor_record', 'patient_record', 'prescription_record')
+
+
+def test_the_frame_of_cached_rows_is_reused_across_reruns(patient_id):
+    cache = QueryCache()
+    first = cache.frame(cache.fetchall(QUERY), ['ID', 'Name'])
+    assert cache.frame(cache.fetchall(QUERY), ['ID', 'Name']) is first
+    assert (cache.stats()['frame_hits'], cache.stats()['frame_misses']) == (1, 1)
+    repository.patients.update(patient_id, {'city': 'Pune'})
+    assert cache.frame(cache.fetchall(QUERY), ['ID', 'Name']) is not first
+
+
+def test_rows_not_from_the_cache_get_a_new_frame():
+    cache = QueryCache()
+    rows = [('P-1', 'Asha')]
+    assert list(cache.frame(rows, ['ID', 'Name'])['Name']) == ['Asha']
+    assert cache.frame(rows, ['ID', 'Name']) is not cache.frame(rows, ['ID', 'Name'])
+
+
+def test_least_recently_used_entries_are_evicted_over_the_byte_budget(patient_id):
+    cache = QueryCache(max_bytes=4 * query_cache._size_of(QueryCache().fetchall(QUERY)) + 1)
+    for limit in range(1, 10):
+        cache.fetchall(QUERY + f" LIMIT {limit}")
+    assert cache.stats()['evictions'] > 0
+    assert cache.stats()['bytes'] <= cache.max_bytes
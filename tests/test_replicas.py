@@ -0,0 +1,86 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import database as db
+import pagination
+import repository
+from conftest import department_data, patient_data
+from query_cache import QueryCache
+
+
+@pytest.fixture(params=['snapshot', 'read_your_writes'])
+def replicas(request, hims_db, tmp_path, monkeypatch):
+    """A ReplicaSet serving this test's reads, refreshed only when the test calls refresh()."""
+    replica_set = db.ReplicaSet(directory=str(tmp_path / 'replicas'), interval=3600, consistency=request.param)
+    monkeypatch.setattr(replica_set, '_ensure_started', lambda: None)
+    monkeypatch.setattr(db, 'replicas', replica_set)
+    replica_set.refresh()
+    yield replica_set
+    replica_set.close()
+
+
+def _read_ids(reader=None):
+    conn, c = db.read_connection(reader)
+    try:
+        return {row[0] for row in c.execute("SELECT id FROM patient_record")}
+    finally:
+        conn.close()
+
+def _in_another_thread(fn, *args):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(fn, *args).result()
+
+
+def test_other_callers_read_the_snapshot_until_it_is_refreshed(replicas):
+    patient_id = repository.patients.create(patient_data())
+    assert patient_id not in _in_another_thread(_read_ids)
+    assert _in_another_thread(db.read_generation) == 1
+    replicas.refresh()
+    assert patient_id in _in_another_thread(_read_ids)
+    assert _in_another_thread(db.read_generation) == 2
+
+
+def test_a_writer_reads_its_own_write_only_with_read_your_writes(replicas):
+    patient_id = repository.patients.create(patient_data())
+    assert (patient_id in _read_ids()) == (replicas.consistency == 'read_your_writes')
+    replicas.refresh()
+    assert patient_id in _read_ids()
+    assert db.read_generation() == 2  # Back on the snapshot once it holds the write
+
+
+def test_cached_results_are_read_again_from_a_new_snapshot(replicas):
+    cache = QueryCache()
+    query = "SELECT id FROM patient_record"
+    _in_another_thread(cache.fetchall, query)
+    repository.departments.create(department_data())  # A write to a table the query does not read
+    _in_another_thread(cache.fetchall, query)
+    assert cache.stats()['misses'] == 1
+    replicas.refresh()
+    _in_another_thread(cache.fetchall, query)
+    assert cache.stats()['misses'] == 2
+
+
+@pytest.mark.parametrize('replicas', ['read_your_writes'], indirect=True)
+def test_the_write_is_recorded_before_the_writer_is_woken(replicas, monkeypatch):
+    # Regression: the write was recorded in a done callback, which runs after result() has
+    # returned, so the writer's next read could still come from the snapshot without its write.
+    note_write = replicas.note_write
+
+    def slow_note_write(key):
+        time.sleep(0.2)
+        note_write(key)
+
+    monkeypatch.setattr(replicas, 'note_write', slow_note_write)
+    patient_id = repository.patients.create(patient_data())
+    assert patient_id in _read_ids()
+
+
+@pytest.mark.parametrize('replicas', ['read_your_writes'], indirect=True)
+def test_a_page_prefetched_for_a_session_reads_its_writes(replicas):
+    # Regression: the prefetch thread read as itself, so it got the snapshot from before the
+    # session's write.
+    patient_id = repository.patients.create(patient_data())
+    page = _in_another_thread(pagination.fetch_page, 'patient_record', None, 50, QueryCache(), db.pool.current_key())
+    assert patient_id in {row[0] for row in page}
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+import repository
+import revenue
+from conftest import department_data, doctor_data, medical_test_data
+
+
+def _tests(patient_id, doctor_id, *tests):
+    return [repository.medical_tests.create(medical_test_data(patient_id, doctor_id, test_date_time=f"{when} 09:00",
+                                                              result_date_time=f"{when} 10:00", cost=cost))
+            for when, cost in tests]
+
+def _summary_equals_a_full_scan():
+    """The trigger-maintained summary holds what a GROUP BY over the tests would give."""
+    by_month = revenue.revenue(('doctor', 'month'))
+    rows = [(t['doctor_id'], t['test_date_time'][:7], t['cost']) for t in
+            map(repository.medical_tests.as_dict, repository.medical_tests.list(limit=repository.MAX_LIMIT))]
+    expected = pd.DataFrame(rows, columns=['doctor', 'month', 'cost']).groupby(['doctor', 'month'])['cost'].agg(
+        ['count', 'sum']).reset_index().values.tolist()
+    return by_month[["Doctor ID", "Month (YYYY-MM)", "Tests", "Revenue (INR)"]].values.tolist() == expected
+
+
+@pytest.fixture
+def two_doctors(department_id):
+    other_department = repository.departments.create(department_data())
+    return (repository.doctors.create(doctor_data(department_id)),
+            repository.doctors.create(doctor_data(other_department)))
+
+
+def test_revenue_is_grouped_by_department_doctor_and_month(patient_id, two_doctors):
+    first, second = two_doctors
+    _tests(patient_id, first, ('2024-01-05', 100), ('2024-01-20', 200), ('2024-02-01', 300))
+    _tests(patient_id, second, ('2024-02-10', 1000))
+    by_month = revenue.revenue(('month',))
+    assert by_month.values.tolist() == [['2024-01', 2, 300], ['2024-02', 2, 1300]]
+    by_doctor = revenue.revenue(('doctor',), start_month='2024-02')
+    assert by_doctor[["Doctor ID", "Tests", "Revenue (INR)"]].values.tolist() == sorted([[first, 1, 300],
+                                                                                         [second, 1, 1000]])
+    assert revenue.revenue(('department', 'month'), doctor_id=second)["Revenue (INR)"].tolist() == [1000]
+    assert _summary_equals_a_full_scan()
+
+
+def test_updates_and_deletes_move_the_revenue(patient_id, two_doctors):
+    first, second = two_doctors
+    january, february = _tests(patient_id, first, ('2024-01-05', 100), ('2024-02-01', 300))
+    repository.medical_tests.update(january, {'cost': 150, 'test_date_time': '2024-03-01 09:00'})
+    repository.medical_tests.update(february, {'doctor_id': second})
+    assert revenue.revenue(('month',)).values.tolist() == [['2024-02', 1, 300], ['2024-03', 1, 150]]
+    repository.medical_tests.delete(february)
+    assert revenue.revenue(('month',)).values.tolist() == [['2024-03', 1, 150]]
+    assert _summary_equals_a_full_scan()
+
+
+def test_a_doctor_moving_department_takes_the_revenue_along(patient_id, two_doctors, department_id):
+    first, second = two_doctors
+    _tests(patient_id, first, ('2024-01-05', 100))
+    _tests(patient_id, second, ('2024-01-06', 200))
+    repository.doctors.update(second, {'department_id': department_id})
+    by_department = revenue.revenue(('department',))
+    assert by_department[["Department ID", "Tests", "Revenue (INR)"]].values.tolist() == [[department_id, 2, 300]]
+
+
+def test_unknown_groupings_are_rejected(hims_db):
+    with pytest.raises(ValueError):
+        revenue.revenue(('patient',))
@@ -0,0 +1,106 @@
+import pandas as pd
+
+import bulk_import
+import database as db
+import migrations
+import repository
+import search
+from conftest import patient_data
+
+
+def _ids(rows):
+    return [row[0] for row in rows]
+
+def _integrity_check(index_name):
+    conn = db.create_connection()
+    try:
+        conn.execute(f"INSERT INTO {index_name} ({index_name}) VALUES ('integrity-check')")
+    finally:
+        conn.close()
+
+
+def test_fts_query_prefix_matches_every_word():
+    assert search.fts_query('ram pu') == '"ram"* "pu"*'
+    assert search.fts_query('"; DROP TABLE x') == '"DROP"* "TABLE"* "x"*'
+    assert search.fts_query(' -- ') is None
+
+
+def test_every_word_is_matched_as_a_prefix(hims_db):
+    ramesh = repository.patients.create(patient_data(name="Ramesh Patil", city='Pune'))
+    repository.patients.create(patient_data(name="Ramesh Rao", city='Nashik'))
+    repository.patients.create(patient_data(name="Ganesh Patil", city='Pune'))
+    assert _ids(repository.patients.search('ram pu')) == [ramesh]
+    assert len(repository.patients.search('rames')) == 2
+    assert repository.patients.search('') == []
+
+
+def test_better_matches_come_first_and_limit_keeps_the_best(hims_db):
+    weak = [repository.patients.create(patient_data(name=f"Anil Joshi Deshmukh {n}")) for n in range(5)]
+    strong = repository.patients.create(patient_data(name="Joshi", city='Joshimath'))
+    assert _ids(repository.patients.search('joshi', limit=1)) == [strong]
+    assert set(_ids(repository.patients.search('joshi'))) == set(weak) | {strong}
+
+
+def test_the_best_match_is_found_behind_many_weaker_ones(hims_db, tmp_path):
+    # Regression: only the first 1000 matches (by rowid) were ranked, so a better match inserted
+    # after them was never returned.
+    source = tmp_path / 'patients.csv'
+    pd.DataFrame([patient_data(name=f"Anil Joshi Deshmukh {n}") for n in range(1200)]).to_csv(source, index=False)
+    bulk_import.import_file('patient_record', str(source))
+    strong = repository.patients.create(patient_data(name="Joshi", city='Joshimath'))
+    assert _ids(repository.patients.search('joshi', limit=1)) == [strong]
+
+
+def test_the_index_follows_updates_and_deletes(hims_db):
+    patient_id = repository.patients.create(patient_data(name="Kavita Shinde", city='Satara'))
+    repository.patients.update(patient_id, {'city': 'Wardha'})
+    assert repository.patients.search('satara') == []
+    assert _ids(repository.patients.search('kavita wardha')) == [patient_id]
+    repository.patients.delete(patient_id)
+    assert repository.patients.search('kavita') == []
+    _integrity_check('patient_search')
+
+
+def test_doctor_results_use_the_view_layout(hims_db, doctor_id):
+    row = repository.doctors.search('cardio')[0]
+    assert row[0] == doctor_id
+    assert len(row) == len(repository.doctors.fields)
+
+
+def test_results_stay_correct_after_vacuum(hims_db):
+    # The index is keyed on its own key table, not on the rowids VACUUM is allowed to renumber
+    ids = [repository.patients.create(patient_data(name=f"Vacuum Patient {n}x")) for n in range(20)]
+    for patient_id in ids[:10]:
+        repository.patients.delete(patient_id)
+    db.pool.close_all()
+    conn = db.create_connection()
+    conn.execute("VACUUM")
+    conn.close()
+    for n, patient_id in enumerate(ids[10:], start=10):
+        assert _ids(search.search_patients(f"{n}x")) == [patient_id]
+    _integrity_check('patient_search')
+
+
+def test_bulk_import_indexes_its_rows_and_restores_the_triggers(hims_db, tmp_path):
+    source = tmp_path / 'patients.csv'
+    pd.DataFrame([patient_data(name=f"Imported Zubin {n}") for n in range(5)]).to_csv(source, index=False)
+    bulk_import.import_file('patient_record', str(source), chunk_size=2)
+    assert len(repository.patients.search('zubin')) == 5
+    _integrity_check('patient_search')
+    patient_id = repository.patients.create(patient_data(name="Zubin After"))  # Triggers are back
+    assert _ids(repository.patients.search('zubin after')) == [patient_id]
+
+
+def test_suspend_and_resume_index_only_the_new_rows(hims_db):
+    patient_id = repository.patients.create(patient_data(name="Before Yusuf"))
+    conn = db.create_connection()
+    last_rowid = migrations.suspend_search_index(conn, 'patient_record')
+    conn.execute("CREATE TEMP TABLE copy AS SELECT * FROM patient_record WHERE id = ?", (patient_id,))
+    conn.execute("UPDATE copy SET id = 'P-SUSPENDED', name = 'During Yusuf', aadhar_or_voter_id = 'P-SUSPENDED'")
+    conn.execute("INSERT INTO patient_record SELECT * FROM copy")
+    assert conn.execute("SELECT COUNT(*) FROM patient_search WHERE patient_search MATCH 'yusuf'").fetchone()[0] == 1
+    migrations.resume_search_index(conn, 'patient_record', last_rowid)
+    conn.commit()
+    conn.close()
+    assert len(search.search_patients('yusuf')) == 2
+    _integrity_check('patient_search')
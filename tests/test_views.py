@@ -0,0 +1,40 @@
+import database as db
+import repository
+from conftest import department_data, medical_test_data
+
+
+def _rename(table_name, record_id, name):
+    """Renames a record directly in the database, as a data fix would."""
+    db.execute_write(f"UPDATE {table_name} SET name = ? WHERE id = ?", (name, record_id))
+    repository.REPOSITORIES[table_name.replace('_record', 's')].invalidate(record_id, None)
+
+
+def test_doctors_show_their_current_department(doctor_id, department_id):
+    doctor = repository.doctors.as_dict(repository.doctors.get(doctor_id))
+    assert doctor['department_name'] == repository.departments.as_dict(repository.departments.get(department_id))['name']
+    radiology = repository.departments.create(department_data(name="Radiology"))
+    repository.doctors.update(doctor_id, {'department_id': radiology})
+    assert repository.doctors.as_dict(repository.doctors.get(doctor_id))['department_name'] == "Radiology"
+    _rename('department_record', radiology, "Imaging")
+    assert repository.doctors.as_dict(repository.doctors.get(doctor_id))['department_name'] == "Imaging"
+
+
+def test_renamed_patients_and_doctors_show_in_their_records(patient_id, doctor_id):
+    test_id = repository.medical_tests.create(medical_test_data(patient_id, doctor_id))
+    prescription_id = repository.prescriptions.create({'patient_id': patient_id, 'doctor_id': doctor_id,
+                                                       'diagnosis': "Viral fever", 'medicines': [('Paracetamol', None)]})
+    _rename('patient_record', patient_id, "Ravi Shankar")
+    _rename('doctor_record', doctor_id, "Dr. Asha Rao")
+    for record in (repository.medical_tests.as_dict(repository.medical_tests.get(test_id)),
+                   repository.prescriptions.as_dict(repository.prescriptions.get(prescription_id))):
+        assert (record['patient_name'], record['doctor_name']) == ("Ravi Shankar", "Dr. Asha Rao")
+
+
+def test_the_name_copies_are_gone(hims_db):
+    conn, c = db.connection()
+    try:
+        for table_name in ('prescription_record', 'medical_test_record', 'doctor_record'):
+            columns = [row[1] for row in c.execute(f"PRAGMA table_info({table_name})")]
+            assert not {'patient_name', 'doctor_name', 'department_name'} & set(columns)
+    finally:
+        conn.close()
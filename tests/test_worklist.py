@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database as db
+import repository
+import worklist
+from conftest import medical_test_data, patient_data
+
+AWAITED = "Test result awaited"
+
+
+def _pending(doctor_id):
+    conn, c = db.connection()
+    try:
+        return c.execute("SELECT test_id FROM pending_result WHERE doctor_id = ? ORDER BY test_date_time",
+                         (doctor_id,)).fetchall()
+    finally:
+        conn.close()
+
+def _minutes_ago(minutes):
+    return (datetime.now() - timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M')
+
+def _prescription(patient_id, doctor_id, **fields):
+    return dict({'patient_id': patient_id, 'doctor_id': doctor_id, 'diagnosis': 'Viral fever',
+                 'medicines': [('Paracetamol', '1 tablet')]}, **fields)
+
+
+def test_pending_results_follow_the_tests(patient_id, doctor_id):
+    later = repository.medical_tests.create(medical_test_data(patient_id, doctor_id, test_date_time='2024-01-02 09:00',
+                                                              result_and_diagnosis=AWAITED))
+    earlier = repository.medical_tests.create(medical_test_data(patient_id, doctor_id, result_and_diagnosis=AWAITED))
+    repository.medical_tests.create(medical_test_data(patient_id, doctor_id, result_and_diagnosis='Normal'))
+    assert _pending(doctor_id) == [(earlier,), (later,)]
+    repository.medical_tests.update(earlier, {'result_and_diagnosis': 'Normal'})
+    repository.medical_tests.delete(later)
+    assert _pending(doctor_id) == []
+
+
+def test_the_worklist_lists_pending_tests_longest_waiting_first(patient_id, doctor_id):
+    tests = [repository.medical_tests.create(medical_test_data(patient_id, doctor_id, result_and_diagnosis=AWAITED,
+                                                               test_date_time=f'2024-01-0{day} 09:00'))
+             for day in (3, 1, 2)]
+    result = worklist.load_worklist(doctor_id, limit=2)
+    assert result['pending_count'] == 3
+    assert [row[0] for row in result['pending_tests']] == [tests[1], tests[2]]
+
+
+def test_recent_patients_and_prescriptions_are_bounded_by_the_window(patient_id, doctor_id):
+    other_patient = repository.patients.create(patient_data())
+    repository.medical_tests.create(medical_test_data(patient_id, doctor_id, test_date_time=_minutes_ago(60),
+                                                      result_date_time=_minutes_ago(30)))
+    repository.medical_tests.create(medical_test_data(other_patient, doctor_id, test_date_time=_minutes_ago(-60 * 24),
+                                                      result_date_time=_minutes_ago(-60 * 25)))
+    prescription_id = repository.prescriptions.create(_prescription(patient_id, doctor_id))
+    result = worklist.load_worklist(doctor_id, days=1)
+    assert [row[0] for row in result['prescriptions']] == [prescription_id]
+    assert [row[0] for row in result['patients']] == [patient_id]
+    assert result['patients'][0][4:] == [1, 1]
+
+
+@pytest.mark.parametrize('imported_id', ['M-123456-240101', 'M-ZZZZZZZZZZ-ZZZZZ', 'M-zz-imported'])
+def test_prescription_ids_without_a_creation_time_in_the_window_are_left_out(patient_id, doctor_id, imported_id):
+    # Regression: the ID range had no upper bound, so IDs of other layouts sorting above the
+    # generated ones counted as recent forever.
+    repository.prescriptions.create(_prescription(patient_id, doctor_id, id=imported_id))
+    result = worklist.load_worklist(doctor_id, days=1)
+    assert result['prescriptions'] == [] and result['patients'] == []
@@ -0,0 +1,83 @@
+import sqlite3 as sql
+import threading
+
+import pytest
+
+import database as db
+
+
+def _insert(conn, department_id, name):
+    conn.execute("INSERT INTO department_record (id, name, description, contact_number_1, address, email_id) "
+                 "VALUES (?, ?, 'x', '0', 'x', ?)", (department_id, name, f"{department_id}@hims.test"))
+    return department_id
+
+def _names():
+    conn, c = db.connection()
+    try:
+        return [row[0] for row in c.execute("SELECT name FROM department_record ORDER BY name")]
+    finally:
+        conn.close()
+
+
+def test_connections_use_the_concurrent_profile(hims_db):
+    conn = db.create_connection()
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_run_write_commits_and_returns_the_result(hims_db):
+    assert db.run_write(_insert, 'D-1', 'Cardiology') == 'D-1'
+    assert _names() == ['Cardiology']
+    assert db.execute_write("UPDATE department_record SET name = ? WHERE id = ?", ('Neurology', 'D-1')) == 1
+    assert _names() == ['Neurology']
+
+
+def test_a_failing_job_does_not_undo_the_others_in_its_batch(hims_db):
+    queue = db.WriteQueue()
+    release = threading.Event()
+    blocker = queue.submit(lambda conn: release.wait())  # Holds the writer so the next jobs form one batch
+    futures = [queue.submit(_insert, 'D-1', 'Cardiology'),
+               queue.submit(_insert, 'D-2', 'Cardiology'),  # Duplicate name: fails
+               queue.submit(_insert, 'D-3', 'Oncology')]
+    release.set()
+    blocker.result(timeout=5)
+    assert futures[0].result(timeout=5) == 'D-1'
+    with pytest.raises(sql.IntegrityError):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5) == 'D-3'
+    assert _names() == ['Cardiology', 'Oncology']
+
+
+def test_concurrent_writers_are_serialised(hims_db):
+    def writer(n):
+        for i in range(20):
+            db.run_write(_insert, f"D-{n}-{i}", f"Department {n}-{i}")
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(_names()) == 100
+
+
+def test_a_failed_connection_fails_the_waiting_jobs_and_recovers(hims_db):
+    # Regression: the writer opened its connection outside any error handling, so a failure there
+    # killed the thread and every queued and later write waited forever.
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise sql.OperationalError("unable to open database file")
+        return db.create_connection()
+
+    queue = db.WriteQueue(factory)
+    with pytest.raises(sql.OperationalError, match="unable to open"):
+        queue.submit(_insert, 'D-1', 'Cardiology').result(timeout=5)
+    assert queue.submit(_insert, 'D-2', 'Oncology').result(timeout=5) == 'D-2'
+    assert _names() == ['Oncology']
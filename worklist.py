@@ -0,0 +1,158 @@
+"""Doctor worklists: a doctor's pending test results, recent prescriptions and recently seen patients.
+
+Pending tests come from pending_result, which the migration-12 triggers keep equal to the tests
+whose result is still awaited, keyed by (doctor_id, test_date_time); reading a worklist touches
+only that doctor's pending rows, however many tests have been recorded. Recent prescriptions are a
+range scan on (doctor_id, id) between the IDs generated at the start and at the end of the window,
+since IDs start with their creation time; prescriptions whose IDs have another layout (from before
+the ID generator, or imported) carry no creation time and are left out. Recent patients combine
+that with the (doctor_id, test_date_time) index of medical_test_record. Every query is bounded by
+the doctor and the time window, so the cost follows the size of the worklist rather than the size
+of the history.
+
+    python worklist.py DR-01M56NRHEW-QG000 --days 7 --repeat 200
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+import streamlit as st
+import database as db
+import id_generator
+import lookup_cache
+from repository import PRESCRIPTION_SELECT
+import config
+
+WORKLIST_DAYS = getattr(config, 'worklist_days', 7)
+WORKLIST_LIMIT = getattr(config, 'worklist_limit', 200)  # Rows shown per section
+
+PENDING_SELECT = """
+    SELECT t.* FROM pending_result w
+    JOIN medical_test_view t ON t.id = w.test_id
+    WHERE w.doctor_id = ?
+    ORDER BY w.test_date_time, w.test_id
+    LIMIT ?
+"""
+
+# Patients with a test or a prescription by the doctor since a point in time
+RECENT_PATIENTS_SELECT = """
+    SELECT s.patient_id, pt.name, pt.contact_number_1, s.test_date_time, s.prescription_id
+    FROM (
+        SELECT patient_id, test_date_time, NULL AS prescription_id FROM medical_test_record
+        WHERE doctor_id = ? AND test_date_time >= ? AND test_date_time <= ?
+        UNION ALL
+        SELECT patient_id, NULL, id FROM prescription_record
+        WHERE doctor_id = ? AND id >= ? AND id < ?
+    ) s
+    JOIN patient_record pt ON pt.id = s.patient_id
+"""
+
+def pending_tests(conn, doctor_id, limit=WORKLIST_LIMIT):
+    """The doctor's tests still awaiting a result, longest waiting first."""
+    return conn.execute(PENDING_SELECT, (doctor_id, limit)).fetchall()
+
+def pending_count(conn, doctor_id):
+    return conn.execute("SELECT COUNT(*) FROM pending_result WHERE doctor_id = ?", (doctor_id,)).fetchone()[0]
+
+def recent_prescriptions(conn, doctor_id, since, until, limit=WORKLIST_LIMIT):
+    """The doctor's prescriptions created between `since` and `until` (datetimes), newest first."""
+    rows = conn.execute(PRESCRIPTION_SELECT + " WHERE p.doctor_id = ? AND p.id >= ? AND p.id < ? ORDER BY p.id DESC LIMIT ?",
+                        (doctor_id, id_generator.id_floor('M', since), id_generator.id_floor('M', until),
+                         limit)).fetchall()
+    return [row for row in rows if id_generator.is_generated(row[0])]
+
+def recent_patients(conn, doctor_id, since, until, limit=WORKLIST_LIMIT):
+    """Patients the doctor has seen between `since` and `until`: [(patient_id, name, contact, last seen, tests, prescriptions)].
+
+    Most recently seen first; a prescription counts as seen at the time encoded in its ID.
+    """
+    rows = conn.execute(RECENT_PATIENTS_SELECT, (doctor_id, since.strftime('%Y-%m-%d %H:%M'),
+                                                 until.strftime('%Y-%m-%d %H:%M'), doctor_id,
+                                                 id_generator.id_floor('M', since),
+                                                 id_generator.id_floor('M', until))).fetchall()
+    patients = {}
+    for patient_id, name, contact, test_date_time, prescription_id in rows:
+        if prescription_id is not None and not id_generator.is_generated(prescription_id):
+            continue
+        seen = test_date_time or id_generator.id_timestamp(prescription_id).strftime('%Y-%m-%d %H:%M')
+        entry = patients.setdefault(patient_id, [patient_id, name, contact, seen, 0, 0])
+        entry[3] = max(entry[3], seen)
+        entry[4 if test_date_time else 5] += 1
+    return sorted(patients.values(), key=lambda entry: entry[3], reverse=True)[:limit]
+
+def load_worklist(doctor_id, days=WORKLIST_DAYS, limit=WORKLIST_LIMIT):
+    """Reads a doctor's worklist: {'pending_count', 'pending_tests', 'prescriptions', 'patients'}."""
+    db.require_summary_tables("The worklist")
+    until = datetime.now()
+    since = until - timedelta(days=days)
+    conn, c = db.connection()
+    try:
+        return {
+            'pending_count': pending_count(conn, doctor_id),
+            'pending_tests': pending_tests(conn, doctor_id, limit),
+            'prescriptions': recent_prescriptions(conn, doctor_id, since, until, limit),
+            'patients': recent_patients(conn, doctor_id, since, until, limit),
+        }
+    finally:
+        conn.close()
+
+def worklist_page():
+    """Streamlit page showing the worklist of one doctor."""
+    import pandas as pd
+    from prescription import show_prescription_details
+    from medical_test import show_medical_test_details
+
+    st.subheader("My Worklist")
+    if not db.backend.summary_tables:
+        st.info(f"Worklists are not available on the {db.backend.name} backend.")
+        return
+    # Remembered for the session, so the doctor enters it once
+    doctor_id = st.text_input("Enter Doctor ID", value=st.session_state.get('worklist_doctor_id', ''))
+    if not doctor_id:
+        return
+    if not lookup_cache.id_exists('doctor_record', doctor_id):
+        st.error("Invalid Doctor ID")
+        return
+    st.session_state['worklist_doctor_id'] = doctor_id
+    days = st.number_input("Days to look back", min_value=1, max_value=365, value=WORKLIST_DAYS)
+
+    try:
+        worklist = load_worklist(doctor_id, days)
+    except Exception as e:
+        st.error(f"Error loading worklist: {e}")
+        return
+
+    st.write(f"**{lookup_cache.fetch_name('doctor_record', doctor_id)}** ({doctor_id})")
+    shown = len(worklist['pending_tests'])
+    st.write(f"Pending test results ({worklist['pending_count']}"
+             f"{f', oldest {shown} shown' if shown < worklist['pending_count'] else ''}):")
+    if worklist['pending_tests']:
+        show_medical_test_details(worklist['pending_tests'])
+    else:
+        st.info("No test results awaited.")
+    st.write(f"Patients seen in the last {days} days ({len(worklist['patients'])}):")
+    if worklist['patients']:
+        st.write(pd.DataFrame(worklist['patients'], columns=['Patient ID', 'Name', 'Contact number', 'Last seen',
+                                                             'Tests', 'Prescriptions']))
+    st.write(f"Prescriptions in the last {days} days ({len(worklist['prescriptions'])}):")
+    if worklist['prescriptions']:
+        show_prescription_details(worklist['prescriptions'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Time loading a doctor's worklist from the database.")
+    parser.add_argument('doctor_id')
+    parser.add_argument('--days', type=int, default=WORKLIST_DAYS)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        worklist = load_worklist(args.doctor_id, args.days)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"{worklist['pending_count']} pending tests, {len(worklist['prescriptions'])} prescriptions, "
+          f"{len(worklist['patients'])} patients in {args.days} days: "
+          f"p50 {timings[len(timings) // 2]:.1f} ms, p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Writer service: the one process that writes to the primary database when several app processes run.
+
+    python writer_service.py --port 6100
+    streamlit run hims_app.py --server.port 8501   # one per worker, behind a load balancer
+
+with config.writer_service_address = ('127.0.0.1', 6100) for the workers. Each worker's database.writer
+then sends its write batches here (see database.RemoteWriteQueue) instead of opening write
+transactions itself, so the workers never contend for SQLite's write lock, and the batches of all
+workers are group-committed by this process's WriteQueue. Connections are authenticated with
+config.writer_service_authkey (config.password if that is not set) before any job is unpickled.
+Set config.read_consistency as well to serve the workers' reads from snapshots (see database.ReplicaSet).
+"""
+import argparse
+import pickle
+import threading
+from multiprocessing.connection import Listener
+import database as db
+
+def _pickled_error(error):
+    """The exception itself if the client can unpickle it, else a RuntimeError describing it."""
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+def handle(conn, queue):
+    """Applies the batches received on one client connection until the client disconnects."""
+    try:
+        while True:
+            try:
+                jobs = conn.recv()
+            except EOFError:
+                return
+            futures = []
+            for payload in jobs:
+                try:
+                    fn, args = pickle.loads(payload)
+                    futures.append(queue.submit(fn, *args))
+                except Exception as e:
+                    futures.append(e)
+            results = []
+            for future in futures:
+                if isinstance(future, Exception):
+                    results.append((False, _pickled_error(future)))
+                    continue
+                try:
+                    results.append((True, future.result()))
+                except Exception as e:
+                    results.append((False, _pickled_error(e)))
+            conn.send(results)
+    finally:
+        conn.close()
+
+def serve(address, authkey=db.WRITER_SERVICE_AUTHKEY):
+    """Accepts worker connections at address, each served by its own thread; runs until interrupted."""
+    queue = db.WriteQueue()  # Applies the jobs here, even if this process's config points at a service
+    with Listener(address, authkey=authkey) as listener:
+        print(f"Writer service for {db.DATABASE_PATH} listening on {listener.address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError) as e:  # A client that failed authentication
+                print(f"Rejected connection: {e}")
+                continue
+            threading.Thread(target=handle, args=(conn, queue), name='writer-client', daemon=True).start()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve database writes for several app processes.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help="TCP port (default: config.writer_service_address)")
+    parser.add_argument('--socket', help="Unix socket path to listen on instead of a TCP port")
+    args = parser.parse_args()
+    address = args.socket or ((args.host, args.port) if args.port else db.WRITER_SERVICE_ADDRESS)
+    if not address:
+        parser.error("Give --port or --socket, or set config.writer_service_address")
+
+    db.db_init()
+    try:
+        serve(address)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()